@@ -2,46 +2,42 @@
 # app/api/v1/dashboard.py
 from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.routing import get_read_db
 from app import crud
-from app.core.config import settings
-from jose import jwt
-from app.core.security import decrypt_bytes
+from app.core.auth import get_patient_id_from_token
+from typing import Optional
+from app.core.security import LazyDecrypted
 
 router = APIRouter(prefix="/api/v1/dashboard", tags=["dashboard"])
 
-def get_patient_id_from_token(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
-    try:
-        scheme, token = authorization.split()
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Authorization header")
-    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-    return payload.get("sub")
-
 @router.get("/sessions")
-def list_sessions(authorization: str = Header(None), db: Session = Depends(get_db)):
+def list_sessions(limit: int = crud.SESSION_PAGE_SIZE, cursor: Optional[str] = None, include_total: bool = False, authorization: str = Header(None), db: Session = Depends(get_read_db)):
     pid = get_patient_id_from_token(authorization)
     if not pid:
         raise HTTPException(status_code=401)
-    rows = crud.get_sessions_by_patient(db, pid)
+    try:
+        rows, next_cursor = crud.get_sessions_page(db, pid, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     out = []
     for r in rows:
         out.append({"session_id": str(r.session_id), "start_time": str(r.start_time), "severity_score": float(r.severity_score) if r.severity_score else None, "red_flag": r.red_flag, "ai_summary": r.ai_summary})
-    return out
+    page = {"sessions": out, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+    if include_total:
+        page["total"] = crud.count_sessions_by_patient(db, pid)
+    return page
 
 @router.get("/logs/{session_id}")
-def get_logs(session_id: str, authorization: str = Header(None), db: Session = Depends(get_db)):
+def get_logs(session_id: str, offset: int = 0, limit: Optional[int] = None, authorization: str = Header(None), db: Session = Depends(get_read_db)):
     pid = get_patient_id_from_token(authorization)
     if not pid:
         raise HTTPException(status_code=401)
-    logs = crud.get_chat_logs(db, session_id)
-    result = []
-    for l in logs:
-        try:
-            text = decrypt_bytes(l.message)
-        except Exception:
-            text = "<decryption failed>"
-        result.append({"sender": l.sender, "message": text, "timestamp": str(l.timestamp)})
-    return result
+    session = crud.get_patient_session(db, pid, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    # bounded by the session start so only its partitions are scanned
+    logs = crud.get_chat_logs(db, session_id, since=session.start_time)
+    # only the requested window of messages is decrypted
+    window = slice(offset, None if limit is None else offset + limit)
+    texts = LazyDecrypted([l.message for l in logs], on_error="<decryption failed>")[window]
+    return [{"sender": l.sender, "message": text, "timestamp": str(l.timestamp)} for l, text in zip(logs[window], texts)]
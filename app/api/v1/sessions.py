@@ -1,17 +1,19 @@
 """Initialization or Placeholder File."""
 # app/api/v1/sessions.py
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from sqlalchemy.orm import Session
 from app.db.session import get_db
+from app.db import routing
 from app import crud
 from app.db import models
 from app.schemas.session import SessionCreate
-from app.services import ai_processor, appointment_scheduler
+from app.services import ai_processor, appointment_scheduler, idempotency, doctor_load, continuity
 # from app.services.email_service import send_appointment_email, send_doctor_notification
 from app.core.config import settings
+from app.core.auth import get_patient_id_from_token, get_current_patient
 import redis
 import json
-from app.core.security import decrypt_bytes
+from app.core.security import decrypt_many
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -53,23 +55,25 @@ r = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
 router = APIRouter(prefix="/api/v1/sessions", tags=["sessions"])
 
-def get_patient_id_from_token(authorization: str = Header(None)):
-    from jose import jwt
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
-    try:
-        scheme, token = authorization.split()
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Authorization header")
-    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-    return payload.get("sub")
-
 @router.post("/submit")
-def submit_session(payload: SessionCreate, authorization: str = Header(None), db: Session = Depends(get_db)):
+def submit_session(payload: SessionCreate, http_request: Request, response: Response, authorization: str = Header(None), idempotency_key: str = Header(None), db: Session = Depends(get_db)):
     patient_id = get_patient_id_from_token(authorization)
     if not patient_id:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    idem, stored = idempotency.begin(db, patient_id, "sessions.submit", idempotency_key, payload.dict())
+    if stored is not None:
+        return stored
+    try:
+        result = _submit_session(http_request, db, patient_id, payload)
+        routing.mark_write(patient_id, response)
+        return idempotency.complete(db, idem, result)
+    except Exception:
+        db.rollback()
+        idempotency.release(db, idem)
+        raise
+
+def _submit_session(http_request: Request, db: Session, patient_id, payload: SessionCreate):
     # compute severity (LLM)
     ai_result = ai_processor.generate_summary_structured(payload.free_text, [s.dict() for s in payload.symptoms])
     try:
@@ -84,22 +88,25 @@ def submit_session(payload: SessionCreate, authorization: str = Header(None), db
     red_flag = severity >= 8 or any([s.intensity >= 8 for s in payload.symptoms])
 
     # create session record
-    session = crud.create_session(db, patient_id, severity_score=severity, red_flag=red_flag, callback_required=red_flag, ai_summary=summary_text)
-    # chat logs and symptoms
+    session = crud.create_session(db, patient_id, severity_score=severity, red_flag=red_flag, callback_required=red_flag, ai_summary=summary_text, commit=False)
+    # chat logs and symptoms, committed together with the session
     free_text = payload.free_text or "No additional description provided"
-    crud.create_chat_log(db, session.session_id, "patient", free_text, intent="symptom_report")
-    crud.create_chat_log(db, session.session_id, "bot", summary_text, intent="ai_summary")
-
-    for s in payload.symptoms:
-        crud.create_symptom_entry(db, session.session_id, payload.mood, s.symptom, s.intensity, s.notes, s.photo_url)
+    crud.create_chat_logs(db, session.session_id, [("patient", free_text, "symptom_report"), ("bot", summary_text, "ai_summary")])
+    crud.create_symptom_entries(db, session.session_id, payload.mood, [s.dict() for s in payload.symptoms])
+    symptom_names = [s.symptom for s in payload.symptoms]
+    # same two rollups as the MCP save_session_to_database path, so v1 and v2 submissions agree
+    crud.update_patient_daily_stats(db, patient_id, crud.utc_day(session.start_time), severity, red_flag, payload.mood, symptom_names)
+    crud.update_patient_clinical_state(db, patient_id, symptom_names, severity)
+    session_id = session.session_id
+    db.commit()
 
     # Redis caching removed due to connection issues
 
-    response = {"session_id": str(session.session_id), "severity": severity, "red_flag": red_flag, "ai_summary": summary_text, "recommendation": recommendation}
+    response = {"session_id": str(session_id), "severity": severity, "red_flag": red_flag, "ai_summary": summary_text, "recommendation": recommendation}
 
     # if recommendation yes, include suggested doctor (simple)
     if recommendation == "yes":
-        patient = crud.get_patient_by_id(db, patient_id)
+        patient = get_current_patient(http_request, db, patient_id)
         if patient and patient.city:
             doctor = appointment_scheduler.find_doctor_for_symptoms(db, patient.city, [s.dict() for s in payload.symptoms])
             if doctor:
@@ -107,7 +114,7 @@ def submit_session(payload: SessionCreate, authorization: str = Header(None), db
     return response
 
 @router.post("/book-appointment")
-def book_appointment(request: dict, authorization: str = Header(None), db: Session = Depends(get_db)):
+def book_appointment(request: dict, http_request: Request, response: Response, authorization: str = Header(None), idempotency_key: str = Header(None), db: Session = Depends(get_db)):
     patient_id = get_patient_id_from_token(authorization)
     if not patient_id:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -116,44 +123,53 @@ def book_appointment(request: dict, authorization: str = Header(None), db: Sessi
     if not session_id:
         raise HTTPException(status_code=400, detail="Session ID required")
     
+    idem, stored = idempotency.begin(db, patient_id, "sessions.book_appointment", idempotency_key, request)
+    if stored is not None:
+        return stored
+    try:
+        result = _book_appointment(http_request, db, patient_id, session_id)
+    except Exception:
+        db.rollback()
+        idempotency.release(db, idem)
+        raise
+
+    if "error" in result:
+        idempotency.release(db, idem)
+        return result
+    routing.mark_write(patient_id, response)
+    return idempotency.complete(db, idem, result)
+
+def _book_appointment(http_request: Request, db: Session, patient_id, session_id):
     # Get session and verify ownership
     session = db.query(models.Session).filter(models.Session.session_id == session_id, models.Session.patient_id == patient_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Get patient info for city
-    patient = crud.get_patient_by_id(db, patient_id)
+    patient = get_current_patient(http_request, db, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Find available doctor
-    doctor = db.query(models.Doctor).filter(models.Doctor.city == patient.city).first()
+    # Find available doctor: a recent doctor of the patient's first, else the least loaded in the city
+    loads = doctor_load.current(db)
+    doctor = continuity.pick_recent_doctor(loads.directory, crud.get_recent_doctor_ids(db, patient_id), patient.city)
+    continuity.record_route("continuity" if doctor else "fallback")
+    doctor = doctor or loads.least_loaded(patient.city)
     if not doctor:
         return {"error": "No available doctors found in your city"}
     
-    # Create appointment
-    from datetime import datetime, timedelta
-    appointment_date = datetime.utcnow() + timedelta(days=1)
-    appointment = models.Appointment(
-        patient_id=patient_id,
-        doctor_id=doctor.doctor_id,
-        session_id=session_id,
-        appointment_date=appointment_date,
-        clinic_location=doctor.clinic_name,
-        status="pending"
-    )
-    db.add(appointment)
+    # Claim the doctor's next free slot
+    appointment = crud.book_slot(db, patient_id, doctor, session_id, status="pending")
+    if appointment is None:
+        db.rollback()
+        return {"error": f"No free appointment slots with {doctor.full_name} in the next {settings.APPOINTMENT_SLOT_HORIZON_DAYS} days"}
+    appointment_date = appointment.appointment_date
     db.commit()
-    db.refresh(appointment)
     
     # Get chat logs for email summary
-    logs = crud.get_chat_logs(db, session_id)
-    chat_summary = ""
-    for log in logs:
-        if log.sender == "patient":
-            chat_summary += f"Patient: {decrypt_bytes(log.message)}\n"
-        elif log.sender == "bot":
-            chat_summary += f"AI Analysis: {decrypt_bytes(log.message)}\n"
+    labels = {"patient": "Patient", "bot": "AI Analysis"}
+    logs = [log for log in crud.get_chat_logs(db, session_id, since=session.start_time) if log.sender in labels]
+    chat_summary = "".join(f"{labels[log.sender]}: {text}\n" for log, text in zip(logs, decrypt_many([log.message for log in logs])))
     
     # Send emails to both patient and doctor
     emails_sent = send_emails(
@@ -0,0 +1,177 @@
+"""Async database access helpers mirroring app.crud."""
+# app/async_crud.py
+# Async counterparts of app.crud for `async def` endpoints and MCP tools (AsyncSessionLocal / get_async_db).
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import models
+from app.core.config import settings
+from app import crud
+from typing import Optional
+from datetime import datetime, timedelta
+
+async def get_patient_by_id(db: AsyncSession, patient_id):
+    return (await db.execute(select(models.Patient).where(models.Patient.patient_id == patient_id))).scalars().first()
+
+async def get_patient_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(models.Patient).where(models.Patient.email == email))).scalars().first()
+
+async def get_doctor_by_id(db: AsyncSession, doctor_id):
+    return (await db.execute(select(models.Doctor).where(models.Doctor.doctor_id == doctor_id))).scalars().first()
+
+async def get_patient_session(db: AsyncSession, session_id, patient_id):
+    return (await db.execute(select(models.Session).where(models.Session.session_id == session_id,
+                                                         models.Session.patient_id == patient_id))).scalars().first()
+
+async def create_session(db: AsyncSession, patient_id, severity_score=None, red_flag=False, callback_required=False, ai_summary=None, commit=True, **extra):
+    s = models.Session(patient_id=patient_id, severity_score=severity_score, red_flag=red_flag,
+                       callback_required=callback_required, ai_summary=ai_summary, **extra)
+    db.add(s)
+    if commit:
+        await db.commit(); await db.refresh(s)
+    else:
+        await db.flush()
+    return s
+
+async def create_chat_logs(db: AsyncSession, session_id, messages):
+    """Insert (sender, message_plain, intent) tuples with one multi-row INSERT. Does not commit."""
+    rows = crud.chat_log_rows(session_id, messages)
+    if rows:
+        await db.execute(insert(models.ChatLog).values(rows))
+    return rows
+
+async def create_symptom_entries(db: AsyncSession, session_id, mood, symptoms):
+    """Insert symptom dicts with one multi-row INSERT. Does not commit."""
+    rows = crud.symptom_entry_rows(session_id, mood, symptoms)
+    if rows:
+        await db.execute(insert(models.SymptomEntry).values(rows))
+    return rows
+
+async def get_sessions_by_patient(db: AsyncSession, patient_id, limit: int = None):
+    q = select(models.Session).where(models.Session.patient_id == patient_id).order_by(models.Session.start_time.desc()).limit(limit)
+    return (await db.execute(q)).scalars().all()
+
+async def get_patient_history(db: AsyncSession, patient_id, limit: int = 5):
+    """Patient, recent sessions and their symptoms in two round trips, projecting only the columns the history needs.
+
+    Returns (patient_row or None, session_rows, {session_id: [symptom_rows]}).
+    """
+    q = select(
+        models.Patient.patient_id, models.Patient.full_name, models.Patient.city,
+        models.Session.session_id, models.Session.start_time, models.Session.severity_score,
+        models.Session.red_flag, models.Session.ai_summary
+    ).select_from(models.Patient).outerjoin(
+        models.Session, models.Session.patient_id == models.Patient.patient_id
+    ).where(models.Patient.patient_id == patient_id).order_by(models.Session.start_time.desc()).limit(limit)
+    rows = (await db.execute(q)).all()
+    if not rows:
+        return None, [], {}
+    sessions = [r for r in rows if r.session_id is not None]
+    symptoms = {r.session_id: [] for r in sessions}
+    if sessions:
+        q = select(
+            models.SymptomEntry.session_id, models.SymptomEntry.symptom,
+            models.SymptomEntry.intensity, models.SymptomEntry.mood
+        ).where(models.SymptomEntry.session_id.in_(list(symptoms)),
+                crud.partition_floor(models.SymptomEntry.date, min(r.start_time for r in sessions)))
+        for e in (await db.execute(q)).all():
+            symptoms[e.session_id].append(e)
+    return rows[0], sessions, symptoms
+
+async def get_chat_logs(db: AsyncSession, session_id, since: Optional[datetime] = None):
+    q = select(models.ChatLog).where(models.ChatLog.session_id == session_id)
+    if since:
+        q = q.where(crud.partition_floor(models.ChatLog.timestamp, since))
+    return (await db.execute(q.order_by(models.ChatLog.timestamp.asc()))).scalars().all()
+
+async def get_symptom_entries(db: AsyncSession, session_id, since: Optional[datetime] = None):
+    q = select(models.SymptomEntry).where(models.SymptomEntry.session_id == session_id)
+    if since:
+        q = q.where(crud.partition_floor(models.SymptomEntry.date, since))
+    return (await db.execute(q)).scalars().all()
+
+async def update_patient_clinical_state(db: AsyncSession, patient_id, symptom_names: list, severity, new_session: bool = True):
+    """Fold one submission into the patient's clinical state under a row lock. Does not commit."""
+    await db.execute(crud.clinical_state_seed(db.bind.dialect.name, patient_id))
+    st = (await db.execute(crud.clinical_state_for_update(patient_id))).scalars().one()
+    return crud.fold_clinical_state(st, symptom_names, severity, new_session)
+
+async def update_patient_daily_stats(db: AsyncSession, patient_id, day, severity, red_flag: bool, mood, symptom_names: list, previous: Optional[tuple] = None):
+    """Fold one submission into the patient's rollup row for `day` under a row lock. Does not commit."""
+    await db.execute(crud.daily_stats_seed(db.bind.dialect.name, patient_id, day))
+    st = (await db.execute(crud.daily_stats_for_update(patient_id, day))).scalars().one()
+    return crud.fold_daily_stats(st, severity, red_flag, mood, symptom_names, previous)
+
+def _idempotency_where(patient_id, endpoint: str, key: str):
+    return (models.IdempotencyKey.patient_id == patient_id,
+            models.IdempotencyKey.endpoint == endpoint,
+            models.IdempotencyKey.idempotency_key == key)
+
+async def claim_idempotency_key(db: AsyncSession, patient_id, endpoint: str, key: str, request_hash: str, ttl_hours: Optional[int] = None):
+    """Async crud.claim_idempotency_key, including the takeover of an abandoned claim."""
+    now = datetime.utcnow()
+    where = _idempotency_where(patient_id, endpoint, key)
+    existing = (await db.execute(select(models.IdempotencyKey).where(*where, models.IdempotencyKey.expires_at > now))).scalars().first()
+    if existing:
+        if not crud.idempotency_abandoned(existing, request_hash, now):
+            return existing, False
+        taken = (await db.execute(crud.idempotency_takeover(existing, now))).rowcount
+        await db.commit(); await db.refresh(existing)
+        return existing, bool(taken)
+    await db.execute(delete(models.IdempotencyKey).where(*where))
+    rec = models.IdempotencyKey(patient_id=patient_id, endpoint=endpoint, idempotency_key=key, request_hash=request_hash,
+                                expires_at=now + timedelta(hours=ttl_hours or settings.IDEMPOTENCY_TTL_HOURS),
+                                locked_until=crud.idempotency_lease(now))
+    db.add(rec)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # a concurrent request claimed the same key first
+        await db.rollback()
+        return (await db.execute(select(models.IdempotencyKey).where(*where))).scalars().first(), False
+    return rec, True
+
+async def store_idempotent_response(db: AsyncSession, record, response: dict):
+    record.response = response
+    await db.commit()
+    return record
+
+async def release_idempotency_key(db: AsyncSession, record):
+    # the failed handler may have left the transaction aborted
+    await db.rollback()
+    await db.delete(record); await db.commit()
+
+async def ensure_doctor_slots(db: AsyncSession, doctor, start: Optional[datetime] = None, days: Optional[int] = None) -> int:
+    """Create the doctor's missing slots from `start` through APPOINTMENT_SLOT_HORIZON_DAYS. Does not commit."""
+    rows = crud.slot_rows(doctor.doctor_id, doctor.available_slots, start or datetime.utcnow(), days or settings.APPOINTMENT_SLOT_HORIZON_DAYS)
+    if rows:
+        await db.execute(crud.insert_ignoring_conflicts(db.bind.dialect.name, models.AppointmentSlot).values(rows))
+    return len(rows)
+
+async def claim_slot(db: AsyncSession, doctor_id, earliest: datetime, skip_locked: bool = True):
+    """Mark the doctor's first free slot at or after `earliest` as booked. Returns the slot or None. Does not commit."""
+    for _ in range(crud.SLOT_CLAIM_ATTEMPTS):
+        slot = (await db.execute(crud.free_slot_query(doctor_id, earliest, skip_locked))).scalars().first()
+        if slot is None:
+            return None
+        if (await db.execute(crud.claim_slot_statement(slot.slot_id))).rowcount == 1:
+            return slot
+    return None
+
+async def book_slot(db: AsyncSession, patient_id, doctor, session_id, earliest: Optional[datetime] = None, status: str = "confirmed", notes=None):
+    """crud.book_slot for async sessions. Returns the Appointment or None when fully booked. Does not commit."""
+    earliest = earliest or crud.earliest_booking_time()
+    slot = await claim_slot(db, doctor.doctor_id, earliest)
+    if slot is None:
+        await ensure_doctor_slots(db, doctor, earliest)
+        slot = await claim_slot(db, doctor.doctor_id, earliest)
+    if slot is None:
+        return None
+    ap = crud.new_slot_appointment(slot, patient_id, doctor, session_id, status, notes)
+    db.add(ap); await db.flush()
+    await db.execute(crud.patient_doctor_upsert(db.bind.dialect.name, patient_id, doctor.doctor_id, ap.appointment_id))
+    return ap
+
+async def get_recent_doctor_ids(db: AsyncSession, patient_id, days: Optional[int] = None) -> list:
+    """Doctors the patient booked within CONTINUITY_WINDOW_DAYS, most recent first."""
+    return (await db.execute(crud.recent_doctor_ids_query(patient_id, days))).scalars().all()
@@ -0,0 +1,80 @@
+"""Bearer-token authentication dependencies shared by the API routers."""
+# app/core/auth.py
+# Bearer-token authentication shared by every router. Verified tokens are kept in a bounded LRU keyed by the
+# token's SHA-256 (raw tokens are never stored); an entry is only served until the token's own exp, so repeat
+# requests skip signature verification without outliving the token. The authenticated Patient row is cached on
+# the request, so one request never loads it twice.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Header, HTTPException, Request
+from jose import jwt, JWTError
+from app.core.config import settings
+from app import crud
+
+# sha256(token) -> (subject, exp as a unix timestamp or None)
+_verified = OrderedDict()
+_lock = threading.Lock()
+
+def _bearer_token(authorization: Optional[str]) -> str:
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing Authorization header")
+    parts = authorization.split()
+    if len(parts) != 2:
+        raise HTTPException(status_code=401, detail="Invalid Authorization header format")
+    if parts[0].lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Invalid authentication scheme")
+    return parts[1]
+
+def _cached_subject(key: str, now: float) -> Optional[str]:
+    with _lock:
+        hit = _verified.get(key)
+        if hit is None:
+            return None
+        subject, exp = hit
+        if exp is not None and exp <= now:
+            del _verified[key]
+            return None
+        _verified.move_to_end(key)
+        return subject
+
+def verify_token(token: str) -> str:
+    """The token's subject (patient_id); raises 401 if the token is invalid, expired or has no subject."""
+    key, now = hashlib.sha256(token.encode()).hexdigest(), time.time()
+    subject = _cached_subject(key, now)
+    if subject is not None:
+        return subject
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    subject = payload.get("sub")
+    if not subject:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    with _lock:
+        _verified[key] = (subject, payload.get("exp"))
+        _verified.move_to_end(key)
+        while len(_verified) > settings.AUTH_TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return subject
+
+def get_patient_id_from_token(authorization: str = Header(None)) -> str:
+    """Authenticated patient_id from the Authorization header; usable directly or as a dependency."""
+    return verify_token(_bearer_token(authorization))
+
+def token_subject(authorization: Optional[str]) -> Optional[str]:
+    """Like get_patient_id_from_token, but None instead of a 401."""
+    try:
+        return get_patient_id_from_token(authorization)
+    except HTTPException:
+        return None
+
+def get_current_patient(request: Request, db, patient_id):
+    """The authenticated patient's row, loaded at most once per request."""
+    patient = getattr(request.state, "patient", None)
+    if patient is None or str(patient.patient_id) != str(patient_id):
+        patient = crud.get_patient_by_id(db, patient_id)
+        request.state.patient = patient
+    return patient
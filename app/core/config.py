@@ -1,13 +1,59 @@
 """Initialization or Placeholder File."""
 # app/core/config.py
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
 
 class Settings(BaseSettings):
-    DATABASE_URL: str
+    # DB_PROFILE=sqlite runs the API, MCP server and agent against a local SQLite file instead of DATABASE_URL
+    DB_PROFILE: str = "postgresql"
+    SQLITE_PATH: str = "symptom_tracker.db"
+    DATABASE_URL: str = ""
+    # Optional read replica for read-only endpoints (app/db/routing.py)
+    DATABASE_REPLICA_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 1.0
+    READ_YOUR_WRITES_SECONDS: float = 30.0
+    # Monthly partitions of chat_logs / symptom_entries (app/db/partitions.py, PostgreSQL only)
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_RETENTION_MONTHS: Optional[int] = None
+    PARTITION_ARCHIVE_SCHEMA: str = "archive"
+    # Upper bound on doctor directory staleness when LISTEN/NOTIFY is unavailable (app/services/doctor_directory.py)
+    DOCTOR_DIRECTORY_TTL_SECONDS: float = 300.0
+    # Full resync interval for the in-memory doctor load counters (app/services/doctor_load.py)
+    DOCTOR_LOAD_RESYNC_SECONDS: float = 300.0
+    # Appointment slots (crud.ensure_doctor_slots / crud.book_slot)
+    APPOINTMENT_SLOT_MINUTES: int = 30
+    APPOINTMENT_SLOT_HORIZON_DAYS: int = 14
+    APPOINTMENT_MIN_LEAD_MINUTES: int = 60
+    # Doctor search sends a returning patient to a doctor they booked within this many days (app/services/continuity.py)
+    CONTINUITY_WINDOW_DAYS: int = 365
+    # Outbox delivery of booking emails (app/services/email_outbox.py); failures retry after RETRY * 2^(attempt-1) seconds
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0
+    EMAIL_OUTBOX_RETRY_SECONDS: float = 60.0
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    # a claimed row becomes due again after this long if its worker died before recording the result
+    EMAIL_OUTBOX_CLAIM_SECONDS: float = 300.0
+    # Verified JWTs cached per process, keyed by token hash (app/core/auth.py)
+    AUTH_TOKEN_CACHE_SIZE: int = 1024
     REDIS_URL: Optional[str] = None
     FERNET_KEY: str
+    # comma-separated previous keys, still accepted for decryption during a key rotation (app/core/security.py)
+    FERNET_OLD_KEYS: str = ""
+    # Threads security.decrypt_many spreads large batches over. Fernet mostly runs under the GIL, so 1 (inline) unless
+    # mcp_langgraph_app/benchmarks/bench_decrypt.py shows a gain on the host
+    DECRYPT_WORKERS: int = 1
+    # Throttle for the re-encryption job (app/services/key_rotation.py)
+    KEY_ROTATION_BATCH_SIZE: int = 500
+    KEY_ROTATION_ROWS_PER_SECOND: float = 2000.0
     JWT_SECRET_KEY: str
+    # HMAC key for patients.secret_key_verifier (app/core/security.py); defaults to JWT_SECRET_KEY, so set it to keep
+    # JWT secret rotations from touching verifiers. After a change, each patient's next login falls back to decrypting
+    # secret_key_encrypted once and re-stamps the verifier.
+    SECRET_KEY_VERIFIER_KEY: str = ""
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
     GEMINI_API_KEY: str
@@ -22,8 +68,21 @@ class Settings(BaseSettings):
     MCP_SERVER_HOST: str = "localhost"
     MCP_SERVER_PORT: int = 8001
     LANGGRAPH_CHECKPOINT_DB: str = "checkpoints.db"
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    # How long a claimed key without a response blocks retries; after that a retry with the same payload takes over
+    IDEMPOTENCY_LEASE_SECONDS: int = 60
 
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def _apply_db_profile(self):
+        if self.DB_PROFILE == "sqlite":
+            # Resolve against the repo root so the API and the MCP server subprocess share one file
+            path = Path(self.SQLITE_PATH)
+            self.DATABASE_URL = f"sqlite:///{path if path.is_absolute() else ROOT_DIR / path}"
+        elif not self.DATABASE_URL:
+            raise ValueError("DATABASE_URL is required unless DB_PROFILE=sqlite")
+        return self
+
 settings = Settings()
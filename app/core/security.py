@@ -1,16 +1,51 @@
 """Initialization or Placeholder File."""
 # app/core/security.py
 import hashlib
-from cryptography.fernet import Fernet
+import hmac
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from app.core.config import settings
 
-fernet = Fernet(settings.FERNET_KEY.encode())
+# FERNET_KEY encrypts; it and any FERNET_OLD_KEYS decrypt, so a key can be rotated without downtime
+# (mcp_langgraph_app/rotate_encryption_keys.py re-encrypts stored data under the new key)
+def fernet_keys() -> list:
+    return [settings.FERNET_KEY] + [k.strip() for k in (settings.FERNET_OLD_KEYS or "").split(",") if k.strip()]
+
+primary_fernet = Fernet(settings.FERNET_KEY.encode())
+fernet = MultiFernet([Fernet(k.encode()) for k in fernet_keys()])
+
+def key_id() -> str:
+    """Short fingerprint of the primary key, for recording which key a rotation targets."""
+    return hashlib.sha256(settings.FERNET_KEY.encode()).hexdigest()[:16]
+
+def is_current(cipher: bytes) -> bool:
+    """True when `cipher` is encrypted under the primary key (its HMAC verifies with it)."""
+    try:
+        primary_fernet.decrypt(cipher)
+        return True
+    except InvalidToken:
+        return False
+
+def rotate(cipher: bytes) -> bytes:
+    """Re-encrypt under the primary key; raises InvalidToken if no configured key can read it."""
+    return fernet.rotate(cipher)
 
 def hash_password(plain: str) -> str:
     return hashlib.sha256(plain.encode()).hexdigest()
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return hashlib.sha256(plain.encode()).hexdigest() == hashed
+    return hmac.compare_digest(hashlib.sha256(plain.encode()).hexdigest(), hashed or "")
+
+def secret_key_verifier(plain: str) -> str:
+    """HMAC-SHA256 of a patient's secret key, stored so logins can check it without decrypting."""
+    key = (settings.SECRET_KEY_VERIFIER_KEY or settings.JWT_SECRET_KEY).encode()
+    return hmac.new(key, plain.encode(), hashlib.sha256).hexdigest()
+
+def verify_secret_key(plain: str, verifier: str) -> bool:
+    return hmac.compare_digest(secret_key_verifier(plain), verifier)
 
 def encrypt_bytes(plain_text: str) -> bytes:
     if plain_text is None:
@@ -21,3 +56,75 @@ def decrypt_bytes(cipher: bytes) -> str:
     if cipher is None:
         return None
     return fernet.decrypt(cipher).decode()
+
+# Bulk decryption. Batches are decrypted inline unless settings.DECRYPT_WORKERS > 1; then batches of at least
+# DECRYPT_PARALLEL_THRESHOLD rows (below that a pool hand-off costs more than it saves) are split into
+# DECRYPT_CHUNK_SIZE chunks across a shared thread pool. Fernet's token parsing and HMAC check run in Python under the
+# GIL, so the pool only pays off where bench_decrypt.py measures it; it is off by default.
+DECRYPT_PARALLEL_THRESHOLD = 256
+DECRYPT_CHUNK_SIZE = 128
+DECRYPT_WORKERS = max(1, settings.DECRYPT_WORKERS)
+
+_pool = {"executor": None}
+_pool_lock = threading.Lock()
+
+def _executor() -> ThreadPoolExecutor:
+    if _pool["executor"] is None:
+        with _pool_lock:
+            if _pool["executor"] is None:
+                _pool["executor"] = ThreadPoolExecutor(max_workers=DECRYPT_WORKERS, thread_name_prefix="decrypt")
+    return _pool["executor"]
+
+def _decrypt_chunk(ciphers, on_error) -> list:
+    out = []
+    for cipher in ciphers:
+        try:
+            out.append(decrypt_bytes(cipher))
+        except Exception:
+            out.append(on_error)
+    return out
+
+def decrypt_many(ciphers, on_error: Optional[str] = None) -> list:
+    """
+    Decrypt a batch of ciphertexts, in input order. None stays None; a row that fails to
+    decrypt becomes `on_error` instead of failing the batch.
+    """
+    ciphers = list(ciphers)
+    if len(ciphers) < DECRYPT_PARALLEL_THRESHOLD or DECRYPT_WORKERS < 2:
+        return _decrypt_chunk(ciphers, on_error)
+    chunks = [ciphers[i:i + DECRYPT_CHUNK_SIZE] for i in range(0, len(ciphers), DECRYPT_CHUNK_SIZE)]
+    return [text for chunk in _executor().map(lambda c: _decrypt_chunk(c, on_error), chunks) for text in chunk]
+
+class LazyDecrypted(Sequence):
+    """
+    Plaintexts of `ciphers`, decrypted on first access and then kept. Slices decrypt only the
+    rows they cover, in one decrypt_many batch, so a view that shows part of a list pays for that part.
+    """
+
+    def __init__(self, ciphers, on_error: Optional[str] = None):
+        self._ciphers = list(ciphers)
+        self._plain = [None] * len(self._ciphers)
+        self._done = [False] * len(self._ciphers)
+        self._on_error = on_error
+
+    def __len__(self):
+        return len(self._ciphers)
+
+    def _fill(self, indices):
+        todo = [i for i in indices if not self._done[i]]
+        for i, text in zip(todo, decrypt_many([self._ciphers[i] for i in todo], self._on_error)):
+            self._plain[i], self._done[i] = text, True
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            self._fill(indices)
+            return [self._plain[i] for i in indices]
+        index = range(len(self))[index]
+        self._fill([index])
+        return self._plain[index]
+
+    def __iter__(self):
+        # a chunk at a time: consumers that stop early never decrypt the rest
+        for start in range(0, len(self), DECRYPT_CHUNK_SIZE):
+            yield from self[start:start + DECRYPT_CHUNK_SIZE]
@@ -3,13 +3,23 @@
 from sqlalchemy.orm import Session
 from app.db import models
 from app.core import security
+from app.core.config import settings
+# importing these registers the session hooks that keep the in-memory doctor directory and loads current
+from app.services import doctor_directory, doctor_load  # noqa: F401
 from typing import Optional
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, text, func, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone, time
+import uuid
+import base64
+import hmac
 
 def create_patient(db: Session, full_name: str, email: str, password: str, secret_key_plain: str, city: Optional[str] = None):
     hashed = security.hash_password(password)
     encrypted = security.encrypt_bytes(secret_key_plain)
-    p = models.Patient(full_name=full_name, email=email, password_hash=hashed, secret_key_encrypted=encrypted, city=city)
+    p = models.Patient(full_name=full_name, email=email, password_hash=hashed, secret_key_encrypted=encrypted,
+                       secret_key_verifier=security.secret_key_verifier(secret_key_plain), city=city)
     db.add(p); db.commit(); db.refresh(p)
     return p
 
@@ -25,18 +35,29 @@ def verify_patient_credentials(db: Session, email: str, password: str, secret_ke
         return None
     if not security.verify_password(password, p.password_hash):
         return None
+    if p.secret_key_verifier is not None and security.verify_secret_key(secret_key_plain, p.secret_key_verifier):
+        return p
+    # no verifier (unreadable at migration 0011), or one that does not match: it may have been stamped under an
+    # earlier SECRET_KEY_VERIFIER_KEY (or the JWT_SECRET_KEY it defaults to), so the ciphertext decides, and a
+    # correct secret key re-stamps the verifier under the current key
     try:
         stored = security.decrypt_bytes(p.secret_key_encrypted)
     except Exception:
         return None
-    if stored != secret_key_plain:
+    if not hmac.compare_digest(stored.encode(), secret_key_plain.encode()):
         return None
+    p.secret_key_verifier = security.secret_key_verifier(secret_key_plain)
+    db.commit()
     return p
 
-def create_session(db: Session, patient_id, severity_score=None, red_flag=False, callback_required=False, ai_summary=None):
+def create_session(db: Session, patient_id, severity_score=None, red_flag=False, callback_required=False, ai_summary=None, commit=True):
     s = models.Session(patient_id=patient_id, severity_score=severity_score, red_flag=red_flag,
                        callback_required=callback_required, ai_summary=ai_summary)
-    db.add(s); db.commit(); db.refresh(s)
+    db.add(s)
+    if commit:
+        db.commit(); db.refresh(s)
+    else:
+        db.flush()
     return s
 
 def create_symptom_entry(db: Session, session_id, mood, symptom, intensity, notes_plain=None, photo_url=None):
@@ -53,13 +74,495 @@ def create_chat_log(db: Session, session_id, sender, message_plain, intent=None)
     db.add(l); db.commit(); db.refresh(l)
     return l
 
+def chat_log_rows(session_id, messages):
+    now = datetime.utcnow()
+    # microsecond offsets keep the insertion order stable under ORDER BY timestamp
+    return [{"log_id": uuid.uuid4(), "session_id": session_id, "sender": sender,
+             "message": security.encrypt_bytes(message_plain) if message_plain else None,
+             "timestamp": now + timedelta(microseconds=i), "intent": intent}
+            for i, (sender, message_plain, intent) in enumerate(messages)]
+
+def symptom_entry_rows(session_id, mood, symptoms):
+    now = datetime.utcnow()
+    rows = []
+    for s in symptoms:
+        intensity = s.get("intensity", 0)
+        rows.append({"entry_id": uuid.uuid4(), "session_id": session_id, "date": now, "mood": mood,
+                     "symptom": s.get("symptom", ""), "intensity": intensity,
+                     "notes": security.encrypt_bytes(s.get("notes")) if s.get("notes") else None,
+                     "photo_url": s.get("photo_url"), "red_flag": True if intensity and intensity >= 8 else False})
+    return rows
+
+def create_chat_logs(db: Session, session_id, messages):
+    """Insert (sender, message_plain, intent) tuples with one multi-row INSERT. Does not commit."""
+    rows = chat_log_rows(session_id, messages)
+    if rows:
+        db.execute(insert(models.ChatLog).values(rows))
+    return rows
+
+def create_symptom_entries(db: Session, session_id, mood, symptoms):
+    """Insert symptom dicts (symptom, intensity, notes, photo_url) with one multi-row INSERT. Does not commit."""
+    rows = symptom_entry_rows(session_id, mood, symptoms)
+    if rows:
+        db.execute(insert(models.SymptomEntry).values(rows))
+    return rows
+
 def get_sessions_by_patient(db: Session, patient_id):
-    return db.query(models.Session).filter(models.Session.patient_id == patient_id).order_by(models.Session.created_at.desc()).all()
+    return db.query(models.Session).filter(models.Session.patient_id == patient_id).order_by(models.Session.start_time.desc()).all()
+
+SESSION_PAGE_SIZE = 20
+SESSION_PAGE_MAX = 100
+
+def encode_session_cursor(session) -> str:
+    return base64.urlsafe_b64encode(f"{session.start_time.isoformat()}|{session.session_id}".encode()).decode()
+
+def decode_session_cursor(cursor: str):
+    """Return (start_time, session_id); raises ValueError for a malformed cursor."""
+    try:
+        start_time, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start_time), uuid.UUID(session_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def get_sessions_page(db: Session, patient_id, limit: int = SESSION_PAGE_SIZE, cursor: Optional[str] = None):
+    """Keyset page of a patient's sessions, newest first. Returns (sessions, next_cursor or None)."""
+    limit = max(1, min(limit or SESSION_PAGE_SIZE, SESSION_PAGE_MAX))
+    q = db.query(models.Session).filter(models.Session.patient_id == patient_id)
+    if cursor:
+        q = q.filter(tuple_(models.Session.start_time, models.Session.session_id) < decode_session_cursor(cursor))
+    rows = q.order_by(models.Session.start_time.desc(), models.Session.session_id.desc()).limit(limit + 1).all()
+    return rows[:limit], encode_session_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+def count_sessions_by_patient(db: Session, patient_id) -> int:
+    return db.query(func.count(models.Session.session_id)).filter(models.Session.patient_id == patient_id).scalar()
+
+# chat_logs and symptom_entries are range-partitioned by month on PostgreSQL (app/db/partitions.py).
+# Bounding the time column below by the owning session's start lets the planner skip every older
+# partition; the slack covers rows stamped slightly before the session by another writer's clock.
+PARTITION_PRUNE_SLACK = timedelta(days=1)
+
+def partition_floor(column, since: datetime):
+    """`column >= since - slack`, with `since` normalised to naive UTC for the naive symptom_entries.date column."""
+    if not column.type.timezone and since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return column >= since - PARTITION_PRUNE_SLACK
+
+def get_patient_session(db: Session, patient_id, session_id):
+    """The session if it belongs to the patient, else None."""
+    return db.query(models.Session).filter(models.Session.session_id == session_id,
+                                           models.Session.patient_id == patient_id).first()
+
+def get_chat_logs(db: Session, session_id, since: Optional[datetime] = None):
+    q = db.query(models.ChatLog).filter(models.ChatLog.session_id == session_id)
+    if since:
+        q = q.filter(partition_floor(models.ChatLog.timestamp, since))
+    return q.order_by(models.ChatLog.timestamp.asc()).all()
+
+def get_symptom_entries(db: Session, session_id, since: Optional[datetime] = None):
+    q = db.query(models.SymptomEntry).filter(models.SymptomEntry.session_id == session_id)
+    if since:
+        q = q.filter(partition_floor(models.SymptomEntry.date, since))
+    return q.all()
+
+CLINICAL_STATE_RECENT_SEVERITIES = 10
+CLINICAL_STATE_MAX_SYMPTOMS = 20
+
+def _severity_trend(severities: list) -> str:
+    if len(severities) < 2:
+        return "insufficient_data"
+    window = min(3, len(severities) // 2)
+    recent = sum(severities[-window:]) / window
+    before = sum(severities[-2 * window:-window]) / window
+    if recent - before >= 1:
+        return "worsening"
+    if before - recent >= 1:
+        return "improving"
+    return "stable"
+
+def fold_clinical_state(st, symptom_names: list, severity, new_session: bool = True):
+    """Apply one submission to a PatientClinicalState row in place."""
+    counts = dict(st.symptom_counts or {})
+    for name in symptom_names:
+        key = (name or "").strip().lower()
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+    if len(counts) > CLINICAL_STATE_MAX_SYMPTOMS:
+        counts = dict(sorted(counts.items(), key=lambda x: x[1], reverse=True)[:CLINICAL_STATE_MAX_SYMPTOMS])
+    severities = (list(st.recent_severities or []) + [float(severity or 0)])[-CLINICAL_STATE_RECENT_SEVERITIES:]
+    # reassign JSON columns so the change is detected
+    st.symptom_counts = counts
+    st.recent_severities = severities
+    st.trend = _severity_trend(severities)
+    if new_session:
+        st.session_count = (st.session_count or 0) + 1
+    st.last_session_at = datetime.utcnow()
+    return st
+
+def clinical_state_seed(dialect_name: str, patient_id):
+    """INSERT the patient's empty clinical state unless it exists (see daily_stats_seed)."""
+    return insert_ignoring_conflicts(dialect_name, models.PatientClinicalState).values(
+        patient_id=patient_id, symptom_counts={}, recent_severities=[], session_count=0)
+
+def clinical_state_for_update(patient_id):
+    return (select(models.PatientClinicalState).where(models.PatientClinicalState.patient_id == patient_id)
+            .with_for_update().execution_options(populate_existing=True))
+
+def update_patient_clinical_state(db: Session, patient_id, symptom_names: list, severity, new_session: bool = True):
+    """Fold one submission into the patient's compact clinical state. Does not commit; runs in the caller's transaction."""
+    db.execute(clinical_state_seed(db.get_bind().dialect.name, patient_id))
+    st = db.execute(clinical_state_for_update(patient_id)).scalars().one()
+    return fold_clinical_state(st, symptom_names, severity, new_session)
+
+def utc_day(dt):
+    """UTC calendar day of a (naive UTC or aware) timestamp; daily rollups are keyed by it."""
+    if dt is None:
+        return datetime.utcnow().date()
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.date()
+
+def time_of_day(hour: int) -> str:
+    return "morning" if 6 <= hour < 12 else "afternoon" if 12 <= hour < 18 else "evening" if 18 <= hour < 22 else "night"
+
+def _severity_bucket_column(severity: float) -> str:
+    return "low_severity_count" if severity <= 3 else "moderate_severity_count" if severity <= 6 else "high_severity_count"
+
+def _empty_daily_stats(patient_id, day) -> dict:
+    return dict(patient_id=patient_id, day=day, session_count=0, severity_sum=0, severity_max=0,
+                low_severity_count=0, moderate_severity_count=0, high_severity_count=0,
+                red_flag_count=0, symptom_count=0, mood_sum=0, mood_count=0,
+                symptom_counts={}, symptom_time_counts={})
+
+def new_daily_stats(patient_id, day):
+    return models.PatientDailyStats(**_empty_daily_stats(patient_id, day))
+
+def daily_stats_seed(dialect_name: str, patient_id, day):
+    """INSERT the empty rollup row for (patient, day) unless it exists. Two first submissions on the same day both
+    run it without a duplicate-key error, so the row can then always be read FOR UPDATE."""
+    return insert_ignoring_conflicts(dialect_name, models.PatientDailyStats).values(_empty_daily_stats(patient_id, day))
+
+def daily_stats_for_update(patient_id, day):
+    return (select(models.PatientDailyStats)
+            .where(models.PatientDailyStats.patient_id == patient_id, models.PatientDailyStats.day == day)
+            .with_for_update().execution_options(populate_existing=True))
+
+def fold_daily_stats(st, severity, red_flag: bool, mood, symptom_names: list, previous: Optional[tuple] = None):
+    """Apply one submission to a PatientDailyStats row in place.
+
+    previous is the session's (severity, red_flag) before a follow-up turn, so the
+    session is re-scored rather than counted twice; None for a new session.
+    """
+    severity = float(severity or 0)
+    if previous is None:
+        st.session_count += 1
+        st.red_flag_count += 1 if red_flag else 0
+    else:
+        old_severity = float(previous[0] or 0)
+        st.severity_sum -= old_severity
+        old_bucket = _severity_bucket_column(old_severity)
+        setattr(st, old_bucket, getattr(st, old_bucket) - 1)
+        st.red_flag_count += 1 if red_flag and not previous[1] else 0
+    st.severity_sum += severity
+    bucket = _severity_bucket_column(severity)
+    setattr(st, bucket, getattr(st, bucket) + 1)
+    st.severity_max = max(st.severity_max or 0, severity)
+
+    # reassign JSON columns (as copies) so the change is detected
+    st.symptom_counts, st.symptom_time_counts = dict(st.symptom_counts or {}), dict(st.symptom_time_counts or {})
+    # symptom entries are stamped with the submission time
+    period = time_of_day(datetime.utcnow().hour)
+    for name in symptom_names:
+        _count_symptom_entry(st, name, mood, period)
+    return st
+
+def _count_symptom_entry(st, name: str, mood, period: Optional[str]):
+    st.symptom_counts[name] = st.symptom_counts.get(name, 0) + 1
+    if period:
+        times = dict(st.symptom_time_counts.get(name) or {})
+        times[period] = times.get(period, 0) + 1
+        st.symptom_time_counts[name] = times
+    st.symptom_count += 1
+    if mood:
+        st.mood_sum += mood
+        st.mood_count += 1
 
-def get_chat_logs(db: Session, session_id):
-    return db.query(models.ChatLog).filter(models.ChatLog.session_id == session_id).order_by(models.ChatLog.timestamp.asc()).all()
+def update_patient_daily_stats(db: Session, patient_id, day, severity, red_flag: bool, mood, symptom_names: list, previous: Optional[tuple] = None):
+    """Fold one submission into the patient's rollup row for `day`. Does not commit; runs in the caller's transaction."""
+    db.execute(daily_stats_seed(db.get_bind().dialect.name, patient_id, day))
+    st = db.execute(daily_stats_for_update(patient_id, day)).scalars().one()
+    return fold_daily_stats(st, severity, red_flag, mood, symptom_names, previous)
+
+def get_patient_daily_stats(db: Session, patient_id):
+    return db.query(models.PatientDailyStats).filter(models.PatientDailyStats.patient_id == patient_id).order_by(models.PatientDailyStats.day.asc()).all()
+
+# Rebuilds patient_daily_stats from sessions and symptom_entries (same rules as fold_daily_stats)
+_BACKFILL_DAILY_STATS_SQL = """
+WITH s AS (
+    SELECT patient_id, (start_time AT TIME ZONE 'UTC')::date AS day,
+           count(*) AS session_count,
+           sum(coalesce(severity_score, 0)) AS severity_sum,
+           max(coalesce(severity_score, 0)) AS severity_max,
+           count(*) FILTER (WHERE coalesce(severity_score, 0) <= 3) AS low_severity_count,
+           count(*) FILTER (WHERE coalesce(severity_score, 0) > 3 AND coalesce(severity_score, 0) <= 6) AS moderate_severity_count,
+           count(*) FILTER (WHERE coalesce(severity_score, 0) > 6) AS high_severity_count,
+           count(*) FILTER (WHERE red_flag) AS red_flag_count
+    FROM sessions WHERE {scope}
+    GROUP BY 1, 2
+), per_symptom AS (
+    SELECT s.patient_id, (s.start_time AT TIME ZONE 'UTC')::date AS day, coalesce(e.symptom, '') AS symptom,
+           count(*) AS n,
+           count(*) FILTER (WHERE extract(hour FROM e.date) >= 6 AND extract(hour FROM e.date) < 12) AS morning,
+           count(*) FILTER (WHERE extract(hour FROM e.date) >= 12 AND extract(hour FROM e.date) < 18) AS afternoon,
+           count(*) FILTER (WHERE extract(hour FROM e.date) >= 18 AND extract(hour FROM e.date) < 22) AS evening,
+           count(*) FILTER (WHERE extract(hour FROM e.date) < 6 OR extract(hour FROM e.date) >= 22) AS night,
+           coalesce(sum(e.mood) FILTER (WHERE e.mood <> 0), 0) AS mood_sum,
+           count(*) FILTER (WHERE e.mood <> 0) AS mood_count
+    FROM symptom_entries e JOIN sessions s ON s.session_id = e.session_id
+    WHERE {scope_s}
+    GROUP BY 1, 2, 3
+), e AS (
+    SELECT patient_id, day, sum(n) AS symptom_count, sum(mood_sum) AS mood_sum, sum(mood_count) AS mood_count,
+           jsonb_object_agg(symptom, n)::json AS symptom_counts,
+           jsonb_object_agg(symptom, jsonb_strip_nulls(jsonb_build_object(
+               'morning', nullif(morning, 0), 'afternoon', nullif(afternoon, 0),
+               'evening', nullif(evening, 0), 'night', nullif(night, 0))))::json AS symptom_time_counts
+    FROM per_symptom GROUP BY 1, 2
+)
+INSERT INTO patient_daily_stats (patient_id, day, session_count, severity_sum, severity_max, low_severity_count,
+    moderate_severity_count, high_severity_count, red_flag_count, symptom_count, mood_sum, mood_count,
+    symptom_counts, symptom_time_counts, updated_at)
+SELECT s.patient_id, s.day, s.session_count, s.severity_sum, s.severity_max, s.low_severity_count,
+       s.moderate_severity_count, s.high_severity_count, s.red_flag_count, coalesce(e.symptom_count, 0),
+       coalesce(e.mood_sum, 0), coalesce(e.mood_count, 0), coalesce(e.symptom_counts, '{{}}'::json),
+       coalesce(e.symptom_time_counts, '{{}}'::json), now()
+FROM s LEFT JOIN e ON e.patient_id = s.patient_id AND e.day = s.day
+"""
+
+def _daily_stats_from_rows(db: Session, patient_id=None):
+    """Portable rebuild for non-PostgreSQL databases: stream sessions joined to their entries and fold them in Python."""
+    S, E = models.Session, models.SymptomEntry
+    q = db.query(S.patient_id, S.session_id, S.start_time, S.severity_score, S.red_flag, E.entry_id, E.symptom, E.mood, E.date
+                 ).outerjoin(E, E.session_id == S.session_id).filter(S.patient_id.isnot(None))
+    if patient_id:
+        q = q.filter(S.patient_id == patient_id)
+    stats, seen = {}, set()
+    for r in q.yield_per(1000):
+        key = (r.patient_id, utc_day(r.start_time))
+        st = stats.get(key) or stats.setdefault(key, new_daily_stats(*key))
+        if r.session_id not in seen:
+            seen.add(r.session_id)
+            fold_daily_stats(st, r.severity_score, r.red_flag, None, [])
+        if r.entry_id is not None:
+            _count_symptom_entry(st, r.symptom or "", r.mood, time_of_day(r.date.hour) if r.date else None)
+    return list(stats.values())
+
+def backfill_patient_daily_stats(db: Session, patient_id=None) -> int:
+    """Rebuild rollup rows from raw sessions and symptom entries, for one patient or everyone. Commits; returns rows written."""
+    q = db.query(models.PatientDailyStats)
+    if patient_id:
+        q = q.filter(models.PatientDailyStats.patient_id == patient_id)
+    q.delete(synchronize_session="fetch")
+    if db.get_bind().dialect.name != "postgresql":
+        rows = _daily_stats_from_rows(db, patient_id)
+        db.add_all(rows)
+        db.commit()
+        return len(rows)
+    params = {}
+    if patient_id:
+        scope, scope_s, params["patient_id"] = "patient_id = :patient_id", "s.patient_id = :patient_id", patient_id
+    else:
+        scope, scope_s = "patient_id IS NOT NULL", "s.patient_id IS NOT NULL"
+    written = db.execute(text(_BACKFILL_DAILY_STATS_SQL.format(scope=scope, scope_s=scope_s)), params).rowcount
+    db.commit()
+    return written
+
+def _idempotency_query(db: Session, patient_id, endpoint: str, key: str):
+    return db.query(models.IdempotencyKey).filter(models.IdempotencyKey.patient_id == patient_id,
+                                                  models.IdempotencyKey.endpoint == endpoint,
+                                                  models.IdempotencyKey.idempotency_key == key)
+
+def idempotency_lease(now: datetime) -> datetime:
+    return now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+
+def idempotency_abandoned(record, request_hash: str, now: datetime) -> bool:
+    """True when `record` has no response and its claimant's lease ran out, and this retry may take it over."""
+    return (record.response is None and record.request_hash == request_hash
+            and (record.locked_until is None or record.locked_until <= now))
+
+def idempotency_takeover(record, now: datetime):
+    """UPDATE re-leasing an abandoned claim; matches no row if the claimant finished or another retry won."""
+    K = models.IdempotencyKey
+    stale = K.locked_until.is_(None) | (K.locked_until <= now)
+    return update(K).where(K.key_id == record.key_id, K.response.is_(None), stale).values(locked_until=idempotency_lease(now))
+
+def claim_idempotency_key(db: Session, patient_id, endpoint: str, key: str, request_hash: str, ttl_hours: Optional[int] = None):
+    """
+    Return (record, created). created is False when an unexpired record already holds the key, unless its
+    claimant died without a response and the lease expired, in which case this request takes the key over.
+    """
+    now = datetime.utcnow()
+    existing = _idempotency_query(db, patient_id, endpoint, key).filter(models.IdempotencyKey.expires_at > now).first()
+    if existing:
+        if not idempotency_abandoned(existing, request_hash, now):
+            return existing, False
+        taken = db.execute(idempotency_takeover(existing, now)).rowcount
+        db.commit(); db.refresh(existing)
+        return existing, bool(taken)
+    _idempotency_query(db, patient_id, endpoint, key).delete(synchronize_session=False)
+    expires_at = now + timedelta(hours=ttl_hours or settings.IDEMPOTENCY_TTL_HOURS)
+    rec = models.IdempotencyKey(patient_id=patient_id, endpoint=endpoint, idempotency_key=key,
+                                request_hash=request_hash, expires_at=expires_at, locked_until=idempotency_lease(now))
+    db.add(rec)
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent request claimed the same key first
+        db.rollback()
+        return _idempotency_query(db, patient_id, endpoint, key).first(), False
+    db.refresh(rec)
+    return rec, True
+
+def store_idempotent_response(db: Session, record, response: dict):
+    record.response = response
+    db.commit()
+    return record
+
+def release_idempotency_key(db: Session, record):
+    # the failed handler may have left the transaction aborted
+    db.rollback()
+    db.delete(record); db.commit()
+
+def purge_expired_idempotency_keys(db: Session) -> int:
+    n = db.query(models.IdempotencyKey).filter(models.IdempotencyKey.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.commit()
+    return n
 
 def create_doctor(db: Session, full_name: str, specialization: str, clinic_name: str, city: str, contact_email: str):
     d = models.Doctor(full_name=full_name, specialization=specialization, clinic_name=clinic_name, city=city, contact_email=contact_email)
     db.add(d); db.commit(); db.refresh(d)
     return d
+
+def insert_ignoring_conflicts(dialect_name: str, model):
+    """INSERT ... ON CONFLICT DO NOTHING where the dialect supports it."""
+    if dialect_name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect_name == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+_WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+def weekly_hours(available_slots) -> list:
+    """Parse Doctor.available_slots, [{"weekday": 0-6 or "Mon", "start": "09:00", "end": "17:00"}, ...] in UTC,
+    into (weekday, opens, closes) tuples. Unparseable entries are skipped; no usable entry means Mon-Fri 09:00-17:00."""
+    hours = []
+    for w in available_slots if isinstance(available_slots, list) else []:
+        try:
+            day = w["weekday"] if isinstance(w["weekday"], int) else _WEEKDAYS.index(str(w["weekday"])[:3].lower())
+            hours.append((day, time.fromisoformat(w["start"]), time.fromisoformat(w["end"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return hours or [(day, time(9), time(17)) for day in range(5)]
+
+def slot_rows(doctor_id, available_slots, start: datetime, days: int, minutes: Optional[int] = None) -> list:
+    step = timedelta(minutes=minutes or settings.APPOINTMENT_SLOT_MINUTES)
+    hours = weekly_hours(available_slots)
+    rows = []
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).date()
+        for weekday, opens, closes in hours:
+            if day.weekday() != weekday:
+                continue
+            t, end = datetime.combine(day, opens), datetime.combine(day, closes)
+            while t + step <= end:
+                if t >= start:
+                    rows.append({"slot_id": uuid.uuid4(), "doctor_id": doctor_id, "starts_at": t, "ends_at": t + step})
+                t += step
+    return rows
+
+def ensure_doctor_slots(db: Session, doctor, start: Optional[datetime] = None, days: Optional[int] = None) -> int:
+    """Create the doctor's missing slots from `start` through APPOINTMENT_SLOT_HORIZON_DAYS. Does not commit.
+
+    `doctor` may be a Doctor row or a doctor_directory.DoctorEntry. Existing slots are left untouched.
+    """
+    rows = slot_rows(doctor.doctor_id, doctor.available_slots, start or datetime.utcnow(), days or settings.APPOINTMENT_SLOT_HORIZON_DAYS)
+    if rows:
+        db.execute(insert_ignoring_conflicts(db.get_bind().dialect.name, models.AppointmentSlot).values(rows))
+    return len(rows)
+
+SLOT_CLAIM_ATTEMPTS = 5
+
+def free_slot_query(doctor_id, earliest: datetime, skip_locked: bool = True):
+    # FOR UPDATE SKIP LOCKED: concurrent bookers pass over slots another transaction is claiming
+    return (select(models.AppointmentSlot)
+            .where(models.AppointmentSlot.doctor_id == doctor_id, models.AppointmentSlot.booked_at.is_(None),
+                   models.AppointmentSlot.starts_at >= earliest)
+            .order_by(models.AppointmentSlot.starts_at).limit(1).with_for_update(skip_locked=skip_locked))
+
+def claim_slot_statement(slot_id):
+    # conditional on the slot still being free: the guard where row locks do not exist (SQLite)
+    return (update(models.AppointmentSlot)
+            .where(models.AppointmentSlot.slot_id == slot_id, models.AppointmentSlot.booked_at.is_(None))
+            .values(booked_at=datetime.utcnow()))
+
+def claim_slot(db: Session, doctor_id, earliest: datetime, skip_locked: bool = True):
+    """Mark the doctor's first free slot at or after `earliest` as booked. Returns the slot or None. Does not commit."""
+    for _ in range(SLOT_CLAIM_ATTEMPTS):
+        slot = db.execute(free_slot_query(doctor_id, earliest, skip_locked)).scalars().first()
+        if slot is None:
+            return None
+        if db.execute(claim_slot_statement(slot.slot_id)).rowcount == 1:
+            return slot
+    return None
+
+def earliest_booking_time(appointment_type: str = "emergency") -> datetime:
+    lead = timedelta(minutes=settings.APPOINTMENT_MIN_LEAD_MINUTES)
+    return datetime.utcnow() + (lead if appointment_type == "emergency" else max(lead, timedelta(days=1)))
+
+def new_slot_appointment(slot, patient_id, doctor, session_id, status: str, notes=None):
+    return models.Appointment(patient_id=patient_id, doctor_id=doctor.doctor_id, session_id=session_id, slot_id=slot.slot_id,
+                              appointment_date=slot.starts_at, clinic_location=doctor.clinic_name, status=status, notes=notes)
+
+def book_slot(db: Session, patient_id, doctor, session_id, earliest: Optional[datetime] = None, status: str = "confirmed", notes=None):
+    """Claim the doctor's next free slot and create the appointment in it.
+
+    Slots are generated on demand when none is free. Returns the Appointment, or None when the
+    doctor is fully booked for the next APPOINTMENT_SLOT_HORIZON_DAYS. Does not commit.
+    """
+    earliest = earliest or earliest_booking_time()
+    slot = claim_slot(db, doctor.doctor_id, earliest)
+    if slot is None:
+        ensure_doctor_slots(db, doctor, earliest)
+        slot = claim_slot(db, doctor.doctor_id, earliest)
+    if slot is None:
+        return None
+    ap = new_slot_appointment(slot, patient_id, doctor, session_id, status, notes)
+    db.add(ap); db.flush()
+    record_patient_doctor(db, patient_id, doctor.doctor_id, ap.appointment_id)
+    return ap
+
+def patient_doctor_upsert(dialect_name: str, patient_id, doctor_id, appointment_id):
+    """INSERT the (patient, doctor) history row, or point the existing one at the new appointment."""
+    now = datetime.utcnow()
+    values = {"pd_id": uuid.uuid4(), "patient_id": patient_id, "doctor_id": doctor_id, "relationship_type": "current",
+              "last_appointment_id": appointment_id, "created_at": now, "updated_at": now}
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    stmt = dialect.insert(models.PatientDoctorHistory).values(values)
+    return stmt.on_conflict_do_update(index_elements=["patient_id", "doctor_id"],
+                                      set_={"last_appointment_id": appointment_id, "relationship_type": "current", "updated_at": now})
+
+def record_patient_doctor(db: Session, patient_id, doctor_id, appointment_id):
+    """Does not commit."""
+    db.execute(patient_doctor_upsert(db.get_bind().dialect.name, patient_id, doctor_id, appointment_id))
+
+CONTINUITY_CANDIDATES = 10
+
+def recent_doctor_ids_query(patient_id, days: Optional[int] = None):
+    since = datetime.utcnow() - timedelta(days=days or settings.CONTINUITY_WINDOW_DAYS)
+    return (select(models.PatientDoctorHistory.doctor_id)
+            .where(models.PatientDoctorHistory.patient_id == patient_id, models.PatientDoctorHistory.updated_at >= since)
+            .order_by(models.PatientDoctorHistory.updated_at.desc()).limit(CONTINUITY_CANDIDATES))
+
+def get_recent_doctor_ids(db: Session, patient_id, days: Optional[int] = None) -> list:
+    """Doctors the patient booked within CONTINUITY_WINDOW_DAYS, most recent first."""
+    return db.execute(recent_doctor_ids_query(patient_id, days)).scalars().all()
@@ -1,7 +1,7 @@
 """Initialization or Placeholder File."""
 # app/db/models.py
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import UUID, BYTEA, TIMESTAMP
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary
+from app.db.types import GUID
 import uuid
 from app.db.session import Base
 import sqlalchemy as sa
@@ -9,18 +9,20 @@ from datetime import datetime
 
 class Patient(Base):
     __tablename__ = "patients"
-    patient_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     full_name = Column(String(100), nullable=False)
     email = Column(String(120), unique=True)
     password_hash = Column(String(255))
-    secret_key_encrypted = Column(BYTEA)
+    secret_key_encrypted = Column(LargeBinary)
+    # security.secret_key_verifier(secret key); what logins compare against
+    secret_key_verifier = Column(String(64))
     city = Column(String(100))
-    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
-    updated_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Doctor(Base):
     __tablename__ = "doctors"
-    doctor_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    doctor_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     full_name = Column(String(100), nullable=False)
     specialization = Column(String(100))
     clinic_name = Column(String(150))
@@ -28,72 +30,180 @@ class Doctor(Base):
     contact_email = Column(String(120))
     contact_number = Column(String(20))
     available_slots = Column(JSON)
-    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
 
 class Session(Base):
     __tablename__ = "sessions"
-    session_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.patient_id", ondelete="CASCADE"))
-    start_time = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
-    end_time = Column(TIMESTAMP(timezone=True))
+    session_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(GUID(), ForeignKey("patients.patient_id", ondelete="CASCADE"))
+    start_time = Column(DateTime(timezone=True), default=datetime.utcnow)
+    end_time = Column(DateTime(timezone=True))
     severity_score = Column(sa.Numeric(3,1))
     red_flag = Column(Boolean, default=False)
     callback_required = Column(Boolean, default=False)
     ai_summary = Column(Text)
+    conversation_summary = Column(LargeBinary)
+    turn_count = Column(Integer, default=1)
     summary_sent_to = Column(String(20))
-    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
 
+# chat_logs and symptom_entries are range-partitioned by month on PostgreSQL (migration 0006); the database
+# primary key there is (id, time column), which is still unique on the id alone as mapped here
 class ChatLog(Base):
     __tablename__ = "chat_logs"
-    log_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.session_id", ondelete="CASCADE"))
+    log_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    session_id = Column(GUID(), ForeignKey("sessions.session_id", ondelete="CASCADE"))
     sender = Column(String(10))
-    message = Column(BYTEA)
-    timestamp = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    message = Column(LargeBinary)
+    timestamp = Column(DateTime(timezone=True), default=datetime.utcnow)
     intent = Column(String(100))
 
 class SymptomEntry(Base):
     __tablename__ = "symptom_entries"
-    entry_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.session_id", ondelete="CASCADE"))
+    entry_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    session_id = Column(GUID(), ForeignKey("sessions.session_id", ondelete="CASCADE"))
     date = Column(DateTime, default=datetime.utcnow)
     mood = Column(Integer)
     symptom = Column(String(100))
     intensity = Column(Integer)
-    notes = Column(BYTEA)
+    notes = Column(LargeBinary)
     photo_url = Column(Text)
     red_flag = Column(Boolean, default=False)
 
 class Appointment(Base):
     __tablename__ = "appointments"
-    appointment_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.patient_id", ondelete="CASCADE"))
-    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.doctor_id", ondelete="CASCADE"))
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.session_id"))
-    appointment_date = Column(TIMESTAMP(timezone=True))
+    appointment_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(GUID(), ForeignKey("patients.patient_id", ondelete="CASCADE"))
+    doctor_id = Column(GUID(), ForeignKey("doctors.doctor_id", ondelete="CASCADE"))
+    session_id = Column(GUID(), ForeignKey("sessions.session_id"))
+    # the claimed slot (crud.book_slot); unique, so a slot can back at most one appointment
+    slot_id = Column(GUID(), ForeignKey("appointment_slots.slot_id", ondelete="SET NULL"), unique=True)
+    appointment_date = Column(DateTime(timezone=True))
     status = Column(String(30), default="pending")
     clinic_location = Column(String(200))
-    notes = Column(BYTEA)
-    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
-    updated_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    notes = Column(LargeBinary)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Bookable [starts_at, ends_at) intervals generated from Doctor.available_slots (crud.ensure_doctor_slots);
+# booked_at is set when an appointment claims the slot. Created by migrations/versions/0007_appointment_slots.py
+class AppointmentSlot(Base):
+    __tablename__ = "appointment_slots"
+    __table_args__ = (sa.UniqueConstraint("doctor_id", "starts_at", name="uq_appointment_slots_doctor_start"),)
+    slot_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    doctor_id = Column(GUID(), ForeignKey("doctors.doctor_id", ondelete="CASCADE"), nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    ends_at = Column(DateTime(timezone=True), nullable=False)
+    booked_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
 
 class Notification(Base):
     __tablename__ = "notifications"
-    notification_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    notification_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     recipient_type = Column(String(20))
-    recipient_id = Column(UUID(as_uuid=True))
+    recipient_id = Column(GUID())
     channel = Column(String(30))
-    message = Column(BYTEA)
-    sent_time = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    message = Column(LargeBinary)
+    sent_time = Column(DateTime(timezone=True), default=datetime.utcnow)
     status = Column(String(30), default="sent")
 
+class PatientClinicalState(Base):
+    __tablename__ = "patient_clinical_state"
+    patient_id = Column(GUID(), ForeignKey("patients.patient_id", ondelete="CASCADE"), primary_key=True)
+    symptom_counts = Column(JSON, default=dict)
+    recent_severities = Column(JSON, default=list)
+    trend = Column(String(20), default="insufficient_data")
+    session_count = Column(Integer, default=0)
+    last_session_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Per-patient, per-UTC-day rollup of sessions and symptom entries, maintained on write (crud.fold_daily_stats)
+class PatientDailyStats(Base):
+    __tablename__ = "patient_daily_stats"
+    patient_id = Column(GUID(), ForeignKey("patients.patient_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(sa.Date, primary_key=True)
+    session_count = Column(Integer, default=0)
+    severity_sum = Column(sa.Float, default=0)
+    severity_max = Column(sa.Float, default=0)
+    low_severity_count = Column(Integer, default=0)
+    moderate_severity_count = Column(Integer, default=0)
+    high_severity_count = Column(Integer, default=0)
+    red_flag_count = Column(Integer, default=0)
+    symptom_count = Column(Integer, default=0)
+    mood_sum = Column(Integer, default=0)
+    mood_count = Column(Integer, default=0)
+    symptom_counts = Column(JSON, default=dict)
+    symptom_time_counts = Column(JSON, default=dict)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (sa.UniqueConstraint("patient_id", "endpoint", "idempotency_key", name="uq_idempotency_keys_scope"),)
+    key_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(GUID(), ForeignKey("patients.patient_id", ondelete="CASCADE"))
+    endpoint = Column(String(100), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    request_hash = Column(String(64))
+    response = Column(JSON)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    expires_at = Column(DateTime(timezone=True), index=True)
+    # in-progress lease of the request that claimed the key (crud.idempotency_takeover)
+    locked_until = Column(DateTime(timezone=True))
+
 class PatientDoctorHistory(Base):
     __tablename__ = "patient_doctor_history"
-    pd_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.patient_id", ondelete="CASCADE"))
-    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.doctor_id", ondelete="CASCADE"))
+    pd_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(GUID(), ForeignKey("patients.patient_id", ondelete="CASCADE"))
+    doctor_id = Column(GUID(), ForeignKey("doctors.doctor_id", ondelete="CASCADE"))
     relationship_type = Column(String(10), default="past")
-    last_appointment_id = Column(UUID(as_uuid=True), ForeignKey("appointments.appointment_id"))
-    notes = Column(BYTEA)
-    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
-    updated_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    # upserted on every booking (crud.record_patient_doctor)
+    last_appointment_id = Column(GUID(), ForeignKey("appointments.appointment_id"))
+    notes = Column(LargeBinary)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class EmailOutbox(Base):
+    """Emails committed with the change that caused them and delivered afterwards (app/services/email_outbox.py)."""
+    __tablename__ = "email_outbox"
+    email_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    appointment_id = Column(GUID(), ForeignKey("appointments.appointment_id", ondelete="CASCADE"))
+    kind = Column(String(50), nullable=False)
+    # Fernet-encrypted JSON: the messages carry symptom text
+    payload = Column(LargeBinary, nullable=False)
+    status = Column(String(20), default="pending")
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    next_attempt_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    sent_at = Column(DateTime(timezone=True))
+
+class KeyRotationProgress(Base):
+    """Per-table checkpoint of the Fernet re-encryption job (app/services/key_rotation.py)."""
+    __tablename__ = "key_rotation_progress"
+    table_name = Column(String(63), primary_key=True)
+    # security.key_id() of the key being rotated to; a different key restarts the table
+    key_id = Column(String(16), nullable=False)
+    last_pk = Column(String(64))
+    rows_scanned = Column(Integer, default=0)
+    rows_rotated = Column(Integer, default=0)
+    rows_failed = Column(Integer, default=0)
+    started_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    completed_at = Column(DateTime(timezone=True))
+
+# Indexes shaped to the hot query paths (created by migrations/versions/0003_hot_path_indexes.py and 0005)
+sa.Index("ix_sessions_patient_id_start_time_session_id", Session.patient_id, Session.start_time.desc(), Session.session_id.desc())
+sa.Index("ix_chat_logs_session_id_timestamp", ChatLog.session_id, ChatLog.timestamp)
+sa.Index("ix_symptom_entries_session_id_date", SymptomEntry.session_id, SymptomEntry.date)
+sa.Index("ix_appointments_patient_id_appointment_date", Appointment.patient_id, Appointment.appointment_date.desc())
+sa.Index("ix_appointments_doctor_id_appointment_date", Appointment.doctor_id, Appointment.appointment_date)
+sa.Index("ix_doctors_city_specialization", Doctor.city, Doctor.specialization)
+# next free slot for a doctor: only unbooked rows are indexed
+sa.Index("ix_appointment_slots_free", AppointmentSlot.doctor_id, AppointmentSlot.starts_at,
+         postgresql_where=AppointmentSlot.booked_at.is_(None), sqlite_where=AppointmentSlot.booked_at.is_(None))
+# continuity-of-care lookups (migration 0008): one row per pair, newest first per patient
+sa.Index("uq_patient_doctor_history_patient_doctor", PatientDoctorHistory.patient_id, PatientDoctorHistory.doctor_id, unique=True)
+sa.Index("ix_patient_doctor_history_patient_id_updated_at", PatientDoctorHistory.patient_id, PatientDoctorHistory.updated_at.desc())
+# outbox drain: due pending rows only (migration 0009)
+sa.Index("ix_email_outbox_pending", EmailOutbox.next_attempt_at,
+         postgresql_where=EmailOutbox.status == "pending", sqlite_where=EmailOutbox.status == "pending")
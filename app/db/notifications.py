@@ -0,0 +1,76 @@
+"""PostgreSQL LISTEN/NOTIFY fan-out for cross-process cache invalidation."""
+# app/db/notifications.py
+# Cross-process change notifications over PostgreSQL LISTEN/NOTIFY. Each process runs one background thread with
+# a dedicated connection listening on every subscribed channel. Callbacks get the payload string, or None when the
+# connection was (re)established and earlier notifications may have been missed. On other databases nothing is
+# delivered and subscribers fall back to their own TTLs.
+import selectors
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import text
+from app.db.session import engine
+
+_subscribers = defaultdict(list)
+_state = {"listener": None}
+_lock = threading.Lock()
+
+def enabled() -> bool:
+    return engine.dialect.name == "postgresql"
+
+def subscribe(channel: str, callback):
+    """Call callback(payload) for each NOTIFY on `channel` in this process."""
+    with _lock:
+        _subscribers[channel].append(callback)
+
+def notify(conn, channel: str, payload: str = ""):
+    """Queue a NOTIFY on the caller's connection; it is delivered only if that transaction commits."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+def _dispatch(channel: str, payload):
+    for callback in list(_subscribers.get(channel, [])):
+        try:
+            callback(payload)
+        except Exception as e:
+            print(f"⚠️ {channel} notification handler failed: {str(e)}")
+
+def _listen():
+    while True:
+        fairy = None
+        try:
+            fairy = engine.raw_connection()
+            conn = fairy.driver_connection
+            conn.autocommit = True
+            listening = set()
+            sel = selectors.DefaultSelector()
+            sel.register(conn, selectors.EVENT_READ)
+            while True:
+                for channel in set(_subscribers) - listening:
+                    conn.cursor().execute(f"LISTEN {channel}")
+                    listening.add(channel)
+                    # anything sent before we listened is lost
+                    _dispatch(channel, None)
+                if sel.select(timeout=5):
+                    conn.poll()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        _dispatch(n.channel, n.payload)
+        except Exception as e:
+            print(f"⚠️ Notification listener disconnected: {str(e)}")
+            for channel in list(_subscribers):
+                _dispatch(channel, None)
+            time.sleep(5)
+        finally:
+            if fairy is not None:
+                # never hand an autocommit LISTEN connection back to the pool
+                fairy.invalidate()
+
+def ensure_listener():
+    """Start this process's listener thread (PostgreSQL only); safe to call on every lookup."""
+    if _state["listener"] is not None or not enabled():
+        return
+    with _lock:
+        if _state["listener"] is None:
+            _state["listener"] = threading.Thread(target=_listen, name="db-notification-listener", daemon=True)
+            _state["listener"].start()
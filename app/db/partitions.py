@@ -0,0 +1,153 @@
+"""Monthly partition management for chat_logs and symptom_entries."""
+# app/db/partitions.py
+# Monthly range partitions for the append-only chat_logs / symptom_entries tables (PostgreSQL only;
+# created by migrations/versions/0006_partition_chat_logs_symptom_entries.py, maintained by
+# mcp_langgraph_app/maintain_partitions.py and at API startup). A DEFAULT partition (migration 0013) catches rows
+# for months that have no partition yet, so inserts never fail if maintenance lapses; ensure_partitions moves
+# them into their monthly partitions on its next run.
+import re
+import time
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.core.config import settings
+
+# table -> (partition key column, key is timestamptz)
+PARTITIONED_TABLES = {
+    "chat_logs": ("timestamp", True),
+    "symptom_entries": ("date", False),
+}
+
+# retention detaches with a plain DETACH PARTITION: PostgreSQL refuses DETACH ... CONCURRENTLY on a table that has
+# a DEFAULT partition. The ACCESS EXCLUSIVE lock it takes is brief, and lock_timeout makes it give way to live
+# traffic (retried a few times, then left for the next run) instead of queueing everything behind it.
+DETACH_LOCK_TIMEOUT_MS = 2000
+DETACH_ATTEMPTS = 5
+DETACH_RETRY_SECONDS = 1.0
+LOCK_NOT_AVAILABLE = "55P03"
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, n: int) -> date:
+    years, month = divmod(d.month - 1 + n, 12)
+    return date(d.year + years, month + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def _bound(table: str, month: date) -> str:
+    # timestamptz bounds are pinned to UTC so they do not depend on the session TimeZone
+    return f"'{month} 00:00:00{'+00' if PARTITIONED_TABLES[table][1] else ''}'"
+
+def is_partitioned(conn, table: str) -> bool:
+    return bool(conn.execute(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}).scalar())
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+def create_default_partition(conn, table: str) -> bool:
+    """Give `table` a DEFAULT partition, so rows outside every monthly partition are still accepted."""
+    name = default_partition_name(table)
+    if conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar():
+        return False
+    conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} DEFAULT"))
+    return True
+
+def _create_month_partition(conn, table: str, name: str, month: date):
+    key, nxt = PARTITIONED_TABLES[table][0], add_months(month, 1)
+    bounds = f"FOR VALUES FROM ({_bound(table, month)}) TO ({_bound(table, nxt)})"
+    default = default_partition_name(table)
+    in_range = f'"{key}" >= {_bound(table, month)} AND "{key}" < {_bound(table, nxt)}'
+    has_default = conn.execute(text("SELECT to_regclass(:n)"), {"n": default}).scalar()
+    if has_default and conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})")).scalar():
+        # rows for this month already landed in the default partition: move them into the new partition first,
+        # since PostgreSQL refuses a partition whose range overlaps rows in the default
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+        conn.execute(text(f"WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) INSERT INTO {name} SELECT * FROM moved"))
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}"))
+    else:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+
+def create_month_partitions(conn, table: str, first_month: date, last_month: date) -> list:
+    """Create any missing monthly partitions of `table` from first_month through last_month."""
+    created, month = [], month_start(first_month)
+    while month <= last_month:
+        name = partition_name(table, month)
+        if not conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar():
+            _create_month_partition(conn, table, name, month)
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+def drain_default_partition(conn, table: str) -> list:
+    """Create the monthly partitions for any rows sitting in `table`'s DEFAULT partition, moving them there."""
+    default = default_partition_name(table)
+    if not conn.execute(text("SELECT to_regclass(:n)"), {"n": default}).scalar():
+        return []
+    key = PARTITIONED_TABLES[table][0]
+    column = f"\"{key}\" AT TIME ZONE 'UTC'" if PARTITIONED_TABLES[table][1] else f'"{key}"'
+    months = conn.execute(text(f"SELECT DISTINCT date_trunc('month', {column})::date FROM {default}")).scalars().all()
+    created = []
+    for month in sorted(months):
+        created += create_month_partitions(conn, table, month, month)
+    return created
+
+def list_month_partitions(conn, table: str) -> list:
+    """[(partition name, month)] attached to `table`, oldest first."""
+    rows = conn.execute(text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                             "WHERE i.inhparent = to_regclass(:t)"), {"t": table}).scalars().all()
+    pattern = re.compile(rf"^{table}_y(\d{{4}})m(\d{{2}})$")
+    months = [(name, date(int(m.group(1)), int(m.group(2)), 1)) for name in rows for m in [pattern.match(name)] if m]
+    return sorted(months, key=lambda x: x[1])
+
+def ensure_partitions(engine, months_ahead: int = None) -> list:
+    """
+    Create partitions from the current month through `months_ahead` months ahead, and give any rows that fell into
+    the DEFAULT partition (maintenance lapsed) their monthly partition. No-op off PostgreSQL.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    this_month = month_start(datetime.utcnow().date())
+    created = []
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(conn, table):
+                created += drain_default_partition(conn, table)
+                created += create_month_partitions(conn, table, this_month, add_months(this_month, months_ahead))
+    return created
+
+def _detach(engine, table: str, name: str, archive_schema: str, drop: bool) -> bool:
+    """Detach one partition and archive or drop it in one short transaction; False if the lock was never granted."""
+    for _ in range(DETACH_ATTEMPTS):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = {DETACH_LOCK_TIMEOUT_MS}"))
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                if drop:
+                    conn.execute(text(f"DROP TABLE {name}"))
+                else:
+                    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+                    conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+            return True
+        except OperationalError as e:
+            if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+                raise
+            time.sleep(DETACH_RETRY_SECONDS)
+    return False
+
+def detach_expired_partitions(engine, retain_months: int, archive_schema: str = None, drop: bool = False) -> list:
+    """Detach partitions whose whole month is older than `retain_months`, then move them to the archive schema (or drop them).
+
+    Returns the partitions retired. One that stays locked by live traffic through every attempt is left attached
+    for the next run. No rows are DELETEd.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    archive_schema = archive_schema or settings.PARTITION_ARCHIVE_SCHEMA
+    cutoff = add_months(month_start(datetime.utcnow().date()), -retain_months)
+    with engine.connect() as conn:
+        expired = [(table, name) for table in PARTITIONED_TABLES if is_partitioned(conn, table)
+                   for name, month in list_month_partitions(conn, table) if add_months(month, 1) <= cutoff]
+    return [name for table, name in expired if _detach(engine, table, name, archive_schema, drop)]
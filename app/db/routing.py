@@ -0,0 +1,112 @@
+"""Primary/replica routing for read-only endpoints."""
+# app/db/routing.py
+# Read routing: read-only endpoints use the replica unless the patient just wrote or the replica lags.
+# Read-your-writes travels with the client: a write answers with the commit time in the X-Last-Write header and a
+# matching cookie, and reads carrying a marker younger than READ_YOUR_WRITES_SECONDS stay on the primary, whichever
+# worker or process serves them. A small per-process map covers clients that send neither back.
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Cookie, Header, Response
+from sqlalchemy import text
+from app.core.config import settings
+from app.core import auth
+from app.db.session import SessionLocal, ReplicaSessionLocal, replica_engine
+
+LAST_WRITE_HEADER = "X-Last-Write"
+LAST_WRITE_COOKIE = "last_write"
+
+logger = logging.getLogger(__name__)
+
+# patient_id -> wall-clock time of the patient's last write through this process, oldest first
+_recent_writes = OrderedDict()
+# sync endpoints call mark_write from the threadpool
+_recent_writes_lock = threading.Lock()
+_lag = {"checked_at": float("-inf"), "seconds": None}
+
+# (in recovery, lag): zero lag when the standby has replayed everything it received, otherwise the age of the
+# last replayed transaction
+_REPLICA_LAG_SQL = """
+SELECT pg_is_in_recovery(), CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+def mark_write(patient_id, response: Optional[Response] = None):
+    """Pin the patient's reads to the primary for READ_YOUR_WRITES_SECONDS, via `response` and in this process."""
+    if not patient_id:
+        return
+    now = time.time()
+    if response is not None:
+        response.headers[LAST_WRITE_HEADER] = f"{now:.3f}"
+        response.set_cookie(LAST_WRITE_COOKIE, f"{now:.3f}", max_age=int(settings.READ_YOUR_WRITES_SECONDS) + 1,
+                            httponly=True, samesite="lax")
+    key = str(patient_id)
+    with _recent_writes_lock:
+        _recent_writes[key] = now
+        _recent_writes.move_to_end(key)
+        # entries are in write order, so expired ones are all at the front
+        while _recent_writes and now - next(iter(_recent_writes.values())) >= settings.READ_YOUR_WRITES_SECONDS:
+            _recent_writes.popitem(last=False)
+
+def _marker_age(marker: Optional[str], now: float) -> Optional[float]:
+    try:
+        return now - float(marker)
+    except (TypeError, ValueError):
+        return None
+
+def _wrote_recently(patient_id, marker: Optional[str] = None) -> bool:
+    now = time.time()
+    age = _marker_age(marker, now)
+    # a slightly negative age is clock skew between the workers that wrote and that read
+    if age is not None and abs(age) < settings.READ_YOUR_WRITES_SECONDS:
+        return True
+    if not patient_id:
+        return False
+    with _recent_writes_lock:
+        at = _recent_writes.get(str(patient_id))
+    return at is not None and now - at < settings.READ_YOUR_WRITES_SECONDS
+
+def replica_lag_seconds() -> Optional[float]:
+    """Replica lag in seconds, re-checked at most every REPLICA_LAG_CHECK_SECONDS; None if the replica is unreachable."""
+    now = time.monotonic()
+    if now - _lag["checked_at"] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return _lag["seconds"]
+    try:
+        with replica_engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                in_recovery, seconds = conn.execute(text(_REPLICA_LAG_SQL)).one()
+                if in_recovery:
+                    seconds = float(seconds)
+                else:
+                    # not a standby: it never receives the primary's writes, so it is misconfigured, not fresh
+                    logger.warning("DATABASE_REPLICA_URL is not a standby (pg_is_in_recovery() is false); reading from the primary")
+                    seconds = None
+            else:
+                conn.execute(text("SELECT 1"))
+                seconds = 0.0
+    except Exception:
+        seconds = None
+    _lag.update(checked_at=now, seconds=seconds)
+    return seconds
+
+def use_replica(patient_id=None, marker: Optional[str] = None) -> bool:
+    if replica_engine is None or _wrote_recently(patient_id, marker):
+        return False
+    lag = replica_lag_seconds()
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+def get_read_db(response: Response, authorization: str = Header(None), x_last_write: Optional[str] = Header(None),
+                last_write: Optional[str] = Cookie(None)):
+    """Session for read-only endpoints: the replica when safe, otherwise the primary."""
+    # verifying here (through the token cache) means the endpoint's own check is a cache hit
+    replica = use_replica(auth.token_subject(authorization), x_last_write or last_write)
+    response.headers["X-Read-Source"] = "replica" if replica else "primary"
+    db = ReplicaSessionLocal() if replica else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,16 +1,67 @@
 """Initialization or Placeholder File."""
 # app/db/session.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+def _enable_sqlite_foreign_keys(engine):
+    """SQLite ignores ON DELETE CASCADE unless foreign keys are switched on per connection."""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+def _create_sync_engine(database_url: str):
+    is_sqlite = make_url(database_url).get_backend_name() == "sqlite"
+    # FastAPI runs sync routes in a threadpool, so SQLite connections must be shareable across threads
+    sync_engine = create_engine(database_url, pool_pre_ping=True,
+                                connect_args={"check_same_thread": False} if is_sqlite else {})
+    if is_sqlite:
+        _enable_sqlite_foreign_keys(sync_engine)
+    return sync_engine
+
+_is_sqlite = make_url(settings.DATABASE_URL).get_backend_name() == "sqlite"
+
+engine = _create_sync_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Read-only replica; None when DATABASE_REPLICA_URL is unset (reads then stay on the primary)
+replica_engine = _create_sync_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+def _async_engine_args(database_url: str):
+    """Map the sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    url = make_url(database_url)
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes ssl= instead of libpq's sslmode=
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            url = url.difference_update_query(["sslmode"])
+            if sslmode != "disable":
+                connect_args["ssl"] = "require"
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url, connect_args
+
+_async_url, _async_connect_args = _async_engine_args(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, pool_pre_ping=True, connect_args=_async_connect_args)
+if _is_sqlite:
+    _enable_sqlite_foreign_keys(async_engine.sync_engine)
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,28 @@
+"""Dialect-portable column types."""
+# app/db/types.py
+# Column types that map to the native PostgreSQL types and still work on SQLite (see DB_PROFILE in app/core/config.py).
+import uuid
+from sqlalchemy.types import TypeDecorator, CHAR
+from sqlalchemy.dialects import postgresql
+
+class GUID(TypeDecorator):
+    """Native UUID on PostgreSQL, CHAR(36) elsewhere; always returns uuid.UUID."""
+    impl = CHAR(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(CHAR(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == "postgresql" else str(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
@@ -2,15 +2,17 @@
 # app/services/appointment_scheduler.py
 from sqlalchemy.orm import Session
 from app.db import models
+from app.services import doctor_load, specializations
 from datetime import datetime, timedelta
-import random
 
 def find_doctor_for_symptoms(db: Session, city: str, symptoms: list):
-    # Simple: find doctors by city
-    q = db.query(models.Doctor).filter(models.Doctor.city == city).all()
-    if not q:
-        return None
-    return random.choice(q)
+    # the least loaded doctor of the best matching specialization, else of any specialization in the city
+    loads = doctor_load.current(db)
+    for specialization, _ in specializations.rank(symptoms):
+        doctor = loads.least_loaded(city, specialization)
+        if doctor:
+            return doctor
+    return loads.least_loaded(city)
 
 def create_appointment(db: Session, patient_id, doctor_id, session_id, appointment_date: datetime, clinic_location: str):
     ap = models.Appointment(patient_id=patient_id, doctor_id=doctor_id, session_id=session_id,
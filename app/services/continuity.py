@@ -0,0 +1,35 @@
+"""Continuity-of-care doctor routing and route counters."""
+# app/services/continuity.py
+# Continuity of care: a returning patient goes back to a doctor they booked recently (patient_doctor_history)
+# when that doctor fits the search, before any load balancing or LLM ranking. Route counters report how often
+# each path picks the doctor; they are per process, so the API records the routes its own searches returned.
+import threading
+from collections import Counter
+from typing import Optional
+from app.services.doctor_directory import lookup_key
+
+ROUTES = ("continuity", "specialist", "ranked", "fallback")
+
+_routes = Counter()
+_lock = threading.Lock()
+
+def pick_recent_doctor(directory, doctor_ids: list, city: str, specialization: Optional[str] = None):
+    """The most recent of `doctor_ids` still in the directory, in `city` and, when given, of `specialization`."""
+    for doctor_id in doctor_ids:
+        d = directory.get(doctor_id)
+        if d and lookup_key(d.city) == lookup_key(city) and (
+                not specialization or lookup_key(d.specialization) == lookup_key(specialization)):
+            return d
+    return None
+
+def record_route(route: Optional[str]):
+    if route:
+        with _lock:
+            _routes[route] += 1
+
+def route_stats() -> dict:
+    with _lock:
+        counts = {route: _routes.get(route, 0) for route in ROUTES}
+    total = sum(counts.values())
+    return {"total": total, "routes": counts,
+            "continuity_rate": round(counts["continuity"] / total, 3) if total else 0.0}
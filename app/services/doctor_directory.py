@@ -0,0 +1,133 @@
+"""In-memory doctor directory kept current across processes."""
+# app/services/doctor_directory.py
+# In-memory doctor directory indexed by city and by (city, specialization), so doctor lookups are dict accesses.
+# Any committed Doctor insert/update/delete invalidates it in-process; on PostgreSQL the commit also NOTIFYs
+# CHANNEL so the other API workers invalidate theirs. The next lookup reloads the table.
+# DOCTOR_DIRECTORY_TTL_SECONDS bounds staleness where notifications are unavailable (SQLite, listener down).
+# The whole-table snapshot only pays off in a long-lived process (the API). Short-lived ones, such as the MCP server
+# that is spawned per tool call, use in_city_async(): an indexed query for one city, never cached.
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Optional
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session as OrmSession
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.db import notifications
+
+CHANNEL = "doctor_directory"
+
+@dataclass(frozen=True)
+class DoctorEntry:
+    doctor_id: uuid.UUID
+    full_name: str
+    specialization: Optional[str]
+    clinic_name: Optional[str]
+    city: Optional[str]
+    contact_email: Optional[str]
+    contact_number: Optional[str]
+    available_slots: Optional[list]
+
+def lookup_key(value) -> str:
+    return (value or "").strip().casefold()
+
+@dataclass
+class DoctorDirectory:
+    """Immutable snapshot of the doctors table; replaced wholesale on reload."""
+    doctors: list
+    generation: int
+    loaded_at: float
+    by_id: dict = field(default_factory=dict)
+    by_city: dict = field(default_factory=dict)
+    by_city_specialization: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        for d in self.doctors:
+            self.by_id[str(d.doctor_id)] = d
+            self.by_city.setdefault(lookup_key(d.city), []).append(d)
+            self.by_city_specialization.setdefault((lookup_key(d.city), lookup_key(d.specialization)), []).append(d)
+
+    def in_city(self, city: str, specialization: Optional[str] = None) -> list:
+        if specialization is None:
+            return self.by_city.get(lookup_key(city), [])
+        return self.by_city_specialization.get((lookup_key(city), lookup_key(specialization)), [])
+
+    def get(self, doctor_id) -> Optional[DoctorEntry]:
+        return self.by_id.get(str(doctor_id))
+
+_state = {"directory": None, "generation": 0}
+_load_lock = threading.Lock()
+
+# oldest first, matching the order doctors were added
+_DOCTORS_QUERY = select(models.Doctor).order_by(models.Doctor.created_at, models.Doctor.doctor_id)
+
+def _entry(d) -> DoctorEntry:
+    return DoctorEntry(doctor_id=d.doctor_id, full_name=d.full_name, specialization=d.specialization, clinic_name=d.clinic_name,
+                       city=d.city, contact_email=d.contact_email, contact_number=d.contact_number, available_slots=d.available_slots)
+
+def _fresh(directory: Optional[DoctorDirectory]) -> bool:
+    return (directory is not None and directory.generation == _state["generation"]
+            and time.monotonic() - directory.loaded_at < settings.DOCTOR_DIRECTORY_TTL_SECONDS)
+
+def _install(doctors, generation: int) -> DoctorDirectory:
+    directory = DoctorDirectory([_entry(d) for d in doctors], generation, time.monotonic())
+    _state["directory"] = directory
+    return directory
+
+def invalidate():
+    """Mark the current snapshot stale; the next lookup reloads it."""
+    _state["generation"] += 1
+
+def current(db: Optional[OrmSession] = None) -> DoctorDirectory:
+    """The doctor directory, reloaded from the primary (or `db`) when stale."""
+    notifications.ensure_listener()
+    directory = _state["directory"]
+    if _fresh(directory):
+        return directory
+    with _load_lock:
+        directory = _state["directory"]
+        if _fresh(directory):
+            return directory
+        # read the generation first so an invalidation racing the load leaves the result stale
+        generation = _state["generation"]
+        if db is not None:
+            return _install(db.execute(_DOCTORS_QUERY).scalars().all(), generation)
+        with SessionLocal() as own:
+            return _install(own.execute(_DOCTORS_QUERY).scalars().all(), generation)
+
+def cached() -> Optional[DoctorDirectory]:
+    """The current snapshot if it is fresh, without loading one or starting the listener."""
+    directory = _state["directory"]
+    return directory if _fresh(directory) else None
+
+async def in_city_async(db, city: str, specialization: Optional[str] = None) -> DoctorDirectory:
+    """A one-off directory of the doctors in `city` (and of `specialization`), read through ix_doctors_city_specialization."""
+    query = _DOCTORS_QUERY.where(models.Doctor.city == city)
+    if specialization:
+        query = query.where(models.Doctor.specialization == specialization)
+    return DoctorDirectory([_entry(d) for d in (await db.execute(query)).scalars().all()], -1, time.monotonic())
+
+# --- change tracking -------------------------------------------------------------------------------------
+
+@event.listens_for(OrmSession, "after_flush")
+def _doctor_changes_flushed(session, _):
+    if not any(isinstance(o, models.Doctor) for o in chain(session.new, session.dirty, session.deleted)):
+        return
+    session.info["doctor_directory_changed"] = True
+    notifications.notify(session.connection(), CHANNEL)
+
+@event.listens_for(OrmSession, "after_commit")
+def _doctor_changes_committed(session):
+    if session.info.pop("doctor_directory_changed", False):
+        invalidate()
+
+@event.listens_for(OrmSession, "after_rollback")
+def _doctor_changes_rolled_back(session):
+    session.info.pop("doctor_directory_changed", None)
+
+# other workers' commits, and reconnects of the listener (payload None), both just mark the snapshot stale
+notifications.subscribe(CHANNEL, lambda payload: invalidate())
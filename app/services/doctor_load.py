@@ -0,0 +1,238 @@
+"""Incrementally maintained per-doctor appointment load."""
+# app/services/doctor_load.py
+# Per-doctor load: open appointments starting within the next 24 hours, kept in memory and updated incrementally.
+# Every known future appointment contributes two time-ordered events (entering the window 24h before it starts,
+# leaving it when it starts), so loads follow the clock without rescans. Per-group min-heaps (city, and
+# city + specialization) with lazy deletion give the least-loaded qualified doctor in O(log n).
+# Appointment inserts, deletes and changes to status / appointment_date / doctor_id committed in this process are
+# applied on commit (a change is a removal followed by a re-add); other workers' arrive over NOTIFY (CHANNEL).
+# A full resync from the database happens every DOCTOR_LOAD_RESYNC_SECONDS and whenever the directory reloads; that
+# window bounds how long writes outside the ORM unit of work (bulk UPDATE/DELETE, manual SQL) go unnoticed.
+# All of this is for long-lived processes. Where no warm tracker exists (the MCP server is a fresh process per tool
+# call), scoped_async() counts the next 24 hours for just the doctors a search can pick, instead of loading everything.
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session as OrmSession
+from app.core.config import settings
+from app.db import models, notifications
+from app.db.session import SessionLocal, AsyncSessionLocal
+from app.services import doctor_directory
+
+CHANNEL = "doctor_load"
+WINDOW = timedelta(hours=24)
+CLOSED_STATUSES = ("cancelled", "completed", "no_show")
+
+def _utc(dt: datetime) -> datetime:
+    """Naive UTC, the form the rest of the app stamps times in."""
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+def _groups(doctor) -> list:
+    city, spec = doctor_directory.lookup_key(doctor.city), doctor_directory.lookup_key(doctor.specialization)
+    return [(city,), (city, spec)]
+
+class DoctorLoad:
+    """Load counters and selection heaps over one doctor directory snapshot."""
+
+    def __init__(self, directory, appointments, now: datetime):
+        self.directory = directory
+        self.loaded_at = time.monotonic()
+        self.counts = {}
+        self.active = {}
+        self.events = []
+        self.heaps = {}
+        self.latest = {}
+        self.seq = itertools.count()
+        for appointment_id, doctor_id, when in appointments:
+            self.add(appointment_id, doctor_id, when, now, index=False)
+        for d in directory.doctors:
+            for group in _groups(d):
+                self._push(group, str(d.doctor_id))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+
+    def _push(self, group, doctor_id: str):
+        seq = next(self.seq)
+        self.latest[(group, doctor_id)] = seq
+        self.heaps.setdefault(group, []).append((self.counts.get(doctor_id, 0), seq, doctor_id))
+
+    def _bump(self, doctor_id: str, delta: int, index: bool = True):
+        self.counts[doctor_id] = self.counts.get(doctor_id, 0) + delta
+        doctor = self.directory.get(doctor_id)
+        if index and doctor:
+            for group in _groups(doctor):
+                seq = next(self.seq)
+                self.latest[(group, doctor_id)] = seq
+                heapq.heappush(self.heaps.setdefault(group, []), (self.counts[doctor_id], seq, doctor_id))
+
+    def add(self, appointment_id, doctor_id, when: datetime, now: datetime, index: bool = True):
+        """Account for one appointment; repeats (our own NOTIFY echoing back) are ignored."""
+        appointment_id, doctor_id, when = str(appointment_id), str(doctor_id), _utc(when)
+        if appointment_id in self.active or when <= now:
+            return
+        self.active[appointment_id] = (doctor_id, when)
+        if when <= now + WINDOW:
+            self._bump(doctor_id, 1, index)
+            heapq.heappush(self.events, (when, -1, doctor_id, appointment_id, when))
+        else:
+            heapq.heappush(self.events, (when - WINDOW, 1, doctor_id, appointment_id, when))
+
+    def remove(self, appointment_id, now: datetime):
+        """Forget a cancelled, closed, moved or deleted appointment; its queued events are dropped lazily."""
+        entry = self.active.pop(str(appointment_id), None)
+        if entry is None:
+            return
+        doctor_id, when = entry
+        # `now` has been advanced to, so the appointment is counted exactly when its window has opened
+        if when - WINDOW <= now:
+            self._bump(doctor_id, -1)
+
+    def advance(self, now: datetime):
+        """Apply window entries and exits that are due by `now`."""
+        while self.events and self.events[0][0] <= now:
+            at, delta, doctor_id, appointment_id, when = heapq.heappop(self.events)
+            if self.active.get(appointment_id) != (doctor_id, when):
+                continue
+            self._bump(doctor_id, delta)
+            if delta > 0:
+                heapq.heappush(self.events, (when, -1, doctor_id, appointment_id, when))
+            else:
+                del self.active[appointment_id]
+
+    def load(self, doctor_id) -> int:
+        return self.counts.get(str(doctor_id), 0)
+
+    def least_loaded(self, city: str, specialization: Optional[str] = None):
+        """The qualified doctor with the fewest open appointments; ties go to the one whose load changed longest ago."""
+        city_key = doctor_directory.lookup_key(city)
+        group = (city_key,) if specialization is None else (city_key, doctor_directory.lookup_key(specialization))
+        with _lock:
+            heap = self.heaps.get(group)
+            while heap:
+                _, seq, doctor_id = heap[0]
+                if self.latest.get((group, doctor_id)) == seq:
+                    return self.directory.get(doctor_id)
+                heapq.heappop(heap)
+        return None
+
+    def snapshot(self) -> list:
+        """Per-doctor load for monitoring, busiest first."""
+        with _lock:
+            rows = [{"doctor_id": str(d.doctor_id), "full_name": d.full_name, "city": d.city, "specialization": d.specialization,
+                     "open_appointments_24h": self.load(d.doctor_id)} for d in self.directory.doctors]
+        return sorted(rows, key=lambda r: -r["open_appointments_24h"])
+
+_state = {"tracker": None, "stale": False}
+_lock = threading.RLock()
+
+def _appointments_query(now: datetime):
+    return select(models.Appointment.appointment_id, models.Appointment.doctor_id, models.Appointment.appointment_date).where(
+        models.Appointment.appointment_date > now, models.Appointment.status.notin_(CLOSED_STATUSES))
+
+def _fresh(tracker: Optional[DoctorLoad], directory) -> bool:
+    return (tracker is not None and not _state["stale"] and tracker.directory is directory
+            and time.monotonic() - tracker.loaded_at < settings.DOCTOR_LOAD_RESYNC_SECONDS)
+
+def _current_if_fresh(directory, now: datetime) -> Optional[DoctorLoad]:
+    with _lock:
+        tracker = _state["tracker"]
+        if _fresh(tracker, directory):
+            tracker.advance(now)
+            return tracker
+    return None
+
+def _install(directory, rows, now: datetime) -> DoctorLoad:
+    with _lock:
+        tracker = DoctorLoad(directory, rows, now)
+        _state["tracker"], _state["stale"] = tracker, False
+        return tracker
+
+def current(db: Optional[OrmSession] = None) -> DoctorLoad:
+    """The load tracker, resynced from the database (or `db`) when stale."""
+    directory, now = doctor_directory.current(db), datetime.utcnow()
+    tracker = _current_if_fresh(directory, now)
+    if tracker:
+        return tracker
+    if db is not None:
+        return _install(directory, db.execute(_appointments_query(now)).all(), now)
+    with SessionLocal() as own:
+        return _install(directory, own.execute(_appointments_query(now)).all(), now)
+
+async def scoped_async(city: str, specialization: Optional[str] = None) -> DoctorLoad:
+    """
+    The process-wide tracker when it is warm. Otherwise a throwaway tracker over the doctors in `city` (and of
+    `specialization`) and their open appointments in the next 24 hours: two indexed queries, no listener thread.
+    """
+    now = datetime.utcnow()
+    directory = doctor_directory.cached()
+    tracker = _current_if_fresh(directory, now) if directory else None
+    if tracker:
+        return tracker
+    async with AsyncSessionLocal() as db:
+        directory = await doctor_directory.in_city_async(db, city, specialization)
+        ids = [d.doctor_id for d in directory.doctors]
+        query = _appointments_query(now).where(models.Appointment.doctor_id.in_(ids),
+                                               models.Appointment.appointment_date <= now + WINDOW)
+        rows = (await db.execute(query)).all() if ids else []
+    with _lock:
+        return DoctorLoad(directory, rows, now)
+
+def least_loaded(city: str, specialization: Optional[str] = None, db: Optional[OrmSession] = None):
+    return current(db).least_loaded(city, specialization)
+
+def _record(appointment_id, doctor_id, when: Optional[datetime]):
+    """Apply one appointment's committed state; no doctor or date means it no longer counts."""
+    with _lock:
+        tracker = _state["tracker"]
+        if tracker is not None:
+            now = datetime.utcnow()
+            tracker.advance(now)
+            tracker.remove(appointment_id, now)
+            if doctor_id and when:
+                tracker.add(appointment_id, doctor_id, when, now)
+
+# --- change tracking -------------------------------------------------------------------------------------
+
+TRACKED = ("status", "appointment_date", "doctor_id")
+
+def _open_state(a: models.Appointment):
+    if a.status in CLOSED_STATUSES or not a.doctor_id or not a.appointment_date:
+        return a.appointment_id, None, None
+    return a.appointment_id, a.doctor_id, a.appointment_date
+
+@event.listens_for(OrmSession, "after_flush")
+def _appointments_flushed(session, _):
+    changes = [_open_state(a) for a in session.new if isinstance(a, models.Appointment)]
+    changes += [_open_state(a) for a in session.dirty if isinstance(a, models.Appointment)
+                and any(getattr(inspect(a).attrs, name).history.has_changes() for name in TRACKED)]
+    changes += [(a.appointment_id, None, None) for a in session.deleted if isinstance(a, models.Appointment)]
+    changes = [c for c in changes if c[0] is not None]
+    if not changes:
+        return
+    session.info.setdefault("doctor_load_changes", []).extend(changes)
+    conn = session.connection()
+    for appointment_id, doctor_id, when in changes:
+        notifications.notify(conn, CHANNEL, f"{appointment_id}|{doctor_id or ''}|{when.isoformat() if when else ''}")
+
+@event.listens_for(OrmSession, "after_commit")
+def _appointments_committed(session):
+    for appointment_id, doctor_id, when in session.info.pop("doctor_load_changes", []):
+        _record(appointment_id, doctor_id, when)
+
+@event.listens_for(OrmSession, "after_rollback")
+def _appointments_rolled_back(session):
+    session.info.pop("doctor_load_changes", None)
+
+def _on_notification(payload):
+    if payload is None:
+        # the listener (re)connected and may have missed changes
+        _state["stale"] = True
+        return
+    appointment_id, doctor_id, when = payload.split("|")
+    _record(appointment_id, doctor_id or None, datetime.fromisoformat(when) if when else None)
+
+notifications.subscribe(CHANNEL, _on_notification)
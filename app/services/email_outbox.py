@@ -0,0 +1,200 @@
+"""Transactional outbox for booking emails and its delivery worker."""
+# app/services/email_outbox.py
+# Transactional email outbox. Callers enqueue() a message in the same transaction as the change it reports, so a
+# booking and its confirmation emails commit (or roll back) together and the caller never waits on SMTP.
+# The API process runs one worker thread that delivers due rows, including those the MCP server queues (the MCP server
+# speaks over stdio and runs no worker, so its emails wait for an API process). A worker claims a batch in
+# a short transaction (FOR UPDATE SKIP LOCKED, then a compare-and-set on attempts that also pushes next_attempt_at
+# EMAIL_OUTBOX_CLAIM_SECONDS out), commits, and only then talks to SMTP, so no row lock or connection is held
+# across a send. Results are recorded in a second transaction; a worker that dies mid-send leaves its rows to be
+# retried once the claim runs out. Failures retry with exponential backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS.
+# Commits in this process wake the worker at once; on PostgreSQL commits elsewhere do too via NOTIFY, otherwise
+# the worker polls every EMAIL_OUTBOX_POLL_SECONDS.
+import json
+import logging
+import os
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from sqlalchemy import event, select, update, func
+from sqlalchemy.orm import Session as OrmSession
+from app.core import security
+from app.core.config import settings, ROOT_DIR
+from app.db import models, notifications
+from app.db.session import SessionLocal
+
+CHANNEL = "email_outbox"
+APPOINTMENT_CONFIRMATION = "appointment_confirmation"
+BATCH_SIZE = 20
+# where the API stores symptom photos referenced by photo_urls
+UPLOADS_DIR = os.path.join(ROOT_DIR, "mcp_langgraph_app", "uploads", "symptom_photos")
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_state = {"worker": None}
+_lock = threading.Lock()
+
+def enqueue(db, kind: str, payload: dict, appointment_id=None) -> models.EmailOutbox:
+    """Add an outbox row to `db`'s transaction (sync or async session). Does not flush or commit."""
+    entry = models.EmailOutbox(appointment_id=appointment_id, kind=kind, status="pending", attempts=0,
+                               payload=security.encrypt_bytes(json.dumps(payload)))
+    db.add(entry)
+    return entry
+
+def _formatted_date(appointment_date: str) -> str:
+    try:
+        return datetime.fromisoformat(appointment_date.replace('Z', '+00:00')).strftime("%B %d, %Y at %I:%M %p")
+    except Exception:
+        return appointment_date
+
+def appointment_messages(p: dict, sender: str) -> list:
+    """The patient's confirmation and the doctor's notice (with symptom photos attached) for one appointment."""
+    prefix = "Emergency " if p.get("appointment_type", "emergency") == "emergency" else ""
+    date = _formatted_date(p["appointment_date"])
+    photo_urls = p.get("photo_urls") or []
+
+    patient_msg = MIMEMultipart("alternative")
+    patient_msg["Subject"] = f"{prefix}Appointment Confirmation"
+    patient_msg["From"] = sender
+    patient_msg["To"] = p["patient_email"]
+    patient_msg.attach(MIMEText(f"<html><body><h2>Appointment Confirmed</h2><p>Dear <strong>{p['patient_name']}</strong>,</p><p><strong>Doctor:</strong> Dr. {p['doctor_name']}</p><p><strong>Clinic:</strong> {p['clinic_name']}</p><p><strong>Date:</strong> {date}</p><p><strong>Symptoms:</strong> {p['symptoms_summary']}</p></body></html>", "html"))
+
+    doctor_msg = MIMEMultipart("alternative")
+    doctor_msg["Subject"] = f"New {prefix}Patient Appointment"
+    doctor_msg["From"] = sender
+    doctor_msg["To"] = p["doctor_email"]
+    photo_section = f"<p><strong>Symptom Photos:</strong> {len(photo_urls)} image(s) attached</p>" if photo_urls else ""
+    doctor_msg.attach(MIMEText(f"<html><body><h2>New Patient Appointment</h2><p>Dear <strong>Dr. {p['doctor_name']}</strong>,</p><p><strong>Patient:</strong> {p['patient_name']} ({p['patient_email']})</p><p><strong>Date:</strong> {date}</p><p><strong>Symptoms:</strong> {p['symptoms_summary']}</p>{photo_section}</body></html>", "html"))
+    for photo_url in photo_urls:
+        filename = photo_url.split("/")[-1]
+        filepath = os.path.join(UPLOADS_DIR, filename)
+        if not os.path.exists(filepath):
+            continue
+        # a missing or unreadable photo must not hold back the confirmation emails (or retry them forever)
+        try:
+            with open(filepath, "rb") as f:
+                image = MIMEImage(f.read())
+        except Exception as e:
+            logger.warning("Skipping photo attachment %s: %s", filename, e)
+            continue
+        image.add_header("Content-Disposition", "attachment", filename=filename)
+        doctor_msg.attach(image)
+    return [patient_msg, doctor_msg]
+
+def _send(messages: list):
+    server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT)
+    try:
+        server.starttls()
+        server.login(settings.SMTP_USER, settings.SMTP_PASS)
+        for msg in messages:
+            server.send_message(msg)
+    finally:
+        server.quit()
+
+def _deliver(kind: str, payload: bytes):
+    if kind != APPOINTMENT_CONFIRMATION:
+        raise ValueError(f"Unknown email kind {kind}")
+    _send(appointment_messages(json.loads(security.decrypt_bytes(payload)), settings.SMTP_USER))
+
+def _due_query(now: datetime):
+    return (select(models.EmailOutbox.email_id, models.EmailOutbox.kind, models.EmailOutbox.payload, models.EmailOutbox.attempts)
+            .where(models.EmailOutbox.status == "pending", models.EmailOutbox.next_attempt_at <= now)
+            .order_by(models.EmailOutbox.next_attempt_at).limit(BATCH_SIZE).with_for_update(skip_locked=True))
+
+def _outbox_row(email_id, attempts: int):
+    """UPDATE of one row, guarded by the attempt count its claimant saw (a compare-and-set where FOR UPDATE is a no-op)."""
+    return update(models.EmailOutbox).where(models.EmailOutbox.email_id == email_id, models.EmailOutbox.attempts == attempts,
+                                            models.EmailOutbox.status == "pending")
+
+def _claim(db, now: datetime) -> list:
+    """Claim a batch of due rows and commit; returns [(email_id, kind, payload, attempts), ...] with attempts counted."""
+    claimed = []
+    for email_id, kind, payload, attempts in db.execute(_due_query(now)).all():
+        attempts = attempts or 0
+        claim = _outbox_row(email_id, attempts).values(
+            attempts=attempts + 1, next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_SECONDS))
+        if db.execute(claim).rowcount == 1:
+            claimed.append((email_id, kind, payload, attempts + 1))
+    db.commit()
+    return claimed
+
+def deliver_due() -> dict:
+    """Send one batch of due emails. Returns counts of sent, retried and failed rows."""
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+    if not (settings.SMTP_HOST and settings.SMTP_USER and settings.SMTP_PASS):
+        return counts
+    with SessionLocal() as db:
+        claimed = _claim(db, datetime.utcnow())
+    results = []
+    for email_id, kind, payload, attempts in claimed:
+        try:
+            _deliver(kind, payload)
+            results.append((email_id, attempts, None))
+        except Exception as e:
+            results.append((email_id, attempts, str(e)[:1000]))
+    if not results:
+        return counts
+    with SessionLocal() as db:
+        now = datetime.utcnow()
+        for email_id, attempts, error in results:
+            if error is None:
+                values, outcome = {"status": "sent", "sent_at": now, "last_error": None}, "sent"
+            elif attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                values, outcome = {"status": "failed", "last_error": error}, "failed"
+            else:
+                values, outcome = {"last_error": error, "next_attempt_at": now + timedelta(
+                    seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1))}, "retried"
+            db.execute(_outbox_row(email_id, attempts).values(values))
+            counts[outcome] += 1
+        db.commit()
+    return counts
+
+def _run():
+    while True:
+        _wake.clear()
+        try:
+            counts = deliver_due()
+            if any(counts.values()):
+                print(f"📧 Email outbox: {counts['sent']} sent, {counts['retried']} to retry, {counts['failed']} failed")
+            if counts["sent"] + counts["retried"] + counts["failed"] >= BATCH_SIZE:
+                continue
+        except Exception as e:
+            print(f"⚠️ Email outbox worker error: {str(e)}")
+        _wake.wait(settings.EMAIL_OUTBOX_POLL_SECONDS)
+
+def start_worker():
+    """Start this process's delivery thread; call once from the API's startup."""
+    with _lock:
+        if _state["worker"] is None:
+            notifications.ensure_listener()
+            _state["worker"] = threading.Thread(target=_run, name="email-outbox-worker", daemon=True)
+            _state["worker"].start()
+
+def stats(db) -> dict:
+    """Outbox rows by status."""
+    rows = db.execute(select(models.EmailOutbox.status, func.count()).group_by(models.EmailOutbox.status)).all()
+    return {status: count for status, count in rows}
+
+# --- change tracking -------------------------------------------------------------------------------------
+
+@event.listens_for(OrmSession, "after_flush")
+def _outbox_flushed(session, _):
+    if not any(isinstance(o, models.EmailOutbox) for o in session.new):
+        return
+    session.info["email_outbox_queued"] = True
+    notifications.notify(session.connection(), CHANNEL)
+
+@event.listens_for(OrmSession, "after_commit")
+def _outbox_committed(session):
+    if session.info.pop("email_outbox_queued", False):
+        _wake.set()
+
+@event.listens_for(OrmSession, "after_rollback")
+def _outbox_rolled_back(session):
+    session.info.pop("email_outbox_queued", None)
+
+notifications.subscribe(CHANNEL, lambda payload: _wake.set())
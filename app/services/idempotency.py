@@ -0,0 +1,66 @@
+"""Idempotency-Key handling for write endpoints."""
+# app/services/idempotency.py
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, async_crud
+from app.core.config import settings
+import hashlib
+import json
+
+def request_fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _resolve(record, created: bool, fingerprint: str):
+    if created:
+        return record, None
+    if record is None:
+        raise HTTPException(status_code=409, detail="Idempotency-Key conflict, retry the request")
+    if record.request_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different payload")
+    if record.response is None:
+        # the claimant holds a lease of IDEMPOTENCY_LEASE_SECONDS; a retry after it expires takes the key over
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed",
+                            headers={"Retry-After": str(settings.IDEMPOTENCY_LEASE_SECONDS)})
+    return record, record.response
+
+def begin(db: Session, patient_id, endpoint: str, key: str | None, payload):
+    """
+    Claim an Idempotency-Key for this patient and endpoint.
+    Returns (record, stored_response). A non-None stored_response is the result of an
+    earlier identical request and should be returned as-is without running the handler.
+    Without a key, returns (None, None) and the request runs normally.
+    """
+    if not key:
+        return None, None
+    fingerprint = request_fingerprint(payload)
+    record, created = crud.claim_idempotency_key(db, patient_id, endpoint, key, fingerprint)
+    return _resolve(record, created, fingerprint)
+
+def complete(db: Session, record, response: dict):
+    """Store the response for replay; no-op when the request had no key."""
+    if record is not None:
+        crud.store_idempotent_response(db, record, response)
+    return response
+
+def release(db: Session, record):
+    """Drop a claimed key after a failed request so the client can retry it."""
+    if record is not None:
+        crud.release_idempotency_key(db, record)
+
+async def begin_async(db: AsyncSession, patient_id, endpoint: str, key: str | None, payload):
+    """Async variant of begin() for endpoints using get_async_db."""
+    if not key:
+        return None, None
+    fingerprint = request_fingerprint(payload)
+    record, created = await async_crud.claim_idempotency_key(db, patient_id, endpoint, key, fingerprint)
+    return _resolve(record, created, fingerprint)
+
+async def complete_async(db: AsyncSession, record, response: dict):
+    if record is not None:
+        await async_crud.store_idempotent_response(db, record, response)
+    return response
+
+async def release_async(db: AsyncSession, record):
+    if record is not None:
+        await async_crud.release_idempotency_key(db, record)
@@ -0,0 +1,146 @@
+"""Resumable re-encryption of stored data under the current Fernet key."""
+# app/services/key_rotation.py
+# Online Fernet key rotation. Once FERNET_KEY is the new key and the old one is listed in FERNET_OLD_KEYS, every
+# process reads both and writes only the new one; this job then re-encrypts the stored ciphertexts table by table.
+# Each table is walked in primary-key order in batches of short transactions. Every row is updated with a
+# compare-and-set on its old ciphertext, so a row a live request rewrote in the meantime is left alone, and a lock
+# timeout makes the job give way instead of queueing behind live writers. After each batch, the last key reached is
+# checkpointed in key_rotation_progress in the same transaction, so an interrupted run resumes where it stopped.
+# Rows already under the new key are skipped, which makes re-running a table cheap.
+import time
+from datetime import datetime
+from typing import Optional
+from cryptography.fernet import InvalidToken
+from sqlalchemy import select, update, text
+from sqlalchemy.exc import OperationalError
+from app.core import security
+from app.core.config import settings
+from app.db import models
+from app.db.partitions import PARTITIONED_TABLES
+from app.db.session import SessionLocal
+
+# table -> (model, primary key, encrypted column)
+TARGETS = {
+    "patients": (models.Patient, "patient_id", "secret_key_encrypted"),
+    "chat_logs": (models.ChatLog, "log_id", "message"),
+    "symptom_entries": (models.SymptomEntry, "entry_id", "notes"),
+    "appointments": (models.Appointment, "appointment_id", "notes"),
+    "sessions": (models.Session, "session_id", "conversation_summary"),
+    "notifications": (models.Notification, "notification_id", "message"),
+    "patient_doctor_history": (models.PatientDoctorHistory, "pd_id", "notes"),
+    "email_outbox": (models.EmailOutbox, "email_id", "payload"),
+}
+LOCK_TIMEOUT_MS = 2000
+LOCK_RETRY_SECONDS = 1.0
+LOCK_NOT_AVAILABLE = "55P03"
+
+def _reset(progress: models.KeyRotationProgress, key: str):
+    progress.key_id, progress.last_pk, progress.completed_at = key, None, None
+    progress.rows_scanned = progress.rows_rotated = progress.rows_failed = 0
+    progress.started_at = progress.updated_at = datetime.utcnow()
+
+def _progress(db, table: str, restart: bool) -> models.KeyRotationProgress:
+    key = security.key_id()
+    progress = db.get(models.KeyRotationProgress, table)
+    if progress is None:
+        progress = models.KeyRotationProgress(table_name=table)
+        db.add(progress)
+        _reset(progress, key)
+    elif restart or progress.key_id != key:
+        _reset(progress, key)
+    return progress
+
+def _summary(progress: models.KeyRotationProgress) -> dict:
+    return {"table": progress.table_name, "key_id": progress.key_id, "rows_scanned": progress.rows_scanned,
+            "rows_rotated": progress.rows_rotated, "rows_failed": progress.rows_failed,
+            "completed": progress.completed_at is not None}
+
+def _rotate_batch(db, table: str, batch_size: int) -> int:
+    """Re-encrypt the next batch of `table` and checkpoint it; returns the number of rows scanned."""
+    model, pk_name, column_name = TARGETS[table]
+    pk, column = getattr(model, pk_name), getattr(model, column_name)
+    # on partitioned tables the partition key lets each UPDATE touch a single partition
+    part = getattr(model, PARTITIONED_TABLES[table][0]) if table in PARTITIONED_TABLES else None
+    # re-encrypting is not a change to the row, so leave its updated_at alone
+    unchanged = {c.name: c for c in model.__table__.columns if c.onupdate is not None}
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}"))
+    progress = _progress(db, table, restart=False)
+    query = select(pk, column, *([part] if part is not None else [])).where(column.isnot(None)).order_by(pk).limit(batch_size)
+    if progress.last_pk:
+        query = query.where(pk > progress.last_pk)
+    rows = db.execute(query).all()
+
+    rotated = failed = 0
+    for row in rows:
+        cipher = row[1]
+        if security.is_current(cipher):
+            continue
+        try:
+            new_cipher = security.rotate(cipher)
+        except InvalidToken:
+            failed += 1
+            continue
+        where = [pk == row[0], column == cipher] + ([part == row[2]] if part is not None else [])
+        rotated += db.execute(update(model.__table__).where(*where).values({column_name: new_cipher, **unchanged})).rowcount
+
+    now = datetime.utcnow()
+    if rows:
+        progress.last_pk = str(rows[-1][0])
+        progress.rows_scanned += len(rows)
+        progress.rows_rotated += rotated
+        progress.rows_failed += failed
+    else:
+        progress.completed_at = now
+    progress.updated_at = now
+    db.commit()
+    return len(rows)
+
+def rotate_table(table: str, batch_size: Optional[int] = None, rows_per_second: Optional[float] = None,
+                 restart: bool = False) -> dict:
+    """
+    Re-encrypt `table` under the primary key, resuming from its checkpoint, at most `rows_per_second` rows per
+    second (0 for unthrottled). Returns the table's progress summary. Safe to interrupt at any point.
+    """
+    if table not in TARGETS:
+        raise ValueError(f"Unknown table {table}; expected one of {', '.join(TARGETS)}")
+    batch_size = batch_size or settings.KEY_ROTATION_BATCH_SIZE
+    rows_per_second = settings.KEY_ROTATION_ROWS_PER_SECOND if rows_per_second is None else rows_per_second
+
+    with SessionLocal() as db:
+        progress = _progress(db, table, restart)
+        db.commit()
+        if progress.completed_at is not None:
+            return _summary(progress)
+
+    while True:
+        started = time.monotonic()
+        with SessionLocal() as db:
+            try:
+                scanned = _rotate_batch(db, table, batch_size)
+            except OperationalError as e:
+                if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+                    raise
+                # lock timeout behind a live transaction: drop this batch and try it again shortly
+                db.rollback()
+                time.sleep(LOCK_RETRY_SECONDS)
+                continue
+            if not scanned:
+                return _summary(db.get(models.KeyRotationProgress, table))
+        if rows_per_second > 0:
+            time.sleep(max(0.0, scanned / rows_per_second - (time.monotonic() - started)))
+
+def status(db) -> list:
+    """Progress of every encrypted table against the current primary key."""
+    key = security.key_id()
+    rows = {p.table_name: p for p in db.execute(select(models.KeyRotationProgress)).scalars()}
+    result = []
+    for table in TARGETS:
+        progress = rows.get(table)
+        if progress is None or progress.key_id != key:
+            result.append({"table": table, "key_id": key, "rows_scanned": 0, "rows_rotated": 0,
+                           "rows_failed": 0, "completed": False})
+        else:
+            result.append(_summary(progress))
+    return result
@@ -0,0 +1,122 @@
+"""Symptom text to specialization matching."""
+# app/services/specializations.py
+# Symptom text -> ranked specializations. SYNONYMS is the data: each phrase maps to the specialization that treats
+# it. Phrases and input are split into words and singularised ("rashes" -> "rash"), and the phrases are compiled
+# once into an Aho-Corasick automaton over words, so one pass over the text finds every phrase in it, however many
+# phrases there are. Matching is on whole words: "heart" does not fire on "heartburn".
+import re
+from collections import deque
+from typing import Optional
+
+GENERAL_PRACTITIONER = "General Practitioner"
+
+SYNONYMS = {
+    "Cardiologist": ["chest pain", "chest tightness", "chest pressure", "heart", "heart pain", "palpitation",
+                     "racing heart", "irregular heartbeat", "arrhythmia", "high blood pressure", "hypertension"],
+    "Neurologist": ["headache", "migraine", "dizziness", "dizzy", "vertigo", "confusion", "confused", "seizure",
+                    "numbness", "tingling", "fainting", "memory loss", "tremor"],
+    "Dermatologist": ["rash", "skin", "itching", "itchy skin", "hives", "eczema", "acne", "blister", "lesion", "mole"],
+    "Gastroenterologist": ["nausea", "nauseous", "vomiting", "throwing up", "abdominal pain", "stomach pain",
+                           "stomach ache", "stomachache", "diarrhea", "diarrhoea", "constipation", "heartburn",
+                           "acid reflux", "bloating", "cramp"],
+    "Orthopedist": ["joint pain", "back pain", "knee pain", "shoulder pain", "neck pain", "hip pain", "sprain",
+                    "fracture", "broken bone", "stiff joint", "muscle pain"],
+}
+
+_KNOWN = {name.casefold(): name for name in [*SYNONYMS, GENERAL_PRACTITIONER]}
+
+def known(name) -> Optional[str]:
+    """The canonical spelling of a specialization this module knows (case-insensitive), else None."""
+    return _KNOWN.get(str(name or "").strip().casefold())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def _singular(word: str) -> str:
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def words(text: str) -> list:
+    return [_singular(w) for w in _WORD.findall((text or "").lower())]
+
+def _weighted(symptom) -> tuple:
+    """(text, intensity) from a symptom dict, a SymptomEntry/request model, or a bare string."""
+    if isinstance(symptom, str):
+        return symptom, 1
+    if isinstance(symptom, dict):
+        return symptom.get("symptom", ""), symptom.get("intensity") or 1
+    return symptom.symptom, getattr(symptom, "intensity", None) or 1
+
+class SpecializationMatcher:
+    """Aho-Corasick automaton whose alphabet is words; built once from a {specialization: [phrases]} table."""
+
+    def __init__(self, synonyms: dict):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for specialization, phrases in synonyms.items():
+            for phrase in phrases:
+                self._add(words(phrase), specialization)
+        self._link()
+
+    def _add(self, phrase: list, specialization: str):
+        node = 0
+        for w in phrase:
+            if w not in self.goto[node]:
+                self.goto.append({}); self.fail.append(0); self.out.append([])
+                self.goto[node][w] = len(self.goto) - 1
+            node = self.goto[node][w]
+        self.out[node].append((specialization, len(phrase)))
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for w, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and w not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(w, 0)
+                # a phrase ending here also ends every shorter phrase it has as a suffix
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+                queue.append(child)
+
+    def matches(self, text: str) -> list:
+        """(specialization, phrase length in words) for every phrase occurrence in `text`, in text order."""
+        found, node = [], 0
+        for w in words(text):
+            while node and w not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(w, 0)
+            found.extend(self.out[node])
+        return found
+
+    def rank(self, symptoms: list, free_text: str = "") -> list:
+        """
+        Specializations for the reported symptoms, best first, as [(specialization, score), ...].
+        Each phrase match scores its length in words (more specific phrases count more) times the symptom's
+        intensity; free text counts at intensity 1. Ties keep the order the specializations were first matched.
+        """
+        scores = {}
+        for text, weight in [_weighted(s) for s in symptoms or []] + [(free_text, 1)]:
+            for specialization, length in self.matches(text):
+                scores[specialization] = scores.get(specialization, 0) + length * weight
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+    def best(self, symptoms: list, free_text: str = "", default: Optional[str] = GENERAL_PRACTITIONER) -> Optional[str]:
+        ranked = self.rank(symptoms, free_text)
+        return ranked[0][0] if ranked else default
+
+matcher = SpecializationMatcher(SYNONYMS)
+
+def rank(symptoms: list, free_text: str = "") -> list:
+    return matcher.rank(symptoms, free_text)
+
+def best(symptoms: list, free_text: str = "", default: Optional[str] = GENERAL_PRACTITIONER) -> Optional[str]:
+    return matcher.best(symptoms, free_text, default)
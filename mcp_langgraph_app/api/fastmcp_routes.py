@@ -1,27 +1,18 @@
 """FastAPI routes using real FastMCP"""
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
+from app.db import routing
+from app.core.auth import get_patient_id_from_token
+from app.services import idempotency
 from mcp_langgraph_app.langgraph_agent.fastmcp_client import FastMCPClient
 from mcp_langgraph_app.langgraph_agent.agent_fixed import SymptomTrackerAgent
-from mcp_langgraph_app.config.settings import settings
-from jose import jwt
 import os
 
 router = APIRouter()
 
-def get_patient_id_from_token(authorization: str = Header(None)) -> str:
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
-    try:
-        scheme, token = authorization.split()
-    except:
-        raise HTTPException(status_code=401, detail="Invalid Authorization header")
-    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-    return payload.get("sub")
-
 @router.post("/api/v2/fastmcp/submit-symptoms")
-async def submit_symptoms_fastmcp(request: dict, authorization: str = Header(None), db: Session = Depends(get_db)):
+async def submit_symptoms_fastmcp(request: dict, response: Response, authorization: str = Header(None), idempotency_key: str = Header(None), debug: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Submit symptoms using real FastMCP protocol"""
     patient_id = get_patient_id_from_token(authorization)
     
@@ -32,14 +23,26 @@ async def submit_symptoms_fastmcp(request: dict, authorization: str = Header(Non
     if not symptoms or not free_text:
         raise HTTPException(status_code=400, detail="Symptoms and description required")
     
+    idem, stored = await idempotency.begin_async(db, patient_id, "fastmcp.submit_symptoms", idempotency_key, request)
+    if stored is not None:
+        return stored
+    
     # Use FastMCP
     server_script = os.path.join(os.path.dirname(os.path.dirname(__file__)), "mcp_server", "fastmcp_server.py")
     
-    async with FastMCPClient(server_script) as mcp_client:
-        agent = SymptomTrackerAgent(mcp_client)
-        result = await agent.process_symptoms(patient_id, symptoms, mood, free_text)
+    try:
+        async with FastMCPClient(server_script) as mcp_client:
+            agent = SymptomTrackerAgent(mcp_client)
+            result = await agent.process_symptoms(patient_id, symptoms, mood, free_text, thread_id=request.get("session_id"), debug=debug)
+    except Exception:
+        await idempotency.release_async(db, idem)
+        raise
     
-    return result
+    if not result.get("success"):
+        await idempotency.release_async(db, idem)
+        return result
+    routing.mark_write(patient_id, response)
+    return await idempotency.complete_async(db, idem, result)
 
 @router.get("/api/v2/fastmcp/tools")
 async def list_fastmcp_tools():
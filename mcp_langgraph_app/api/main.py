@@ -1,8 +1,9 @@
 """FastAPI application integrating MCP + LangGraph"""
-from fastapi import FastAPI, Depends, HTTPException, Header, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, Header, UploadFile, File, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 from pathlib import Path
@@ -14,20 +15,26 @@ import os
 # Add parent directories to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from app.db.session import get_db, engine, Base
+from app.db.session import get_db, get_async_db, engine
+from app.db import partitions
+from app.db import routing
+from app.db.routing import get_read_db
 from app.db import models
 from app import crud
+from app.core.auth import get_patient_id_from_token
+from app.services import idempotency, doctor_directory, doctor_load, continuity, email_outbox
 from app.schemas.patient import PatientCreate, PatientLogin, Token
 from jose import jwt
-from datetime import datetime, timedelta
+from sqlalchemy import func
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from mcp_langgraph_app.config.settings import settings
 from mcp_langgraph_app.langgraph_agent.fastmcp_client import FastMCPClient
 from mcp_langgraph_app.langgraph_agent.agent_fixed import SymptomTrackerAgent
 from mcp_langgraph_app.api.appointment_booking import router as appointment_router
 from mcp_langgraph_app.api.fastmcp_routes import router as fastmcp_router
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Schema is managed by Alembic migrations (alembic upgrade head), not created at import time
 
 # Initialize FastAPI
 app = FastAPI(
@@ -45,6 +52,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keep chat_logs / symptom_entries partitions created ahead of the writes that need them (no-op off PostgreSQL)
+@app.on_event("startup")
+def ensure_partitions():
+    try:
+        created = partitions.ensure_partitions(engine)
+        if created:
+            print(f"🗂️ Created partitions: {', '.join(created)}")
+    except Exception as e:
+        print(f"⚠️ Could not ensure partitions: {str(e)}")
+
+# Load the doctor directory before the first booking needs it
+@app.on_event("startup")
+def load_doctor_directory():
+    try:
+        print(f"🩺 Loaded {len(doctor_directory.current().doctors)} doctors into the directory")
+    except Exception as e:
+        print(f"⚠️ Could not load doctor directory: {str(e)}")
+
+# Deliver queued booking emails from this process
+@app.on_event("startup")
+def start_email_outbox():
+    email_outbox.start_worker()
+
 # Include routers
 app.include_router(appointment_router)
 app.include_router(fastmcp_router)
@@ -74,34 +104,13 @@ class SymptomSubmission(BaseModel):
     symptoms: List[SymptomInput]
     mood: int
     free_text: str
+    session_id: Optional[str] = None  # set to continue an existing session with a follow-up turn
 
 
 class AppointmentBooking(BaseModel):
     session_id: str
 
 
-# Helper Functions
-def get_patient_id_from_token(authorization: str = Header(None)) -> str:
-    """Extract patient ID from JWT token."""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
-    try:
-        scheme, token = authorization.split()
-        if scheme.lower() != "bearer":
-            raise HTTPException(status_code=401, detail="Invalid authentication scheme")
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid Authorization header format")
-    
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        patient_id = payload.get("sub")
-        if not patient_id:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        return patient_id
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token."""
     to_encode = data.copy()
@@ -173,16 +182,24 @@ def login(payload: PatientLogin, db: Session = Depends(get_db)):
 @app.post("/api/v2/symptoms/submit")
 async def submit_symptoms_langgraph(
     payload: SymptomSubmission,
+    http_response: Response,
     authorization: str = Header(None),
-    db: Session = Depends(get_db)
+    idempotency_key: str = Header(None),
+    debug: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Submit symptoms using LangGraph workflow with FastMCP tools.
     This is the new FastMCP + LangGraph powered endpoint.
+    Repeats carrying the same Idempotency-Key return the stored response.
+    Pass ?debug=true to include per-node timings under "trace".
     """
+    patient_id = get_patient_id_from_token(authorization)
+    idem, stored = await idempotency.begin_async(db, patient_id, "v2.symptoms.submit", idempotency_key, payload.dict())
+    if stored is not None:
+        return stored
+    
     try:
-        patient_id = get_patient_id_from_token(authorization)
-        
         # Convert symptoms to dict format
         symptoms_list = [
             {
@@ -201,13 +218,15 @@ async def submit_symptoms_langgraph(
                 patient_id=patient_id,
                 symptoms=symptoms_list,
                 mood=payload.mood,
-                free_text=payload.free_text
+                free_text=payload.free_text,
+                thread_id=payload.session_id,
+                debug=debug
             )
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result.get("error", "Processing failed"))
         
-        return {
+        response = {
             "success": True,
             "session_id": result["session_id"],
             "ai_analysis": result["ai_analysis"],
@@ -215,7 +234,12 @@ async def submit_symptoms_langgraph(
             "appointment_info": result.get("appointment_info", {}),
             "workflow_messages": result["messages"]
         }
+        if debug:
+            response["trace"] = result.get("trace")
+        routing.mark_write(patient_id, http_response)
+        return await idempotency.complete_async(db, idem, response)
     except Exception as e:
+        await idempotency.release_async(db, idem)
         import traceback
         print("\n" + "="*60)
         print("ERROR IN /api/v2/symptoms/submit:")
@@ -249,15 +273,21 @@ async def get_symptom_history(
 # Dashboard Routes
 @app.get("/api/v1/dashboard/sessions")
 def get_patient_sessions(
+    limit: int = crud.SESSION_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     authorization: str = Header(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get all patient sessions."""
+    """Get a page of patient sessions, newest first. Pass next_cursor back as `cursor` for the next page."""
     patient_id = get_patient_id_from_token(authorization)
     
-    sessions = crud.get_sessions_by_patient(db, patient_id)
+    try:
+        sessions, next_cursor = crud.get_sessions_page(db, patient_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {
+    result = {
         "sessions": [
             {
                 "session_id": str(s.session_id),
@@ -267,17 +297,24 @@ def get_patient_sessions(
                 "ai_summary": s.ai_summary
             }
             for s in sessions
-        ]
+        ],
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     }
+    if include_total:
+        result["total"] = crud.count_sessions_by_patient(db, patient_id)
+    return result
 
 
 @app.get("/api/v1/dashboard/session/{session_id}/details")
 def get_session_details(
     session_id: str,
+    log_offset: int = 0,
+    log_limit: Optional[int] = None,
     authorization: str = Header(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get detailed session information including chat logs."""
+    """Get detailed session information including chat logs (all of them, or the log_offset/log_limit window)."""
     patient_id = get_patient_id_from_token(authorization)
     
     # Verify session belongs to patient
@@ -289,16 +326,17 @@ def get_session_details(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Get symptoms
-    symptoms = db.query(models.SymptomEntry).filter(
-        models.SymptomEntry.session_id == session_id
-    ).all()
-    
-    # Get chat logs
-    chat_logs = crud.get_chat_logs(db, session_id)
+    # Get symptoms and chat logs, bounded by the session start so only its partitions are scanned
+    symptoms = crud.get_symptom_entries(db, session_id, since=session.start_time)
+    chat_logs = crud.get_chat_logs(db, session_id, since=session.start_time)
     
     from app.core import security
     
+    # one batch for the notes; messages are decrypted only for the window being returned
+    notes = security.decrypt_many([s.notes for s in symptoms], on_error="<decryption failed>")
+    window = slice(log_offset, None if log_limit is None else log_offset + log_limit)
+    messages = security.LazyDecrypted([log.message for log in chat_logs], on_error="<decryption failed>")[window]
+    
     return {
         "session": {
             "session_id": str(session.session_id),
@@ -311,124 +349,97 @@ def get_session_details(
             {
                 "symptom": s.symptom,
                 "intensity": s.intensity,
-                "notes": security.decrypt_bytes(s.notes) if s.notes else None,
+                "notes": note,
                 "photo_url": s.photo_url
             }
-            for s in symptoms
+            for s, note in zip(symptoms, notes)
         ],
         "chat_logs": [
             {
                 "sender": log.sender,
-                "message": security.decrypt_bytes(log.message) if log.message else "",
+                "message": message or "",
                 "timestamp": log.timestamp.isoformat() if log.timestamp else None
             }
-            for log in chat_logs
-        ]
+            for log, message in zip(chat_logs[window], messages)
+        ],
+        "chat_logs_total": len(chat_logs)
     }
 
 
 @app.get("/api/v1/dashboard/insights")
 def get_dashboard_insights(
     authorization: str = Header(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get comprehensive dashboard insights."""
+    """Get comprehensive dashboard insights from the per-day rollup (one row per active day)."""
     try:
-        from sqlalchemy import desc
-        from datetime import datetime, timedelta, timezone
-        from collections import defaultdict
-        
         patient_id = get_patient_id_from_token(authorization)
-        sessions = db.query(models.Session).filter(
-            models.Session.patient_id == patient_id
-        ).order_by(desc(models.Session.start_time)).all()
+        days = crud.get_patient_daily_stats(db, patient_id)
+        total_sessions = sum(d.session_count for d in days)
         
-        if not sessions:
-            return {"total_sessions": 0, "total_symptoms": 0, "avg_severity": 0, "red_flag_count": 0, "weekly_trend": [], "monthly_overview": {}, "symptom_patterns": {}, "top_symptoms": {}}
+        if not total_sessions:
+            return {"total_sessions": 0, "total_symptoms": 0, "avg_severity": 0, "red_flag_count": 0, "weekly_trend": [], "monthly_overview": {}, "symptom_patterns": {}, "top_symptoms": {}, "daily_history": []}
         
-        symptoms = db.query(models.SymptomEntry).join(models.Session).filter(models.Session.patient_id == patient_id).all()
-        appointments = db.query(models.Appointment).filter(models.Appointment.patient_id == patient_id).all()
+        # Day boundaries are UTC, matching how the rollup is keyed
+        now = datetime.now(timezone.utc)
+        today = now.date()
+        week_start = today - timedelta(days=today.weekday())
+        by_day = {d.day: d for d in days}
+        month = [d for d in days if d.day >= today.replace(day=1)]
+        month_sessions = sum(d.session_count for d in month)
         
         # Current week daily trend
-        now = datetime.now(timezone.utc)
-        week_start = now - timedelta(days=now.weekday())
-        daily_data = {}
+        weekly_trend = []
         for i in range(7):
-            day = week_start + timedelta(days=i)
-            daily_data[day.strftime("%Y-%m-%d")] = {"day": day.strftime("%a"), "severity": 0, "count": 0}
+            d = by_day.get(week_start + timedelta(days=i))
+            weekly_trend.append({
+                "day": (week_start + timedelta(days=i)).strftime("%a"),
+                "avg_severity": round(d.severity_sum / d.session_count, 1) if d and d.session_count else 0
+            })
         
-        for s in sessions:
-            if s.start_time:
-                try:
-                    st = s.start_time if s.start_time.tzinfo else s.start_time.replace(tzinfo=timezone.utc)
-                    if st >= week_start:
-                        day_key = st.strftime("%Y-%m-%d")
-                        if day_key in daily_data:
-                            daily_data[day_key]["count"] += 1
-                            daily_data[day_key]["severity"] += float(s.severity_score or 0)
-                except:
-                    pass
+        weekdays = Counter()
+        for d in month:
+            weekdays[d.day.strftime("%A")] += d.session_count
         
-        weekly_trend = [{"day": v["day"], "avg_severity": round(v["severity"] / v["count"], 1) if v["count"] > 0 else 0} for k, v in sorted(daily_data.items())]
+        symptom_counts, symptom_patterns = Counter(), {}
+        for d in days:
+            symptom_counts.update(d.symptom_counts or {})
+            for name, periods in (d.symptom_time_counts or {}).items():
+                pattern = symptom_patterns.setdefault(name, {"morning": 0, "afternoon": 0, "evening": 0, "night": 0})
+                for period, n in periods.items():
+                    pattern[period] += n
+        mood_count = sum(d.mood_count for d in days)
         
-        # Severity distribution
-        severity_dist = {"Low (0-3)": 0, "Moderate (4-6)": 0, "High (7-10)": 0}
-        for s in sessions:
-            sev = float(s.severity_score or 0)
-            if sev <= 3:
-                severity_dist["Low (0-3)"] += 1
-            elif sev <= 6:
-                severity_dist["Moderate (4-6)"] += 1
-            else:
-                severity_dist["High (7-10)"] += 1
-        
-        # Monthly overview
-        try:
-            current_month = now.strftime("%Y-%m")
-            month_sessions = [s for s in sessions if s.start_time and s.start_time.strftime("%Y-%m") == current_month]
-            day_names = [s.start_time.strftime("%A") for s in month_sessions if s.start_time]
-            most_active = max(set(day_names), key=day_names.count) if day_names else "N/A"
-        except:
-            month_sessions = []
-            most_active = "N/A"
-        
-        monthly_overview = {
-            "month": now.strftime("%B %Y"),
-            "total_sessions": len(month_sessions),
-            "avg_severity": round(sum(float(s.severity_score or 0) for s in month_sessions) / len(month_sessions), 1) if month_sessions else 0,
-            "red_flags": sum(1 for s in month_sessions if s.red_flag),
-            "most_active_day": most_active
-        }
-        
-        # Symptom patterns
-        symptom_by_time = defaultdict(lambda: {"morning": 0, "afternoon": 0, "evening": 0, "night": 0})
-        for symptom in symptoms:
-            try:
-                dt = symptom.date if hasattr(symptom, 'date') and symptom.date else None
-                if dt:
-                    hour = dt.hour
-                    time_of_day = "morning" if 6 <= hour < 12 else "afternoon" if 12 <= hour < 18 else "evening" if 18 <= hour < 22 else "night"
-                    symptom_by_time[symptom.symptom][time_of_day] += 1
-            except:
-                pass
-        
-        # Top symptoms
-        symptom_counts = {}
-        for s in symptoms:
-            symptom_counts[s.symptom] = symptom_counts.get(s.symptom, 0) + 1
-        top_symptoms = dict(sorted(symptom_counts.items(), key=lambda x: x[1], reverse=True)[:5]) if symptom_counts else {}
+        appointments_count = db.query(func.count(models.Appointment.appointment_id)).filter(
+            models.Appointment.patient_id == patient_id
+        ).scalar()
         
         return {
-            "total_sessions": len(sessions),
-            "total_symptoms": len(symptoms),
-            "avg_severity": round(sum(float(s.severity_score or 0) for s in sessions) / len(sessions), 1),
-            "red_flag_count": sum(1 for s in sessions if s.red_flag),
-            "appointments_count": len(appointments),
+            "total_sessions": total_sessions,
+            "total_symptoms": sum(d.symptom_count for d in days),
+            "avg_severity": round(sum(d.severity_sum for d in days) / total_sessions, 1),
+            "red_flag_count": sum(d.red_flag_count for d in days),
+            "appointments_count": appointments_count,
             "weekly_trend": weekly_trend,
-            "monthly_overview": monthly_overview,
-            "severity_distribution": severity_dist,
-            "top_symptoms": top_symptoms,
-            "avg_mood": round(sum(s.mood for s in symptoms if hasattr(s, 'mood') and s.mood) / len([s for s in symptoms if hasattr(s, 'mood') and s.mood]), 1) if any(hasattr(s, 'mood') and s.mood for s in symptoms) else 0
+            "monthly_overview": {
+                "month": now.strftime("%B %Y"),
+                "total_sessions": month_sessions,
+                "avg_severity": round(sum(d.severity_sum for d in month) / month_sessions, 1) if month_sessions else 0,
+                "red_flags": sum(d.red_flag_count for d in month),
+                "most_active_day": weekdays.most_common(1)[0][0] if month_sessions else "N/A"
+            },
+            "severity_distribution": {
+                "Low (0-3)": sum(d.low_severity_count for d in days),
+                "Moderate (4-6)": sum(d.moderate_severity_count for d in days),
+                "High (7-10)": sum(d.high_severity_count for d in days)
+            },
+            "symptom_patterns": symptom_patterns,
+            "top_symptoms": dict(symptom_counts.most_common(5)),
+            "avg_mood": round(sum(d.mood_sum for d in days) / mood_count, 1) if mood_count else 0,
+            "daily_history": [
+                {"date": d.day.isoformat(), "sessions": d.session_count, "avg_severity": round(d.severity_sum / d.session_count, 1) if d.session_count else 0}
+                for d in days if d.day > today - timedelta(days=30)
+            ]
         }
     except Exception as e:
         import traceback
@@ -476,10 +487,28 @@ def create_doctor(
     }
 
 
+@app.get("/api/v1/admin/doctors/load")
+def doctor_loads():
+    """Open appointments per doctor in the next 24 hours, as used for assignment (this worker's view)."""
+    return {"window_hours": 24, "doctors": doctor_load.current().snapshot()}
+
+
+@app.get("/api/v1/admin/email-outbox")
+def email_outbox_status(db: Session = Depends(get_db)):
+    """Queued booking emails by delivery status."""
+    return email_outbox.stats(db)
+
+
+@app.get("/api/v1/admin/doctors/routing")
+def doctor_routing():
+    """How this worker's doctor searches picked the doctor; "continuity" skipped ranking for a returning patient."""
+    return continuity.route_stats()
+
+
 @app.get("/api/v1/admin/doctors")
-def list_doctors(db: Session = Depends(get_db)):
+def list_doctors():
     """List all doctors."""
-    doctors = db.query(models.Doctor).all()
+    doctors = doctor_directory.current().doctors
     
     return {
         "doctors": [
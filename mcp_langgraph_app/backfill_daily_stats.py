@@ -0,0 +1,38 @@
+"""Rebuild the patient_daily_stats rollup from raw sessions and symptom entries
+
+Run once after migrating to 0004_patient_daily_stats, or any time to repair drift:
+    python backfill_daily_stats.py                  # every patient
+    python backfill_daily_stats.py --patient-id ID  # one patient
+"""
+import argparse
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.db.session import SessionLocal
+from app import crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patient-id", help="only rebuild this patient's rows")
+    args = parser.parse_args()
+
+    print(f"📊 Rebuilding daily stats for {'patient ' + args.patient_id if args.patient_id else 'all patients'}...")
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        written = crud.backfill_patient_daily_stats(db, args.patient_id)
+        print(f"✅ Wrote {written:,} daily rows in {time.perf_counter() - t0:.1f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Backfill failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Bulk decryption benchmark for security.decrypt_many: inline versus the thread pool
+
+Encrypts --rows messages of each --sizes length (characters) under the configured FERNET_KEY,
+then decrypts them --rounds times per strategy:
+    inline   one pass in the calling thread (DECRYPT_WORKERS=1, the default)
+    pool     DECRYPT_CHUNK_SIZE chunks across --workers threads, as decrypt_many does when
+             DECRYPT_WORKERS > 1 and the batch reaches DECRYPT_PARALLEL_THRESHOLD
+Reports rows per second and the pool's speedup. Fernet runs mostly under the GIL, so only set
+DECRYPT_WORKERS above 1 on hosts where this shows a clear gain. No database is touched.
+
+Usage:
+    python benchmarks/bench_decrypt.py --rows 2000 --workers 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core import security
+
+
+def inline(ciphers, pool):
+    return security._decrypt_chunk(ciphers, None)
+
+
+def pooled(ciphers, pool):
+    size = security.DECRYPT_CHUNK_SIZE
+    chunks = [ciphers[i:i + size] for i in range(0, len(ciphers), size)]
+    return [text for chunk in pool.map(lambda c: security._decrypt_chunk(c, None), chunks) for text in chunk]
+
+
+def timed(strategy, ciphers, pool, rounds: int) -> float:
+    """Median seconds per pass over `ciphers`, after one warm-up pass."""
+    strategy(ciphers, pool)
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        strategy(ciphers, pool)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="ciphertexts per batch")
+    parser.add_argument("--sizes", default="200,2000,20000", help="comma-separated plaintext lengths")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="pool threads")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"🔐 {args.rows:,} rows per batch, {args.workers} pool worker(s), {os.cpu_count()} CPU(s), "
+          f"median of {args.rounds} passes\n")
+    print(f"{'chars':>8}{'inline rows/s':>16}{'pool rows/s':>16}{'speedup':>10}")
+    print("-" * 50)
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="decrypt") as pool:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            ciphers = [security.encrypt_bytes("x" * size) for _ in range(args.rows)]
+            assert pooled(ciphers, pool) == inline(ciphers, pool)
+            t_inline, t_pool = timed(inline, ciphers, pool, args.rounds), timed(pooled, ciphers, pool, args.rounds)
+            print(f"{size:>8}{args.rows / t_inline:>16,.0f}{args.rows / t_pool:>16,.0f}{t_inline / t_pool:>9.2f}x")
+    print("\n✅ Set DECRYPT_WORKERS to the pool size only where the speedup is well above 1.0x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""EXPLAIN-based benchmark for the hot-path indexes (migrations/versions/0003_hot_path_indexes.py)
+
+Seeds a dedicated PostgreSQL database with synthetic rows (10M symptom entries and
+10M chat logs by default), then runs each hot query with EXPLAIN (ANALYZE, BUFFERS)
+twice: once normally and once with index scans disabled as the no-index baseline.
+Exits non-zero if a hot query does not use its index.
+
+Usage (never point this at a real database):
+    DATABASE_URL=postgresql://.../bench alembic upgrade head
+    python benchmarks/bench_indexes.py --database-url postgresql://.../bench --seed
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db import partitions
+
+CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego", "Dallas", "Austin"]
+SPECIALIZATIONS = ["General Practitioner", "Cardiologist", "Neurologist", "Dermatologist", "Gastroenterologist", "Orthopedist"]
+SYMPTOMS = ["Headache", "Fever", "Nausea", "Chest Pain", "Cough", "Fatigue", "Dizziness", "Back Pain", "Rash", "Joint Pain"]
+
+# name -> (SQL, big table that must not be sequentially scanned)
+QUERIES = {
+    "sessions_by_patient": (
+        "SELECT session_id, start_time, severity_score, red_flag, ai_summary FROM sessions "
+        "WHERE patient_id = :patient_id ORDER BY start_time DESC", "sessions"),
+    "recent_sessions_by_patient": (
+        "SELECT session_id, start_time, severity_score FROM sessions "
+        "WHERE patient_id = :patient_id ORDER BY start_time DESC LIMIT 5", "sessions"),
+    "sessions_page_by_patient": (
+        "SELECT session_id, start_time, severity_score FROM sessions WHERE patient_id = :patient_id "
+        "AND (start_time, session_id) < (now(), :session_id) ORDER BY start_time DESC, session_id DESC LIMIT 21", "sessions"),
+    "chat_logs_by_session": (
+        "SELECT sender, message, timestamp FROM chat_logs WHERE session_id = :session_id ORDER BY timestamp", "chat_logs"),
+    # crud.get_chat_logs(since=session.start_time): the time bound prunes older partitions
+    "chat_logs_by_session_pruned": (
+        "SELECT sender, message, timestamp FROM chat_logs WHERE session_id = :session_id "
+        "AND timestamp >= :session_start - interval '1 day' ORDER BY timestamp", "chat_logs"),
+    "symptoms_by_session": (
+        "SELECT symptom, intensity, mood FROM symptom_entries WHERE session_id = :session_id", "symptom_entries"),
+    "symptoms_by_patient": (
+        "SELECT e.symptom, e.intensity, e.date FROM symptom_entries e JOIN sessions s ON s.session_id = e.session_id "
+        "WHERE s.patient_id = :patient_id", "symptom_entries"),
+    "appointments_by_patient": (
+        "SELECT count(*) FROM appointments WHERE patient_id = :patient_id", "appointments"),
+    "doctors_by_city_specialization": (
+        "SELECT doctor_id, full_name FROM doctors WHERE city = :city AND specialization = :specialization", "doctors"),
+}
+
+
+def seed(engine, patients: int, sessions: int, entries_per_session: int, doctors: int):
+    """Populate the benchmark database with deterministic synthetic rows using generate_series."""
+    rows = sessions * entries_per_session
+    steps = [
+        ("patients", f"""INSERT INTO patients (patient_id, full_name, email, city, created_at)
+            SELECT md5('p' || g)::uuid, 'Patient ' || g, 'patient' || g || '@bench.local',
+                   (ARRAY{CITIES})[1 + g % {len(CITIES)}], now()
+            FROM generate_series(1, {patients}) g"""),
+        ("doctors", f"""INSERT INTO doctors (doctor_id, full_name, specialization, clinic_name, city, contact_email, created_at)
+            SELECT md5('d' || g)::uuid, 'Doctor ' || g, (ARRAY{SPECIALIZATIONS})[1 + g % {len(SPECIALIZATIONS)}],
+                   'Clinic ' || g, (ARRAY{CITIES})[1 + (g / {len(SPECIALIZATIONS)}) % {len(CITIES)}], 'doctor' || g || '@bench.local', now()
+            FROM generate_series(1, {doctors}) g"""),
+        ("sessions", f"""INSERT INTO sessions (session_id, patient_id, start_time, severity_score, red_flag, ai_summary, created_at)
+            SELECT md5('s' || g)::uuid, md5('p' || (1 + g % {patients}))::uuid, now() - (g % 20000) * interval '1 hour',
+                   (g % 100) / 10.0, g % 100 >= 80, 'Synthetic session ' || g, now()
+            FROM generate_series(1, {sessions}) g"""),
+        ("symptom_entries", f"""INSERT INTO symptom_entries (entry_id, session_id, date, mood, symptom, intensity, red_flag)
+            SELECT md5('e' || g)::uuid, md5('s' || (1 + g % {sessions}))::uuid, now() - (g % 20000) * interval '1 hour',
+                   1 + g % 5, (ARRAY{SYMPTOMS})[1 + g % {len(SYMPTOMS)}], 1 + g % 10, g % 10 >= 8
+            FROM generate_series(1, {rows}) g"""),
+        ("chat_logs", f"""INSERT INTO chat_logs (log_id, session_id, sender, message, timestamp, intent)
+            SELECT md5('l' || g)::uuid, md5('s' || (1 + g % {sessions}))::uuid,
+                   CASE WHEN g % 2 = 0 THEN 'patient' ELSE 'bot' END, convert_to('synthetic message ' || g, 'UTF8'),
+                   now() - (g % 20000) * interval '1 hour', 'symptom_report'
+            FROM generate_series(1, {rows}) g"""),
+        ("appointments", f"""INSERT INTO appointments (appointment_id, patient_id, doctor_id, appointment_date, status, created_at)
+            SELECT md5('a' || g)::uuid, md5('p' || (1 + g % {patients}))::uuid, md5('d' || (1 + g % {doctors}))::uuid,
+                   now() + (g % 720) * interval '1 hour', 'confirmed', now()
+            FROM generate_series(1, {sessions // 10}) g"""),
+    ]
+    with engine.begin() as conn:
+        # seeded rows reach back 20000 hours; partitioned tables need a partition for every month
+        this_month = partitions.month_start(datetime.utcnow().date())
+        for table in partitions.PARTITIONED_TABLES:
+            if partitions.is_partitioned(conn, table):
+                partitions.create_month_partitions(conn, table, partitions.add_months(this_month, -28), this_month)
+        for table, sql in steps:
+            t0 = time.perf_counter()
+            conn.execute(text(sql))
+            print(f"   seeded {table:<16} in {time.perf_counter() - t0:7.1f}s")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def explain(conn, sql: str, params: dict, use_indexes: bool) -> dict:
+    """Run EXPLAIN ANALYZE in its own transaction and summarize the plan."""
+    with conn.begin():
+        if not use_indexes:
+            conn.execute(text("SET LOCAL enable_indexscan = off"))
+            conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+            conn.execute(text("SET LOCAL enable_indexonlyscan = off"))
+        raw = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar()
+    doc = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    nodes = list(_plan_nodes(doc["Plan"]))
+    return {
+        "execution_ms": doc["Execution Time"],
+        "scans": [(n["Node Type"], n.get("Relation Name"), n.get("Index Name")) for n in nodes if "Scan" in n["Node Type"]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="dedicated benchmark database")
+    parser.add_argument("--seed", action="store_true", help="insert synthetic rows before benchmarking")
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=5_000_000)
+    parser.add_argument("--entries-per-session", type=int, default=2, help="symptom entries and chat logs per session")
+    parser.add_argument("--doctors", type=int, default=5_000)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url (or BENCH_DATABASE_URL) is required")
+    engine = create_engine(args.database_url)
+
+    if args.seed:
+        print(f"🌱 Seeding {args.sessions * args.entries_per_session:,} symptom entries and chat logs...")
+        seed(engine, args.patients, args.sessions, args.entries_per_session, args.doctors)
+
+    with engine.connect() as conn:
+        patient_id = conn.execute(text("SELECT patient_id FROM sessions ORDER BY start_time DESC LIMIT 1")).scalar()
+        session = conn.execute(text("SELECT session_id, start_time FROM sessions WHERE patient_id = :p LIMIT 1"), {"p": patient_id}).first()
+        doctor = conn.execute(text("SELECT city, specialization FROM doctors LIMIT 1")).first()
+        counts = {t: conn.execute(text(f"SELECT reltuples::bigint FROM pg_class WHERE relname = '{t}'")).scalar()
+                  for t in ["sessions", "symptom_entries", "chat_logs", "appointments", "doctors"]}
+    params = {"patient_id": patient_id, "session_id": session.session_id, "session_start": session.start_time,
+              "city": doctor.city if doctor else "", "specialization": doctor.specialization if doctor else ""}
+
+    print("\n📊 Approximate row counts: " + ", ".join(f"{t}={n:,}" for t, n in counts.items()))
+    print(f"\n{'query':<32}{'indexed ms':>12}{'seq-scan ms':>14}{'speedup':>10}  plan")
+    print("-" * 110)
+    failures = []
+    with engine.connect() as conn:
+        for name, (sql, table) in QUERIES.items():
+            indexed = explain(conn, sql, params, use_indexes=True)
+            baseline = explain(conn, sql, params, use_indexes=False)
+            speedup = baseline["execution_ms"] / indexed["execution_ms"] if indexed["execution_ms"] else float("inf")
+            plan = "; ".join(f"{node} on {rel}" + (f" using {ix}" if ix else "") for node, rel, ix in indexed["scans"])
+            print(f"{name:<32}{indexed['execution_ms']:>12.2f}{baseline['execution_ms']:>14.2f}{speedup:>9.1f}x  {plan}")
+            # on partitioned tables the plan names the partitions (chat_logs_y2026m10, ...)
+            if any(node == "Seq Scan" and rel and (rel == table or rel.startswith(f"{table}_y")) for node, rel, _ in indexed["scans"]):
+                failures.append(name)
+
+    if failures:
+        print(f"\n❌ Sequential scan on a hot table in: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Every hot query is served by an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Login throughput benchmark over distinct patients derived from login_data.csv
+
+Derives --patients distinct patients from the CSV rows (email,password,secret_key): patient i
+takes row i modulo the row count, with its email made unique and its secret key suffixed with i,
+so every login reads a different row and checks a different verifier. Their logins are replayed
+--rounds times through --workers concurrent threads, once per secret-key check:
+    verifier  crud.verify_patient_credentials, an HMAC compared with patients.secret_key_verifier
+    decrypt   the previous check, which Fernet-decrypted patients.secret_key_encrypted per login
+Reports logins per second, latency percentiles, rejected logins and Fernet decrypts, and exits
+non-zero if any valid login was rejected.
+
+Usage (never point this at a real database; this uses whatever app.db.session connects to):
+    DATABASE_URL=postgresql://.../bench alembic upgrade head
+    DATABASE_URL=postgresql://.../bench python benchmarks/bench_login.py --seed
+"""
+import argparse
+import csv
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+from app.db.session import SessionLocal
+from app.core import security
+from app import crud
+
+decrypts = 0
+_decrypts_lock = threading.Lock()
+_decrypt_bytes = security.decrypt_bytes
+
+
+def _counting_decrypt(cipher):
+    global decrypts
+    with _decrypts_lock:
+        decrypts += 1
+    return _decrypt_bytes(cipher)
+
+
+security.decrypt_bytes = _counting_decrypt
+
+
+def decrypt_check(db, email: str, password: str, secret_key_plain: str):
+    """verify_patient_credentials as it was before patients.secret_key_verifier."""
+    p = crud.get_patient_by_email(db, email)
+    if not p or not security.verify_password(password, p.password_hash):
+        return None
+    try:
+        stored = security.decrypt_bytes(p.secret_key_encrypted)
+    except Exception:
+        return None
+    return p if stored == secret_key_plain else None
+
+
+def load_credentials(path: str, patients: int) -> list:
+    """`patients` distinct (email, password, secret_key) logins, cycling through the CSV rows."""
+    with open(path, newline="") as f:
+        rows = [(row["email"], row["password"], row["secret_key"]) for row in csv.DictReader(f)]
+    if not rows:
+        sys.exit(f"❌ No credentials in {path}")
+    credentials = []
+    for i in range(patients):
+        email, password, secret_key = rows[i % len(rows)]
+        local = email.split("@")[0]
+        credentials.append((f"{local}+login-bench-{i}@bench.local", password, f"{secret_key}-{i}"))
+    return credentials
+
+
+def seed(credentials: list):
+    """Register every benchmark patient that does not exist yet."""
+    created = 0
+    with SessionLocal() as db:
+        for email, password, secret_key in credentials:
+            if crud.get_patient_by_email(db, email) is None:
+                crud.create_patient(db, "Login Bench", email, password, secret_key)
+                created += 1
+    print(f"🌱 Registered {created} benchmark patient(s)")
+
+
+def run_check(name: str, check, credentials: list, rounds: int, workers: int) -> int:
+    global decrypts
+    decrypts = 0
+    attempts = credentials * rounds
+
+    def login(cred):
+        t0 = time.perf_counter()
+        with SessionLocal() as db:
+            ok = check(db, *cred) is not None
+        return ok, (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(login, attempts))
+    elapsed = time.perf_counter() - t0
+
+    latencies = [ms for _, ms in results]
+    rejected = sum(1 for ok, _ in results if not ok)
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else max(latencies, default=0)
+    print(f"{name:<10}{len(results) / elapsed:>10.1f}{statistics.median(latencies):>10.2f}{p95:>10.2f}"
+          f"{rejected:>10}{decrypts:>10}")
+    return rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join(ROOT, "login_data.csv"))
+    parser.add_argument("--patients", type=int, default=500, help="distinct patients derived from the CSV")
+    parser.add_argument("--seed", action="store_true", help="register the benchmark patients if they do not exist")
+    parser.add_argument("--rounds", type=int, default=10, help="logins per patient per check")
+    parser.add_argument("--workers", type=int, default=8, help="stay within the engine's pool size")
+    args = parser.parse_args()
+
+    credentials = load_credentials(args.csv, args.patients)
+    if args.seed:
+        seed(credentials)
+    print(f"🔐 {len(credentials) * args.rounds:,} logins ({len(credentials)} patients x {args.rounds}) "
+          f"by {args.workers} concurrent workers\n")
+    print(f"{'check':<10}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'rejected':>10}{'decrypts':>10}")
+    print("-" * 60)
+    rejected = 0
+    for name, check in [("verifier", crud.verify_patient_credentials), ("decrypt", decrypt_check)]:
+        rejected += run_check(name, check, credentials, args.rounds, args.workers)
+    if rejected:
+        print("\n❌ Valid credentials were rejected (run with --seed, or check the CSV)")
+        sys.exit(1)
+    print("\n✅ Every login was accepted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Latency benchmark for the get_patient_history query as `limit` grows
+
+Compares the old per-session loop (one SymptomEntry query per session) with
+async_crud.get_patient_history (two round trips) for increasing limits, reporting
+the median latency and the number of SQL statements each approach issues.
+
+Usage (never point this at a real database; DATABASE_URL is what app.db.session connects to):
+    DATABASE_URL=postgresql://.../bench alembic upgrade head
+    DATABASE_URL=postgresql://.../bench python benchmarks/bench_patient_history.py --seed
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import event, text
+from app.db.session import AsyncSessionLocal, async_engine
+from app import async_crud
+
+SYMPTOMS = ["Headache", "Fever", "Nausea", "Chest Pain", "Cough", "Fatigue", "Dizziness", "Back Pain", "Rash", "Joint Pain"]
+PATIENT_ID = "00000000-0000-4000-8000-00000000b157"
+
+statements = 0
+
+
+def _count_statement(*_):
+    global statements
+    statements += 1
+
+
+async def seed(sessions: int, entries_per_session: int):
+    """Create one synthetic patient with `sessions` sessions and their symptom entries."""
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM symptom_entries WHERE session_id IN (SELECT session_id FROM sessions WHERE patient_id = :p)"), {"p": PATIENT_ID})
+        await conn.execute(text("DELETE FROM sessions WHERE patient_id = :p"), {"p": PATIENT_ID})
+        await conn.execute(text("DELETE FROM patients WHERE patient_id = :p"), {"p": PATIENT_ID})
+        await conn.execute(text("""INSERT INTO patients (patient_id, full_name, email, city, created_at)
+            VALUES (:p, 'History Bench', 'history-bench@bench.local', 'Chicago', now())"""), {"p": PATIENT_ID})
+        await conn.execute(text(f"""INSERT INTO sessions (session_id, patient_id, start_time, severity_score, red_flag, ai_summary, created_at)
+            SELECT md5('hs' || g)::uuid, :p, now() - g * interval '1 day', (g % 100) / 10.0, g % 100 >= 80, 'Synthetic session ' || g, now()
+            FROM generate_series(1, {sessions}) g"""), {"p": PATIENT_ID})
+        await conn.execute(text(f"""INSERT INTO symptom_entries (entry_id, session_id, date, mood, symptom, intensity, red_flag)
+            SELECT md5('he' || g)::uuid, md5('hs' || (1 + g % {sessions}))::uuid, now(), 1 + g % 5,
+                   (ARRAY{SYMPTOMS})[1 + g % {len(SYMPTOMS)}], 1 + g % 10, g % 10 >= 8
+            FROM generate_series(1, {sessions * entries_per_session}) g"""))
+    async with async_engine.connect() as conn:
+        await conn.execute(text("ANALYZE sessions"))
+        await conn.execute(text("ANALYZE symptom_entries"))
+
+
+async def per_session_loop(db, limit: int):
+    """The previous implementation: one symptom query per session."""
+    patient = await async_crud.get_patient_by_id(db, PATIENT_ID)
+    sessions = await async_crud.get_sessions_by_patient(db, patient.patient_id, limit=limit)
+    return [await async_crud.get_symptom_entries(db, s.session_id) for s in sessions]
+
+
+async def two_round_trips(db, limit: int):
+    return await async_crud.get_patient_history(db, PATIENT_ID, limit=limit)
+
+
+async def measure(fn, limit: int, repeats: int):
+    """Median latency in ms and statements per call."""
+    global statements
+    timings = []
+    for _ in range(repeats):
+        async with AsyncSessionLocal() as db:
+            statements = 0
+            t0 = time.perf_counter()
+            await fn(db, limit)
+            timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings), statements
+
+
+async def run(args):
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+    if args.seed:
+        print(f"🌱 Seeding {args.sessions:,} sessions with {args.entries_per_session} symptom entries each...")
+        await seed(args.sessions, args.entries_per_session)
+
+    # Warm the connection pool so the first row does not pay for connecting
+    await measure(two_round_trips, 1, 3)
+
+    print(f"\n{'limit':>6}{'loop ms':>12}{'loop stmts':>12}{'2-trip ms':>12}{'2-trip stmts':>14}{'speedup':>10}")
+    print("-" * 66)
+    for limit in args.limits:
+        loop_ms, loop_stmts = await measure(per_session_loop, limit, args.repeats)
+        new_ms, new_stmts = await measure(two_round_trips, limit, args.repeats)
+        print(f"{limit:>6}{loop_ms:>12.2f}{loop_stmts:>12}{new_ms:>12.2f}{new_stmts:>14}{loop_ms / new_ms:>9.1f}x")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="(re)create the synthetic benchmark patient")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--entries-per-session", type=int, default=3)
+    parser.add_argument("--limits", type=int, nargs="+", default=[5, 10, 25, 50, 100, 250, 500])
+    parser.add_argument("--repeats", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
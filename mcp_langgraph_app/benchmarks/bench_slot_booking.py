@@ -0,0 +1,124 @@
+"""Throughput benchmark for concurrent slot booking against one heavily contended doctor
+
+Seeds one doctor with --slots free slots, then runs --workers concurrent bookers until
+--bookings appointments exist, once per claim strategy:
+    skip_locked  SELECT ... FOR UPDATE SKIP LOCKED (async_crud.claim_slot, what the app uses)
+    for_update   SELECT ... FOR UPDATE, so every booker queues behind the first free row
+Reports bookings per second and latency percentiles, and exits non-zero if any slot was
+booked twice or an appointment lost its slot.
+
+Usage (never point this at a real database; DATABASE_URL is what app.db.session connects to):
+    DATABASE_URL=postgresql://.../bench alembic upgrade head
+    DATABASE_URL=postgresql://.../bench python benchmarks/bench_slot_booking.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+from app.db.session import AsyncSessionLocal, async_engine
+from app import crud, async_crud
+
+DOCTOR_ID = "00000000-0000-4000-8000-0000000051a7"
+PATIENT_ID = "00000000-0000-4000-8000-0000000051a8"
+SESSION_ID = "00000000-0000-4000-8000-0000000051a9"
+
+
+async def seed(slots: int):
+    """Reset the benchmark doctor and give it `slots` consecutive free 15-minute slots."""
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM appointments WHERE doctor_id = :d"), {"d": DOCTOR_ID})
+        await conn.execute(text("DELETE FROM appointment_slots WHERE doctor_id = :d"), {"d": DOCTOR_ID})
+        await conn.execute(text("""INSERT INTO doctors (doctor_id, full_name, specialization, clinic_name, city, contact_email, created_at)
+            VALUES (:d, 'Slot Bench', 'General Practitioner', 'Bench Clinic', 'Chicago', 'slot-bench@bench.local', now())
+            ON CONFLICT (doctor_id) DO NOTHING"""), {"d": DOCTOR_ID})
+        await conn.execute(text("""INSERT INTO patients (patient_id, full_name, email, city, created_at)
+            VALUES (:p, 'Slot Bench', 'slot-bench-patient@bench.local', 'Chicago', now())
+            ON CONFLICT (patient_id) DO NOTHING"""), {"p": PATIENT_ID})
+        await conn.execute(text("""INSERT INTO sessions (session_id, patient_id, start_time, created_at)
+            VALUES (:s, :p, now(), now()) ON CONFLICT (session_id) DO NOTHING"""), {"s": SESSION_ID, "p": PATIENT_ID})
+        await conn.execute(text(f"""INSERT INTO appointment_slots (slot_id, doctor_id, starts_at, ends_at, created_at)
+            SELECT md5('slot' || g)::uuid, :d, date_trunc('hour', now()) + g * interval '15 minutes',
+                   date_trunc('hour', now()) + (g + 1) * interval '15 minutes', now()
+            FROM generate_series(1, {slots}) g"""), {"d": DOCTOR_ID})
+    async with async_engine.connect() as conn:
+        await conn.execute(text("ANALYZE appointment_slots"))
+
+
+async def book(doctor, skip_locked: bool) -> bool:
+    async with AsyncSessionLocal() as db:
+        slot = await async_crud.claim_slot(db, DOCTOR_ID, datetime.utcnow(), skip_locked=skip_locked)
+        if slot is None:
+            await db.rollback()
+            return False
+        db.add(crud.new_slot_appointment(slot, PATIENT_ID, doctor, SESSION_ID, "confirmed"))
+        await db.commit()
+        return True
+
+
+async def run_strategy(name: str, skip_locked: bool, workers: int, bookings: int, slots: int):
+    await seed(slots)
+    async with AsyncSessionLocal() as db:
+        doctor = await async_crud.get_doctor_by_id(db, DOCTOR_ID)
+    remaining = {"n": bookings}
+    latencies, failures = [], []
+
+    async def worker():
+        while remaining["n"] > 0:
+            remaining["n"] -= 1
+            t0 = time.perf_counter()
+            try:
+                ok = await book(doctor, skip_locked)
+            except Exception as e:
+                failures.append(str(e))
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                failures.append("no free slot")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    elapsed = time.perf_counter() - t0
+
+    async with async_engine.connect() as conn:
+        appointments, distinct_slots, unslotted = (await conn.execute(text(
+            "SELECT count(*), count(DISTINCT slot_id), count(*) FILTER (WHERE slot_id IS NULL) FROM appointments WHERE doctor_id = :d"),
+            {"d": DOCTOR_ID})).one()
+        booked = (await conn.execute(text(
+            "SELECT count(*) FROM appointment_slots WHERE doctor_id = :d AND booked_at IS NOT NULL"), {"d": DOCTOR_ID})).scalar()
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else max(latencies, default=0)
+    print(f"{name:<12}{len(latencies) / elapsed:>12.1f}{statistics.median(latencies) if latencies else 0:>10.2f}{p95:>10.2f}"
+          f"{appointments:>8}{booked:>8}{len(failures):>9}")
+    return appointments == distinct_slots == booked and not unslotted
+
+
+async def run(args):
+    print(f"📅 {args.bookings:,} bookings by {args.workers} concurrent workers against one doctor with {args.slots:,} slots\n")
+    print(f"{'strategy':<12}{'bookings/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'appts':>8}{'booked':>8}{'failures':>9}")
+    print("-" * 69)
+    consistent = True
+    for name, skip_locked in [("skip_locked", True), ("for_update", False)]:
+        consistent &= await run_strategy(name, skip_locked, args.workers, args.bookings, args.slots)
+    await async_engine.dispose()
+    if not consistent:
+        print("\n❌ Double booking detected: appointments, distinct slots and booked slots differ")
+        sys.exit(1)
+    print("\n✅ Every appointment holds its own slot")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=10, help="stay within the async engine's pool size (15)")
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--slots", type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,17 @@ from pydantic_settings import BaseSettings
 from typing import Optional
 
 class Settings(BaseSettings):
-    # Database
-    DATABASE_URL: str
-    REDIS_URL: str
+    # Database (the engine itself is configured by app.core.config: DB_PROFILE / DATABASE_URL)
+    DB_PROFILE: str = "postgresql"
+    DATABASE_URL: str = ""
+    REDIS_URL: Optional[str] = None
     
     # Security
     FERNET_KEY: str
+    FERNET_OLD_KEYS: str = ""
+    DECRYPT_WORKERS: int = 1
     JWT_SECRET_KEY: str
+    SECRET_KEY_VERIFIER_KEY: str = ""
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
     
@@ -35,6 +39,9 @@ class Settings(BaseSettings):
     
     # LangGraph
     LANGGRAPH_CHECKPOINT_DB: str = "checkpoints.db"
+    WORKFLOW_TRACE_DIR: Optional[str] = None
+    # Level of the structured workflow_node / workflow_run log lines (langgraph_agent/tracing.py)
+    WORKFLOW_LOG_LEVEL: str = "INFO"
     
     class Config:
         env_file = ".env"
@@ -13,12 +13,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from mcp_langgraph_app.config.settings import settings
+from mcp_langgraph_app.langgraph_agent.tracing import TracedMCPClient, logger, start_trace, traced_node
+from app.services import continuity, specializations
 
 
 class AgentState(TypedDict):
     """State for the symptom tracker agent."""
     messages: Annotated[Sequence[BaseMessage], operator.add]
     patient_id: str
+    thread_id: str
+    patient_context: dict
     symptoms: list
     mood: int
     free_text: str
@@ -34,14 +38,16 @@ class AgentState(TypedDict):
 class SymptomTrackerAgent:
     """LangGraph-based agent for symptom tracking workflow."""
     
-    def __init__(self, mcp_client):
+    def __init__(self, mcp_client, trace_dir: str = None):
         """
         Initialize the agent with MCP client.
         
         Args:
             mcp_client: MCP client instance for tool calls
+            trace_dir: Optional directory for per-run trace files (defaults to settings.WORKFLOW_TRACE_DIR)
         """
-        self.mcp_client = mcp_client
+        self.mcp_client = TracedMCPClient(mcp_client)
+        self.trace_dir = trace_dir or settings.WORKFLOW_TRACE_DIR
         self.llm = ChatGoogleGenerativeAI(
             model=settings.GEMINI_MODEL,
             google_api_key=settings.GEMINI_API_KEY,
@@ -55,25 +61,46 @@ class SymptomTrackerAgent:
         """Build the LangGraph workflow."""
         workflow = StateGraph(AgentState)
         
-        # Add nodes
-        workflow.add_node("analyze_symptoms", self.analyze_symptoms_node)
-        workflow.add_node("check_severity", self.check_severity_node)
-        workflow.add_node("save_session", self.save_session_node)
-        workflow.add_node("find_doctor", self.find_doctor_node)
-        workflow.add_node("create_appointment", self.create_appointment_node)
-        workflow.add_node("send_emails", self.send_emails_node)
-        workflow.add_node("complete", self.complete_node)
-        workflow.add_node("error_handler", self.error_handler_node)
+        # Add nodes (each wrapped to record a timing span in the current trace)
+        nodes = {
+            "load_patient_context": self.load_patient_context_node,
+            "analyze_symptoms": self.analyze_symptoms_node,
+            "check_severity": self.check_severity_node,
+            "save_session": self.save_session_node,
+            "find_doctor": self.find_doctor_node,
+            "create_appointment": self.create_appointment_node,
+            "complete": self.complete_node,
+            "error_handler": self.error_handler_node,
+        }
+        for name, node in nodes.items():
+            workflow.add_node(name, traced_node(name, node))
         
         # Set entry point
-        workflow.set_entry_point("analyze_symptoms")
+        workflow.set_entry_point("load_patient_context")
         
         # Add edges
-        workflow.add_edge("analyze_symptoms", "check_severity")
+        # A failed context load or analysis stops the run: no LLM call or save on a bad patient/session
+        workflow.add_conditional_edges(
+            "load_patient_context",
+            self.route_on_error,
+            {
+                "error": "error_handler",
+                "continue": "analyze_symptoms"
+            }
+        )
+        workflow.add_conditional_edges(
+            "analyze_symptoms",
+            self.route_on_error,
+            {
+                "error": "error_handler",
+                "continue": "check_severity"
+            }
+        )
         workflow.add_conditional_edges(
             "check_severity",
             self.route_after_severity_check,
             {
+                "error": "error_handler",
                 "emergency": "find_doctor",
                 "normal": "save_session"
             }
@@ -85,14 +112,37 @@ class SymptomTrackerAgent:
         
         return workflow.compile()
     
+    async def load_patient_context_node(self, state: AgentState) -> dict:
+        """Node: Prefetch patient profile and recent sessions for later nodes."""
+        try:
+            context_result = await self.mcp_client.call_tool(
+                "get_patient_context",
+                patient_id=state["patient_id"],
+                session_id=state.get("thread_id", "")
+            )
+            
+            if not context_result.get("success"):
+                return {"error": context_result.get("error", "Patient not found")}
+            if state.get("thread_id") and not context_result.get("conversation"):
+                return {"error": "Session not found for follow-up"}
+            
+            return {"patient_context": context_result}
+            
+        except Exception as e:
+            return {"error": f"Patient context load failed: {str(e)}"}
+    
     async def analyze_symptoms_node(self, state: AgentState) -> dict:
         """Node: Analyze symptoms using AI via MCP."""
         try:
-            # Analyze current symptoms only (no history)
+            # Follow-up turns carry only the bounded rolling summary, never the full transcript
+            patient_context = state.get("patient_context", {})
+            conversation = patient_context.get("conversation", {})
             analysis_result = await self.mcp_client.call_tool(
                 "analyze_symptoms_with_ai",
                 symptoms=state["symptoms"],
-                free_text=state["free_text"]
+                free_text=state["free_text"],
+                conversation_summary=conversation.get("summary", ""),
+                clinical_state=patient_context.get("clinical_state", {})
             )
             
             return {
@@ -122,8 +172,14 @@ class SymptomTrackerAgent:
         except Exception as e:
             return {"error": f"Severity check failed: {str(e)}"}
     
-    def route_after_severity_check(self, state: AgentState) -> Literal["emergency", "normal"]:
+    def route_on_error(self, state: AgentState) -> Literal["error", "continue"]:
+        """Route to the error handler once a node has set `error`."""
+        return "error" if state.get("error") else "continue"
+    
+    def route_after_severity_check(self, state: AgentState) -> Literal["error", "emergency", "normal"]:
         """Route based on severity check."""
+        if state.get("error"):
+            return "error"
         if state["severity_check"].get("is_emergency", False):
             return "emergency"
         return "normal"
@@ -131,27 +187,22 @@ class SymptomTrackerAgent:
     async def find_doctor_node(self, state: AgentState) -> dict:
         """Node: Find available doctor for emergency."""
         try:
-            # Get patient info to find city
-            from app.db.session import SessionLocal
-            from app.db import models
-            
-            db = SessionLocal()
-            patient = db.query(models.Patient).filter(
-                models.Patient.patient_id == state["patient_id"]
-            ).first()
-            db.close()
-            
-            if not patient:
+            patient_context = state.get("patient_context", {})
+            if not patient_context.get("success"):
                 return {"error": "Patient not found"}
             
-            specialization = state["ai_analysis"].get("specialization_needed", "General Practitioner")
+            # an analysis without a usable specialization (missing, or not one we know) falls back to the matcher
+            specialization = (specializations.known(state.get("ai_analysis", {}).get("specialization_needed"))
+                              or specializations.best(state["symptoms"], state["free_text"]))
             
             doctor_result = await self.mcp_client.call_tool(
                 "find_available_doctor",
-                city=patient.city,
+                city=patient_context.get("city"),
                 specialization=specialization,
-                urgency="emergency"
+                urgency="emergency",
+                patient_id=state["patient_id"]
             )
+            continuity.record_route(doctor_result.get("routing"))
             
             msg = f"Found doctor: Dr. {doctor_result.get('full_name', '')} at {doctor_result.get('clinic_name', '')}" if doctor_result.get("success") else f"Doctor search: {doctor_result.get('error', 'No doctors available')}"
             
@@ -164,21 +215,33 @@ class SymptomTrackerAgent:
             return {"error": f"Doctor search failed: {str(e)}"}
     
     async def save_session_node(self, state: AgentState) -> dict:
-        """Node: Save session to database."""
+        """Node: Save session to database, or append a follow-up turn to the thread's session."""
         try:
-            save_result = await self.mcp_client.call_tool(
-                "save_session_to_database",
-                patient_id=state["patient_id"],
-                symptoms=state["symptoms"],
-                mood=state["mood"],
-                free_text=state["free_text"],
-                ai_analysis=state["ai_analysis"]
-            )
+            if state.get("thread_id"):
+                save_result = await self.mcp_client.call_tool(
+                    "append_session_turn",
+                    session_id=state["thread_id"],
+                    patient_id=state["patient_id"],
+                    symptoms=state["symptoms"],
+                    mood=state["mood"],
+                    free_text=state["free_text"],
+                    ai_analysis=state["ai_analysis"]
+                )
+            else:
+                save_result = await self.mcp_client.call_tool(
+                    "save_session_to_database",
+                    patient_id=state["patient_id"],
+                    symptoms=state["symptoms"],
+                    mood=state["mood"],
+                    free_text=state["free_text"],
+                    ai_analysis=state["ai_analysis"]
+                )
             
             if save_result.get("success"):
+                saved = f"Follow-up turn {save_result.get('turn')} saved" if state.get("thread_id") else "Session saved successfully"
                 return {
                     "session_id": save_result.get("session_id", ""),
-                    "messages": [AIMessage(content=f"Session saved successfully. ID: {save_result.get('session_id', '')}")]
+                    "messages": [AIMessage(content=f"{saved}. ID: {save_result.get('session_id', '')}")]
                 }
             else:
                 return {"error": save_result.get("error", "Failed to save session")}
@@ -210,59 +273,6 @@ class SymptomTrackerAgent:
         except Exception as e:
             return {"error": f"Appointment creation failed: {str(e)}"}
     
-    async def send_emails_node(self, state: AgentState) -> dict:
-        """Node: Send email notifications."""
-        try:
-            if not state.get("appointment_info", {}).get("success"):
-                return {"messages": [AIMessage(content="No appointment to send emails for")]}
-            
-            apt_info = state["appointment_info"]
-            
-            # Get chat logs for summary
-            from app.db.session import SessionLocal
-            from app import crud
-            from app.core.security import decrypt_bytes
-            
-            db = SessionLocal()
-            logs = crud.get_chat_logs(db, state["session_id"])
-            
-            chat_summary = ""
-            for log in logs:
-                if log.sender == "patient":
-                    chat_summary += f"Patient: {decrypt_bytes(log.message)}\n"
-                elif log.sender == "bot":
-                    chat_summary += f"AI: {decrypt_bytes(log.message)}\n"
-            db.close()
-            
-            if not chat_summary:
-                chat_summary = state["ai_analysis"].get("summary", "Severe symptoms requiring immediate attention")
-            
-            # Extract photo URLs from symptoms
-            photo_urls = [s.get("photo_url") for s in state["symptoms"] if s.get("photo_url")]
-            
-            email_result = await self.mcp_client.call_tool(
-                "send_appointment_emails",
-                patient_email=apt_info["patient_email"],
-                patient_name=apt_info["patient_name"],
-                doctor_email=apt_info["doctor_email"],
-                doctor_name=apt_info["doctor_name"],
-                clinic_name=apt_info["clinic_location"],
-                appointment_date=apt_info["appointment_date"],
-                symptoms_summary=chat_summary,
-                appointment_type="emergency",
-                photo_urls=photo_urls
-            )
-            
-            msg = "Email notifications sent successfully to patient and doctor." if email_result.get("success") else f"Email sending failed: {email_result.get('error', '')}"
-            
-            return {
-                "email_status": email_result,
-                "messages": [AIMessage(content=msg)]
-            }
-            
-        except Exception as e:
-            return {"error": f"Email sending failed: {str(e)}"}
-    
     async def complete_node(self, state: AgentState) -> dict:
         """Node: Complete the workflow."""
         summary_parts = [
@@ -291,7 +301,8 @@ class SymptomTrackerAgent:
         symptoms: list,
         mood: int,
         free_text: str,
-        thread_id: str = None
+        thread_id: str = None,
+        debug: bool = False
     ) -> dict:
         """
         Process patient symptoms through the LangGraph workflow.
@@ -301,7 +312,8 @@ class SymptomTrackerAgent:
             symptoms: List of symptom dictionaries
             mood: Mood rating (1-5)
             free_text: Patient's description
-            thread_id: Optional thread ID for conversation continuity
+            thread_id: Optional session ID to continue; the submission is saved as a follow-up turn
+            debug: Include per-node timings and tool-call spans under "trace"
         
         Returns:
             Dictionary with workflow results
@@ -312,6 +324,8 @@ class SymptomTrackerAgent:
                 HumanMessage(content=f"Patient reporting symptoms: {free_text}")
             ],
             "patient_id": patient_id,
+            "thread_id": thread_id or "",
+            "patient_context": {},
             "symptoms": symptoms,
             "mood": mood,
             "free_text": free_text,
@@ -324,10 +338,11 @@ class SymptomTrackerAgent:
             "error": ""
         }
         
+        trace = start_trace(patient_id)
         try:
             final_state = await self.graph.ainvoke(initial_state)
             
-            return {
+            result = {
                 "success": not bool(final_state.get("error")),
                 "session_id": final_state.get("session_id", ""),
                 "ai_analysis": final_state.get("ai_analysis", {}),
@@ -340,8 +355,19 @@ class SymptomTrackerAgent:
             }
             
         except Exception as e:
-            return {
+            result = {
                 "success": False,
                 "error": str(e),
                 "messages": [f"Workflow failed: {str(e)}"]
-            }
\ No newline at end of file
+            }
+        
+        trace.finish()
+        trace.log_summary()
+        if self.trace_dir:
+            try:
+                trace.write(self.trace_dir)
+            except OSError as e:
+                logger.warning("Failed to write workflow trace: %s", e)
+        if debug:
+            result["trace"] = trace.to_dict()
+        return result
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""Per-node timing and tracing for the LangGraph workflow"""
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Any, Optional
+import json
+import logging
+import os
+import time
+import uuid
+
+from mcp_langgraph_app.config.settings import settings
+
+logger = logging.getLogger("symptom_tracker.workflow")
+# Nothing else in the app configures logging, so give the workflow logger its own stderr handler
+# (one JSON record per line) instead of relying on the root logger, which drops INFO by default.
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(settings.WORKFLOW_LOG_LEVEL.upper())
+
+_current_trace: ContextVar[Optional["WorkflowTrace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[dict]] = ContextVar("current_span", default=None)
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class WorkflowTrace:
+    """Collects node spans and nested tool-call timings for one workflow run."""
+
+    def __init__(self, patient_id: str = ""):
+        self.run_id = str(uuid.uuid4())
+        self.patient_id = patient_id
+        self.started_at = _now_iso()
+        self.ended_at = None
+        self.duration_ms = None
+        self.nodes = []
+        self._t0 = time.perf_counter()
+
+    def start_node(self, node: str) -> dict:
+        """Open a span for a node invocation."""
+        span = {
+            "node": node,
+            "started_at": _now_iso(),
+            "ended_at": None,
+            "duration_ms": None,
+            "error": None,
+            "tool_calls": [],
+            "_t0": time.perf_counter()
+        }
+        self.nodes.append(span)
+        return span
+
+    def end_node(self, span: dict, error: str = None):
+        """Close a node span and emit a structured log line."""
+        span["ended_at"] = _now_iso()
+        span["duration_ms"] = round((time.perf_counter() - span.pop("_t0")) * 1000, 2)
+        span["error"] = error or None
+        logger.info("workflow_node %s", json.dumps({"run_id": self.run_id, **span}))
+
+    def finish(self):
+        """Close the run."""
+        self.ended_at = _now_iso()
+        self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 2)
+
+    @property
+    def route(self) -> str:
+        visited = {n["node"] for n in self.nodes}
+        if "error_handler" in visited:
+            return "error"
+        return "emergency" if "find_doctor" in visited else "normal"
+
+    def to_dict(self) -> dict:
+        """Serializable view of the trace."""
+        slowest = max(self.nodes, key=lambda n: n["duration_ms"] or 0)["node"] if self.nodes else None
+        return {
+            "run_id": self.run_id,
+            "route": self.route,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "duration_ms": self.duration_ms,
+            "slowest_node": slowest,
+            "nodes": self.nodes
+        }
+
+    def log_summary(self):
+        """Emit one structured log line for the whole run."""
+        logger.info("workflow_run %s", json.dumps({
+            "run_id": self.run_id,
+            "route": self.route,
+            "duration_ms": self.duration_ms,
+            "nodes": {n["node"]: n["duration_ms"] for n in self.nodes}
+        }))
+
+    def write(self, trace_dir: str) -> str:
+        """Write the trace to <trace_dir>/<run_id>.json and return the path."""
+        os.makedirs(trace_dir, exist_ok=True)
+        path = os.path.join(trace_dir, f"{self.run_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def start_trace(patient_id: str = "") -> WorkflowTrace:
+    """Make a new trace current for the running task."""
+    trace = WorkflowTrace(patient_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def traced_node(name: str, node):
+    """Wrap an async graph node so each invocation records a span in the current trace."""
+    @wraps(node)
+    async def wrapper(state):
+        trace = _current_trace.get()
+        if trace is None:
+            return await node(state)
+        span = trace.start_node(name)
+        token = _current_span.set(span)
+        error = None
+        try:
+            result = await node(state)
+            if isinstance(result, dict):
+                error = result.get("error")
+            return result
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            trace.end_node(span, error)
+    return wrapper
+
+
+class TracedMCPClient:
+    """Proxy around an MCP client that times each call_tool inside the current node span."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def call_tool(self, tool_name: str, **kwargs) -> Any:
+        span = _current_span.get()
+        if span is None:
+            return await self._client.call_tool(tool_name, **kwargs)
+        call = {"tool": tool_name, "started_at": _now_iso(), "ended_at": None, "duration_ms": None, "success": None}
+        t0 = time.perf_counter()
+        try:
+            result = await self._client.call_tool(tool_name, **kwargs)
+            call["success"] = result.get("success", True) if isinstance(result, dict) else True
+            return result
+        except Exception:
+            call["success"] = False
+            raise
+        finally:
+            call["ended_at"] = _now_iso()
+            call["duration_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            span["tool_calls"].append(call)
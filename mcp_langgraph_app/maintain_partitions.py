@@ -0,0 +1,48 @@
+"""Create upcoming chat_logs / symptom_entries partitions and retire expired ones
+
+Run daily from cron (PostgreSQL only; a no-op on other databases):
+    python maintain_partitions.py                       # create the next PARTITION_MONTHS_AHEAD months
+    python maintain_partitions.py --retain-months 24    # also detach partitions older than 24 months
+                                                        # and move them to the archive schema
+    python maintain_partitions.py --retain-months 24 --drop   # detach and drop instead of archiving
+
+Retention never DELETEs rows: whole months are detached with DETACH PARTITION, one partition per short
+transaction under a lock_timeout, so a busy table makes it retry rather than stall reads and inserts.
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.db.session import engine
+from app.db import partitions
+from app.core.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retain-months", type=int, default=settings.PARTITION_RETENTION_MONTHS,
+                        help="detach partitions whose month ended more than this many months ago")
+    parser.add_argument("--archive-schema", default=settings.PARTITION_ARCHIVE_SCHEMA)
+    parser.add_argument("--drop", action="store_true", help="drop detached partitions instead of archiving them")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print(f"ℹ️ {engine.dialect.name} does not use partitions; nothing to do")
+        return
+    try:
+        created = partitions.ensure_partitions(engine, args.months_ahead)
+        print(f"✅ Created {len(created)} partition(s){': ' + ', '.join(created) if created else ''}")
+        if args.retain_months is not None:
+            retired = partitions.detach_expired_partitions(engine, args.retain_months, args.archive_schema, args.drop)
+            where = "dropped" if args.drop else f"moved to schema '{args.archive_schema}'"
+            print(f"✅ Detached {len(retired)} partition(s){' and ' + where + ': ' + ', '.join(retired) if retired else ''}")
+    except Exception as e:
+        print(f"❌ Partition maintenance failed: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
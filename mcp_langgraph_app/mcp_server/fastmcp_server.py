@@ -7,36 +7,137 @@ import json
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from app.db.session import SessionLocal
+from sqlalchemy import select
+from app.db.session import AsyncSessionLocal
 from app.db import models
 from app.core import security
-from app import crud
+from app import crud, async_crud
+from app.services import doctor_load, continuity, specializations, email_outbox
 from datetime import datetime, timedelta
 import google.generativeai as genai
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
 from mcp_langgraph_app.config.settings import settings
 
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
 mcp = FastMCP("Symptom Tracker")
 
+# Upper bound on the rolling conversation summary carried between turns, keeps prompt size constant
+MAX_CONVERSATION_SUMMARY_CHARS = 600
+
+def _fold_conversation_summary(previous: str, symptoms: list, free_text: str, severity) -> str:
+    """Fallback rolling summary: append this turn and keep the most recent characters."""
+    names = ", ".join([s.get("symptom", "") for s in symptoms]) or "no symptoms"
+    turn = f"Reported {names} (severity {severity}): {free_text}"
+    combined = f"{previous} | {turn}" if previous else turn
+    return combined[-MAX_CONVERSATION_SUMMARY_CHARS:]
+
+def _clinical_history_line(clinical_state: dict) -> str:
+    """Render the compact per-patient clinical state as one prompt line."""
+    if not clinical_state or not clinical_state.get("session_count"):
+        return ""
+    counts = clinical_state.get("symptom_counts") or {}
+    recurring = [f"{name} ({n}x)" for name, n in sorted(counts.items(), key=lambda x: x[1], reverse=True) if n >= 2][:5]
+    severities = ", ".join(str(s) for s in (clinical_state.get("recent_severities") or [])[-5:])
+    return (f"\nPatient history: {clinical_state['session_count']} past sessions; "
+            f"recurring symptoms: {', '.join(recurring) or 'none'}; "
+            f"recent severities: {severities or 'n/a'}; trend: {clinical_state.get('trend', 'insufficient_data')}")
+
+@mcp.tool()
+async def get_patient_context(patient_id: str, recent_limit: int = 3, session_id: str = "") -> str:
+    """Load patient profile, city and recent session summaries in a single query, plus the rolling summary of session_id for follow-up turns"""
+    db = AsyncSessionLocal()
+    try:
+        q = select(
+            models.Patient.patient_id,
+            models.Patient.full_name,
+            models.Patient.email,
+            models.Patient.city,
+            models.Session.session_id,
+            models.Session.start_time,
+            models.Session.severity_score,
+            models.Session.red_flag,
+            models.Session.ai_summary,
+            models.PatientClinicalState.symptom_counts,
+            models.PatientClinicalState.recent_severities,
+            models.PatientClinicalState.trend,
+            models.PatientClinicalState.session_count
+        ).select_from(models.Patient).outerjoin(
+            models.Session, models.Session.patient_id == models.Patient.patient_id
+        ).outerjoin(
+            models.PatientClinicalState, models.PatientClinicalState.patient_id == models.Patient.patient_id
+        ).where(
+            models.Patient.patient_id == patient_id
+        ).order_by(models.Session.start_time.desc()).limit(recent_limit)
+        rows = (await db.execute(q)).all()
+        
+        if not rows:
+            return json.dumps({"success": False, "error": "Patient not found"})
+        
+        first = rows[0]
+        recent_sessions = [
+            {
+                "session_id": str(r.session_id),
+                "date": r.start_time.isoformat() if r.start_time else None,
+                "severity": float(r.severity_score) if r.severity_score else 0,
+                "red_flag": r.red_flag,
+                "summary": r.ai_summary
+            }
+            for r in rows if r.session_id
+        ]
+        
+        result = {
+            "success": True,
+            "patient_id": str(first.patient_id),
+            "full_name": first.full_name,
+            "email": first.email,
+            "city": first.city,
+            "recent_sessions": recent_sessions,
+            "clinical_state": {
+                "symptom_counts": first.symptom_counts or {},
+                "recent_severities": first.recent_severities or [],
+                "trend": first.trend or "insufficient_data",
+                "session_count": first.session_count or 0
+            }
+        }
+        
+        if session_id:
+            conversation = (await db.execute(select(
+                models.Session.conversation_summary,
+                models.Session.turn_count
+            ).where(
+                models.Session.session_id == session_id,
+                models.Session.patient_id == patient_id
+            ))).first()
+            if conversation:
+                result["conversation"] = {
+                    "session_id": session_id,
+                    "summary": security.decrypt_bytes(conversation.conversation_summary) if conversation.conversation_summary else "",
+                    "turn_count": conversation.turn_count or 1
+                }
+        return json.dumps(result)
+    except Exception as e:
+        return json.dumps({"success": False, "error": str(e)})
+    finally:
+        await db.close()
+
 @mcp.tool()
-async def analyze_symptoms_with_ai(symptoms: list[dict[str, Any]], free_text: str) -> str:
-    """Analyze patient symptoms using AI and return severity score, summary, and recommendations"""
+async def analyze_symptoms_with_ai(symptoms: list[dict[str, Any]], free_text: str, conversation_summary: str = "", clinical_state: dict[str, Any] = {}) -> str:
+    """Analyze patient symptoms using AI, with the patient's compact clinical history, and return severity score, summary, recommendations and the updated rolling conversation summary"""
+    conversation_summary = (conversation_summary or "")[-MAX_CONVERSATION_SUMMARY_CHARS:]
     try:
         symptom_list = "\n".join([f"- {s.get('symptom', 'Unknown')}: Intensity {s.get('intensity', 0)}/10" for s in symptoms])
+        earlier = f"\nEarlier in this conversation (summary): {conversation_summary}" if conversation_summary else ""
+        history = _clinical_history_line(clinical_state)
         
-        prompt = f"""Analyze ONLY current symptoms and provide JSON response:
+        prompt = f"""Analyze the current symptoms and provide JSON response:{history}{earlier}
 Current Symptoms: {symptom_list}
 Description: {free_text}
 
-Return JSON with: summary (max 150 chars), severity (0-10), recommendation (yes/no), red_flags (list), suggested_actions (list), specialization_needed (Cardiologist/Neurologist/Dermatologist/Gastroenterologist/Orthopedist/General Practitioner)"""
+Return JSON with: summary (max 150 chars), severity (0-10), recommendation (yes/no), red_flags (list), suggested_actions (list), specialization_needed (Cardiologist/Neurologist/Dermatologist/Gastroenterologist/Orthopedist/General Practitioner), conversation_summary (max {MAX_CONVERSATION_SUMMARY_CHARS} chars, the earlier summary updated with this turn)"""
 
         model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         text = response.text.strip().replace("```json", "").replace("```", "").strip()
         result = json.loads(text)
         
@@ -45,7 +146,12 @@ Return JSON with: summary (max 150 chars), severity (0-10), recommendation (yes/
         result.setdefault("recommendation", "no")
         result.setdefault("red_flags", [])
         result.setdefault("suggested_actions", [])
-        result.setdefault("specialization_needed", "General Practitioner")
+        # the model's pick stands when it names a known specialization; the symptom matcher covers a missing or unknown one
+        result["specialization_needed"] = (specializations.known(result.get("specialization_needed"))
+                                           or specializations.best(symptoms, free_text))
+        if not result.get("conversation_summary"):
+            result["conversation_summary"] = _fold_conversation_summary(conversation_summary, symptoms, free_text, result["severity"])
+        result["conversation_summary"] = str(result["conversation_summary"])[:MAX_CONVERSATION_SUMMARY_CHARS]
         
         return json.dumps(result)
     except Exception as e:
@@ -56,7 +162,8 @@ Return JSON with: summary (max 150 chars), severity (0-10), recommendation (yes/
             "recommendation": "yes" if max_intensity >= 8 else "no",
             "red_flags": [s['symptom'] for s in symptoms if s.get('intensity', 0) >= 8],
             "suggested_actions": ["Consult a doctor" if max_intensity >= 8 else "Monitor symptoms"],
-            "specialization_needed": "General Practitioner"
+            "specialization_needed": specializations.best(symptoms, free_text),
+            "conversation_summary": _fold_conversation_summary(conversation_summary, symptoms, free_text, float(max_intensity))
         }
         return json.dumps(result)
 
@@ -72,65 +179,80 @@ async def check_severity_threshold(severity: float, symptoms: list[dict[str, Any
         "max_intensity": max_intensity,
         "critical_symptoms": [s.get("symptom") for s in symptoms if s.get("intensity", 0) >= 8],
         "recommendation": "immediate_appointment" if is_emergency else "monitor",
+        "specializations": [specialization for specialization, _ in specializations.rank(symptoms)],
         "message": "EMERGENCY: Immediate medical attention required!" if is_emergency else "Symptoms logged."
     }
     return json.dumps(result)
 
-@mcp.tool()
-async def find_available_doctor(city: str, specialization: str, urgency: str = "normal", symptoms: list[dict[str, Any]] = []) -> str:
-    """Find available doctor in patient's city using AI-powered matching"""
-    db = SessionLocal()
+def _doctor_result(doctor, load: int, routing: str) -> dict:
+    return {
+        "success": True,
+        "doctor_id": str(doctor.doctor_id),
+        "full_name": doctor.full_name,
+        "specialization": doctor.specialization,
+        "clinic_name": doctor.clinic_name,
+        "city": doctor.city,
+        "contact_email": doctor.contact_email,
+        "contact_number": doctor.contact_number,
+        "available_slots": doctor.available_slots or [],
+        "open_appointments_24h": load,
+        "routing": routing
+    }
+
+async def _choose_doctor(city: str, specialization: str, symptoms: list, recent_doctor_ids: list) -> tuple:
+    """(doctor, routing, loads) for a patient in `city`; doctor is None when the city has no doctors."""
+    # this process is spawned per tool call, so loads are usually scoped to the search: the city's specialists
+    # first, and the whole city only when there are none
+    loads = await doctor_load.scoped_async(city, specialization or None)
+    # a returning patient goes back to a recent doctor who fits the search
+    doctor = continuity.pick_recent_doctor(loads.directory, recent_doctor_ids, city, specialization or None)
+    if doctor:
+        return doctor, "continuity", loads
+    # a qualified specialist exists: the least loaded one takes the patient, no ranking call needed
+    doctor = loads.least_loaded(city, specialization) if specialization else None
+    if doctor:
+        return doctor, "specialist", loads
+    if specialization:
+        loads = await doctor_load.scoped_async(city)
+    doctors = loads.directory.in_city(city)
+    if not doctors:
+        return None, None, loads
     try:
-        doctors = db.query(models.Doctor).filter(models.Doctor.city == city).all()
-        if not doctors:
-            return json.dumps({"success": False, "error": f"No doctors available in {city}"})
-        
-        doctors_list = "\n".join([f"{i+1}. Dr. {d.full_name} - {d.specialization} at {d.clinic_name}" for i, d in enumerate(doctors)])
+        doctors_list = "\n".join([f"{i+1}. Dr. {d.full_name} - {d.specialization} at {d.clinic_name} ({loads.load(d.doctor_id)} appointments in the next 24h)"
+                                  for i, d in enumerate(doctors)])
         symptoms_text = ", ".join([s.get("symptom", "") for s in symptoms]) if symptoms else "Not specified"
         
         prompt = f"""Select BEST doctor:
 City: {city}, Specialization: {specialization}, Symptoms: {symptoms_text}
 Doctors: {doctors_list}
+Prefer the less busy doctor when two are equally suitable.
 Return ONLY the number (1, 2, 3, etc.)."""
 
         model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         selected_index = int(response.text.strip()) - 1
-        doctor = doctors[selected_index] if 0 <= selected_index < len(doctors) else doctors[0]
-        
-        result = {
-            "success": True,
-            "doctor_id": str(doctor.doctor_id),
-            "full_name": doctor.full_name,
-            "specialization": doctor.specialization,
-            "clinic_name": doctor.clinic_name,
-            "city": doctor.city,
-            "contact_email": doctor.contact_email,
-            "contact_number": doctor.contact_number,
-            "available_slots": doctor.available_slots or []
-        }
-        return json.dumps(result)
+        if 0 <= selected_index < len(doctors):
+            return doctors[selected_index], "ranked", loads
     except Exception:
-        doctor = doctors[0]
-        result = {
-            "success": True,
-            "doctor_id": str(doctor.doctor_id),
-            "full_name": doctor.full_name,
-            "specialization": doctor.specialization,
-            "clinic_name": doctor.clinic_name,
-            "city": doctor.city,
-            "contact_email": doctor.contact_email,
-            "contact_number": doctor.contact_number,
-            "available_slots": doctor.available_slots or []
-        }
-        return json.dumps(result)
-    finally:
-        db.close()
+        pass
+    return loads.least_loaded(city), "fallback", loads
+
+@mcp.tool()
+async def find_available_doctor(city: str, specialization: str, urgency: str = "normal", symptoms: list[dict[str, Any]] = [], patient_id: str = "") -> str:
+    """Find available doctor in patient's city using AI-powered matching"""
+    recent = []
+    if patient_id:
+        async with AsyncSessionLocal() as db:
+            recent = await async_crud.get_recent_doctor_ids(db, patient_id)
+    doctor, routing, loads = await _choose_doctor(city, specialization, symptoms, recent)
+    if doctor is None:
+        return json.dumps({"success": False, "error": f"No doctors available in {city}"})
+    return json.dumps(_doctor_result(doctor, loads.load(doctor.doctor_id), routing))
 
 @mcp.tool()
 async def save_session_to_database(patient_id: str, symptoms: list[dict[str, Any]], mood: int, free_text: str, ai_analysis: dict[str, Any]) -> str:
     """Save symptom session to database with AI analysis"""
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
         severity = ai_analysis.get("severity", 0)
         red_flag = severity >= 8 or any(s.get("intensity", 0) >= 8 for s in symptoms)
@@ -140,54 +262,89 @@ async def save_session_to_database(patient_id: str, symptoms: list[dict[str, Any
             severity_score=severity,
             red_flag=red_flag,
             callback_required=red_flag,
-            ai_summary=ai_analysis.get("summary", "")
+            ai_summary=ai_analysis.get("summary", ""),
+            conversation_summary=security.encrypt_bytes(ai_analysis.get("conversation_summary") or None),
+            turn_count=1
         )
         db.add(session)
-        db.flush()
+        await db.flush()
+        
+        # One multi-row INSERT per table and a single commit: the save is atomic
+        await async_crud.create_chat_logs(db, session.session_id, [
+            ("patient", free_text, "symptom_report"),
+            ("bot", ai_analysis.get("summary", ""), "ai_summary")
+        ])
+        await async_crud.create_symptom_entries(db, session.session_id, mood, symptoms)
+        symptom_names = [s.get("symptom", "") for s in symptoms]
+        await async_crud.update_patient_clinical_state(db, patient_id, symptom_names, severity)
+        await async_crud.update_patient_daily_stats(db, patient_id, crud.utc_day(session.start_time), severity, red_flag, mood, symptom_names)
+        result = {"success": True, "session_id": str(session.session_id), "severity": severity, "red_flag": red_flag, "ai_summary": ai_analysis.get("summary", "")}
+        await db.commit()
+        return json.dumps(result)
+    except Exception as e:
+        await db.rollback()
+        return json.dumps({"success": False, "error": str(e)})
+    finally:
+        await db.close()
+
+@mcp.tool()
+async def append_session_turn(session_id: str, patient_id: str, symptoms: list[dict[str, Any]], mood: int, free_text: str, ai_analysis: dict[str, Any]) -> str:
+    """Add a follow-up turn to an existing session and update its rolling conversation summary"""
+    db = AsyncSessionLocal()
+    try:
+        session = await async_crud.get_patient_session(db, session_id, patient_id)
+        if not session:
+            return json.dumps({"success": False, "error": "Session not found"})
         
-        crud.create_chat_log(db, session.session_id, "patient", free_text, intent="symptom_report")
-        crud.create_chat_log(db, session.session_id, "bot", ai_analysis.get("summary", ""), intent="ai_summary")
+        severity = ai_analysis.get("severity", 0)
+        red_flag = severity >= 8 or any(s.get("intensity", 0) >= 8 for s in symptoms)
+        previous = (session.severity_score, session.red_flag)
         
-        for symptom in symptoms:
-            crud.create_symptom_entry(db, session.session_id, mood, symptom.get("symptom", ""), symptom.get("intensity", 0), symptom.get("notes", ""), symptom.get("photo_url"))
+        session.severity_score = severity
+        session.red_flag = bool(session.red_flag) or red_flag
+        session.callback_required = bool(session.callback_required) or red_flag
+        session.ai_summary = ai_analysis.get("summary", "")
+        session.conversation_summary = security.encrypt_bytes(ai_analysis.get("conversation_summary") or None)
+        session.turn_count = (session.turn_count or 1) + 1
+        session.end_time = datetime.utcnow()
         
-        db.commit()
-        result = {"success": True, "session_id": str(session.session_id), "severity": severity, "red_flag": red_flag, "ai_summary": ai_analysis.get("summary", "")}
+        await async_crud.create_chat_logs(db, session.session_id, [
+            ("patient", free_text, "follow_up"),
+            ("bot", ai_analysis.get("summary", ""), "ai_summary")
+        ])
+        await async_crud.create_symptom_entries(db, session.session_id, mood, symptoms)
+        symptom_names = [s.get("symptom", "") for s in symptoms]
+        await async_crud.update_patient_clinical_state(db, patient_id, symptom_names, severity, new_session=False)
+        await async_crud.update_patient_daily_stats(db, patient_id, crud.utc_day(session.start_time), severity, session.red_flag, mood, symptom_names, previous=previous)
+        result = {"success": True, "session_id": str(session.session_id), "turn": session.turn_count, "severity": severity, "red_flag": session.red_flag, "ai_summary": session.ai_summary}
+        await db.commit()
         return json.dumps(result)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return json.dumps({"success": False, "error": str(e)})
     finally:
-        db.close()
+        await db.close()
 
 @mcp.tool()
 async def create_appointment(patient_id: str, doctor_id: str, session_id: str, appointment_type: str = "emergency", notes: str = "") -> str:
     """Create appointment in database"""
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        patient = db.query(models.Patient).filter(models.Patient.patient_id == patient_id).first()
-        doctor = db.query(models.Doctor).filter(models.Doctor.doctor_id == doctor_id).first()
+        patient = await async_crud.get_patient_by_id(db, patient_id)
+        doctor = await async_crud.get_doctor_by_id(db, doctor_id)
         
         if not patient or not doctor:
             return json.dumps({"success": False, "error": "Patient or doctor not found"})
         
-        days_ahead = 1 if appointment_type == "emergency" else 3
-        appointment_date = datetime.utcnow() + timedelta(days=days_ahead)
         notes_encrypted = security.encrypt_bytes(notes) if notes else None
-        
-        appointment = models.Appointment(
-            patient_id=patient_id,
-            doctor_id=doctor_id,
-            session_id=session_id,
-            appointment_date=appointment_date,
-            clinic_location=doctor.clinic_name,
-            status="confirmed",
-            notes=notes_encrypted
-        )
-        
-        db.add(appointment)
-        db.commit()
-        db.refresh(appointment)
+        # the doctor's next free slot, claimed atomically so concurrent bookings never share one
+        appointment = await async_crud.book_slot(db, patient_id, doctor, session_id,
+                                                 earliest=crud.earliest_booking_time(appointment_type), notes=notes_encrypted)
+        if appointment is None:
+            await db.rollback()
+            return json.dumps({"success": False, "error": f"Dr. {doctor.full_name} has no free slots in the booking window"})
+        appointment_date = appointment.appointment_date
+        await db.commit()
         
         result = {
             "success": True,
@@ -203,10 +360,73 @@ async def create_appointment(patient_id: str, doctor_id: str, session_id: str, a
         }
         return json.dumps(result)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return json.dumps({"success": False, "error": str(e)})
     finally:
-        db.close()
+        await db.close()
+
+@mcp.tool()
+async def book_emergency_appointment(patient_id: str, session_id: str, photo_urls: list[str] = []) -> str:
+    """Find a doctor for the session's symptoms, book their next free slot and queue the confirmation emails, in one transaction"""
+    db = AsyncSessionLocal()
+    try:
+        session = await async_crud.get_patient_session(db, session_id, patient_id)
+        if not session:
+            return json.dumps({"success": False, "error": "Session not found"})
+        patient = await async_crud.get_patient_by_id(db, patient_id)
+        if not patient:
+            return json.dumps({"success": False, "error": "Patient not found"})
+        
+        symptoms = await async_crud.get_symptom_entries(db, session_id, since=session.start_time)
+        specialization = specializations.best(symptoms)
+        recent = await async_crud.get_recent_doctor_ids(db, patient_id)
+        labels = {"patient": "Patient", "bot": "AI"}
+        logs = [log for log in await async_crud.get_chat_logs(db, session_id, since=session.start_time) if log.sender in labels]
+        chat_summary = "".join(f"{labels[log.sender]}: {text}\n" for log, text in zip(logs, security.decrypt_many([log.message for log in logs])))
+        chat_summary = chat_summary or session.ai_summary or "High severity symptoms requiring immediate attention"
+        photo_urls = photo_urls or [s.photo_url for s in symptoms if s.photo_url]
+        # end the read transaction (expire_on_commit is off, so the rows stay usable): choosing the doctor may
+        # take a ranking call to the model, which must not hold a connection or any lock
+        await db.commit()
+        doctor, routing, _ = await _choose_doctor(patient.city, specialization,
+                                                  [{"symptom": s.symptom, "intensity": s.intensity} for s in symptoms], recent)
+        if doctor is None:
+            return json.dumps({"success": False, "error": "No available doctors found in your city"})
+        
+        # the booking transaction: claim the slot (SKIP LOCKED, so concurrent bookings take the next free one),
+        # write the appointment and queue its emails, then commit
+        appointment = await async_crud.book_slot(db, patient_id, doctor, session_id, earliest=crud.earliest_booking_time("emergency"),
+                                                 notes=security.encrypt_bytes(session.ai_summary) if session.ai_summary else None)
+        if appointment is None:
+            await db.rollback()
+            return json.dumps({"success": False, "error": f"Dr. {doctor.full_name} has no free slots in the booking window"})
+        
+        # delivered by the API's outbox worker once this commits; a rollback drops the emails with the booking
+        email_outbox.enqueue(db, email_outbox.APPOINTMENT_CONFIRMATION, {
+            "patient_email": patient.email, "patient_name": patient.full_name,
+            "doctor_email": doctor.contact_email, "doctor_name": doctor.full_name, "clinic_name": doctor.clinic_name,
+            "appointment_date": appointment.appointment_date.isoformat(), "symptoms_summary": chat_summary,
+            "appointment_type": "emergency", "photo_urls": photo_urls
+        }, appointment_id=appointment.appointment_id)
+        
+        result = {
+            "success": True,
+            "appointment_id": str(appointment.appointment_id),
+            "doctor_id": str(doctor.doctor_id),
+            "doctor_name": doctor.full_name,
+            "clinic_location": doctor.clinic_name,
+            "appointment_date": appointment.appointment_date.isoformat(),
+            "specialization": specialization,
+            "routing": routing,
+            "emails_queued": True
+        }
+        await db.commit()
+        return json.dumps(result)
+    except Exception as e:
+        await db.rollback()
+        return json.dumps({"success": False, "error": str(e)})
+    finally:
+        await db.close()
 
 @mcp.tool()
 async def send_appointment_emails(patient_email: str, patient_name: str, doctor_email: str, doctor_name: str, clinic_name: str, appointment_date: str, symptoms_summary: str, appointment_type: str = "emergency", photo_urls: list[str] = []) -> str:
@@ -215,42 +435,11 @@ async def send_appointment_emails(patient_email: str, patient_name: str, doctor_
         if not settings.SMTP_HOST or not settings.SMTP_USER or not settings.SMTP_PASS:
             return json.dumps({"success": False, "error": "Email configuration not set"})
         
-        try:
-            apt_date = datetime.fromisoformat(appointment_date.replace('Z', '+00:00'))
-            formatted_date = apt_date.strftime("%B %d, %Y at %I:%M %p")
-        except:
-            formatted_date = appointment_date
-        
-        # Patient Email
-        patient_msg = MIMEMultipart("alternative")
-        patient_msg["Subject"] = f"{'Emergency ' if appointment_type == 'emergency' else ''}Appointment Confirmation"
-        patient_msg["From"] = settings.SMTP_USER
-        patient_msg["To"] = patient_email
-        patient_msg.attach(MIMEText(f"<html><body><h2>Appointment Confirmed</h2><p>Dear <strong>{patient_name}</strong>,</p><p><strong>Doctor:</strong> Dr. {doctor_name}</p><p><strong>Clinic:</strong> {clinic_name}</p><p><strong>Date:</strong> {formatted_date}</p><p><strong>Symptoms:</strong> {symptoms_summary}</p></body></html>", "html"))
-        
-        # Doctor Email
-        doctor_msg = MIMEMultipart("alternative")
-        doctor_msg["Subject"] = f"New {'Emergency ' if appointment_type == 'emergency' else ''}Patient Appointment"
-        doctor_msg["From"] = settings.SMTP_USER
-        doctor_msg["To"] = doctor_email
-        photo_section = f"<p><strong>Symptom Photos:</strong> {len(photo_urls)} image(s) attached</p>" if photo_urls else ""
-        doctor_msg.attach(MIMEText(f"<html><body><h2>New Patient Appointment</h2><p>Dear <strong>Dr. {doctor_name}</strong>,</p><p><strong>Patient:</strong> {patient_name} ({patient_email})</p><p><strong>Date:</strong> {formatted_date}</p><p><strong>Symptoms:</strong> {symptoms_summary}</p>{photo_section}</body></html>", "html"))
-        
-        # Attach photos
-        if photo_urls:
-            uploads_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads", "symptom_photos")
-            for photo_url in photo_urls:
-                try:
-                    filename = photo_url.split("/")[-1]
-                    filepath = os.path.join(uploads_dir, filename)
-                    if os.path.exists(filepath):
-                        with open(filepath, "rb") as f:
-                            img_data = f.read()
-                        image = MIMEImage(img_data)
-                        image.add_header("Content-Disposition", "attachment", filename=filename)
-                        doctor_msg.attach(image)
-                except Exception as e:
-                    print(f"Failed to attach photo: {e}")
+        patient_msg, doctor_msg = email_outbox.appointment_messages({
+            "patient_email": patient_email, "patient_name": patient_name, "doctor_email": doctor_email,
+            "doctor_name": doctor_name, "clinic_name": clinic_name, "appointment_date": appointment_date,
+            "symptoms_summary": symptoms_summary, "appointment_type": appointment_type, "photo_urls": photo_urls
+        }, settings.SMTP_USER)
         
         # Send emails with detailed logging
         print(f"Attempting to send emails...")
@@ -300,23 +489,21 @@ async def send_appointment_emails(patient_email: str, patient_name: str, doctor_
 @mcp.tool()
 async def get_patient_history(patient_id: str, limit: int = 5) -> str:
     """Get patient's symptom history"""
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        patient = db.query(models.Patient).filter(models.Patient.patient_id == patient_id).first()
+        patient, sessions, symptoms = await async_crud.get_patient_history(db, patient_id, limit=limit)
         if not patient:
             return json.dumps({"success": False, "error": "Patient not found"})
         
-        sessions = db.query(models.Session).filter(models.Session.patient_id == patient_id).order_by(models.Session.created_at.desc()).limit(limit).all()
         history = []
         for session in sessions:
-            symptoms = db.query(models.SymptomEntry).filter(models.SymptomEntry.session_id == session.session_id).all()
             history.append({
                 "session_id": str(session.session_id),
                 "date": session.start_time.isoformat() if session.start_time else None,
                 "severity": float(session.severity_score) if session.severity_score else 0,
                 "red_flag": session.red_flag,
                 "summary": session.ai_summary,
-                "symptoms": [{"symptom": s.symptom, "intensity": s.intensity, "mood": s.mood} for s in symptoms]
+                "symptoms": [{"symptom": s.symptom, "intensity": s.intensity, "mood": s.mood} for s in symptoms[session.session_id]]
             })
         
         result = {"success": True, "patient_id": str(patient.patient_id), "patient_name": patient.full_name, "city": patient.city, "history": history}
@@ -324,7 +511,7 @@ async def get_patient_history(patient_id: str, limit: int = 5) -> str:
     except Exception as e:
         return json.dumps({"success": False, "error": str(e)})
     finally:
-        db.close()
+        await db.close()
 
 
 if __name__ == "__main__":
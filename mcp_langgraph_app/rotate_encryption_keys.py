@@ -0,0 +1,62 @@
+"""Re-encrypt stored data under the current FERNET_KEY
+
+Rotate the Fernet key without downtime:
+    1. Generate a key:  python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+    2. Set FERNET_KEY to the new key and FERNET_OLD_KEYS to the old one in every process's .env, and restart them
+       (from then on everything is written under the new key and both keys are read).
+    3. Run this script until every table reports completed:
+           python rotate_encryption_keys.py                        # all encrypted tables
+           python rotate_encryption_keys.py --tables chat_logs     # just some of them
+           python rotate_encryption_keys.py --rows-per-second 500  # gentler on a busy database
+           python rotate_encryption_keys.py --status               # progress only
+    4. Once no table has failed rows, remove the old key from FERNET_OLD_KEYS.
+
+The job is resumable: progress is checkpointed per batch, so an interrupted run (Ctrl-C included)
+continues where it stopped. Pass --restart to scan the tables from the beginning again.
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.db.session import SessionLocal
+from app.services import key_rotation
+from app.core.config import settings
+
+
+def _print(summary: dict):
+    state = "✅ completed" if summary["completed"] else "⏳ in progress"
+    print(f"{summary['table']}: {state} — {summary['rows_scanned']} scanned, {summary['rows_rotated']} re-encrypted, "
+          f"{summary['rows_failed']} unreadable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", nargs="+", choices=list(key_rotation.TARGETS), help="default: every encrypted table")
+    parser.add_argument("--batch-size", type=int, default=settings.KEY_ROTATION_BATCH_SIZE)
+    parser.add_argument("--rows-per-second", type=float, default=settings.KEY_ROTATION_ROWS_PER_SECOND,
+                        help="throttle; 0 for unthrottled")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and rescan from the start")
+    parser.add_argument("--status", action="store_true", help="print progress and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        with SessionLocal() as db:
+            for summary in key_rotation.status(db):
+                _print(summary)
+        return
+    try:
+        for table in args.tables or list(key_rotation.TARGETS):
+            print(f"🔑 Re-encrypting {table}...")
+            _print(key_rotation.rotate_table(table, args.batch_size, args.rows_per_second, args.restart))
+    except KeyboardInterrupt:
+        print("⏸️ Interrupted; run again to resume from the last checkpoint")
+        sys.exit(130)
+    except Exception as e:
+        print(f"❌ Key rotation failed: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
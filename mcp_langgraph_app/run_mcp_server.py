@@ -8,10 +8,12 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 if __name__ == "__main__":
     print("🚀 Starting FastMCP Server...")
     print("🛠️  Available tools:")
+    print("   - get_patient_context")
     print("   - analyze_symptoms_with_ai")
     print("   - check_severity_threshold")
     print("   - find_available_doctor")
     print("   - save_session_to_database")
+    print("   - append_session_turn")
     print("   - create_appointment")
     print("   - send_appointment_emails")
     print("   - get_patient_history")
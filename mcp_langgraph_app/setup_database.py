@@ -4,16 +4,22 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from app.db.session import SessionLocal, engine, Base
+from alembic import command
+from alembic.config import Config
+from app.db.session import SessionLocal
 from app.db import models
 from app import crud
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 def create_tables():
-    """Create all database tables."""
-    print("📊 Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("✅ Tables created successfully!")
+    """Create or upgrade database tables by running Alembic migrations to head."""
+    print("📊 Running database migrations...")
+    cfg = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT_DIR, "migrations"))
+    command.upgrade(cfg, "head")
+    print("✅ Database schema is up to date!")
 
 
 def add_sample_doctors():
@@ -110,7 +116,7 @@ def main():
     print("Database Setup Script")
     print("=" * 60)
     print("\nThis script will:")
-    print("1. Create all database tables")
+    print("1. Run database migrations (alembic upgrade head)")
     print("2. Add sample doctors")
     print("3. Verify setup")
     print("\n" + "=" * 60 + "\n")
@@ -3,6 +3,7 @@ import streamlit as st
 import requests
 import json
 import os
+import uuid
 from datetime import datetime
 from typing import Dict, Any
 
@@ -13,6 +14,7 @@ try:
 except:
     API_BASE = os.getenv("API_BASE", "http://localhost:8000")
 
+HISTORY_PAGE_SIZE = 20
 
 # Page config
 st.set_page_config(
@@ -247,13 +249,18 @@ label {
 
 
 # API Helper Functions
-def api_request(method: str, endpoint: str, data: Dict = None, token: str = None) -> Dict[str, Any]:
+def api_request(method: str, endpoint: str, data: Dict = None, token: str = None, idempotency_key: str = None) -> Dict[str, Any]:
     """Make API request."""
     url = f"{API_BASE}{endpoint}"
     headers = {"Content-Type": "application/json"}
     
     if token:
         headers["Authorization"] = f"Bearer {token}"
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    # echo the API's read-your-writes marker so reads after a write are served from the primary
+    if st.session_state.get("last_write"):
+        headers["X-Last-Write"] = st.session_state["last_write"]
     
     print(f"API Request: {method} {url}")
     print(f"Headers: {headers}")
@@ -269,12 +276,36 @@ def api_request(method: str, endpoint: str, data: Dict = None, token: str = None
         
         print(f"Response status: {response.status_code}")
         print(f"Response text: {response.text}")
+        if response.headers.get("X-Last-Write"):
+            st.session_state["last_write"] = response.headers["X-Last-Write"]
         
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Request error: {e}")
-        return {"error": str(e)}
+        # status_code tells an answered request (HTTP error) from one that never got a response
+        return {"error": str(e), "status_code": e.response.status_code if e.response is not None else None}
+
+
+def click_idempotency_key(name: str, payload: Dict) -> str:
+    """Idempotency-Key for one click of a submit button.
+
+    Every click gets a new key, except a retry of the same payload whose previous attempt never got an
+    answer (network error, timeout, or 409 still in progress): that reuses the key, so the API runs it once.
+    """
+    if st.session_state.get(f"{name}_key") and st.session_state.get(f"{name}_payload") == payload:
+        return st.session_state[f"{name}_key"]
+    st.session_state[f"{name}_payload"] = payload
+    st.session_state[f"{name}_key"] = str(uuid.uuid4())
+    return st.session_state[f"{name}_key"]
+
+
+def settle_idempotency_key(name: str, result: Dict):
+    """Forget the click's key once the API has answered it, so the next click is a new request."""
+    if "error" in result and result.get("status_code") in (None, 409):
+        return
+    st.session_state.pop(f"{name}_key", None)
+    st.session_state.pop(f"{name}_payload", None)
 
 
 # Authentication Functions
@@ -345,12 +376,15 @@ def symptom_logger_page():
         session_id = st.session_state.get("current_session_id", "")
         
         with st.spinner("📅 Booking your appointment..."):
+            booking = {"session_id": session_id}
             booking_result = api_request(
                 "POST",
                 "/api/v1/sessions/book-appointment",
-                {"session_id": session_id},
-                token=st.session_state["token"]
+                booking,
+                token=st.session_state["token"],
+                idempotency_key=click_idempotency_key("booking", booking)
             )
+            settle_idempotency_key("booking", booking_result)
             
             if "error" in booking_result:
                 st.error(f"❌ Appointment booking failed: {booking_result['error']}")
@@ -525,6 +559,11 @@ def symptom_logger_page():
                 if os.path.exists(audio_path):
                     os.remove(audio_path)
     
+    # Follow-up turns continue the last session instead of starting a new one
+    follow_up = False
+    if st.session_state.get("conversation_session_id"):
+        follow_up = st.checkbox("💬 Add as a follow-up to my last session", value=True, key="follow_up")
+    
     # Submit button
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -535,23 +574,31 @@ def symptom_logger_page():
             elif not free_text:
                 st.warning("⚠️ Please describe your symptoms")
             else:
+                submission = {
+                    "symptoms": selected_symptoms,
+                    "mood": mood_value,
+                    "free_text": free_text
+                }
+                if follow_up:
+                    submission["session_id"] = st.session_state["conversation_session_id"]
                 with st.spinner("🤖 AI is analyzing your symptoms using LangGraph workflow..."):
                     result = api_request(
                         "POST",
                         "/api/v2/symptoms/submit",
-                        {
-                            "symptoms": selected_symptoms,
-                            "mood": mood_value,
-                            "free_text": free_text
-                        },
-                        token=st.session_state["token"]
+                        submission,
+                        token=st.session_state["token"],
+                        idempotency_key=click_idempotency_key("submission", submission)
                     )
+                    settle_idempotency_key("submission", result)
                     
                     if "error" in result:
                         st.error(f"❌ Error: {result['error']}")
                     else:
                         # Store result in session state so it persists across reruns
                         st.session_state["last_analysis_result"] = result
+                        st.session_state["conversation_session_id"] = result.get("session_id")
+                        # History pages are stale now; reload from the first page next visit
+                        st.session_state.pop("history_sessions", None)
                         display_analysis_results(result)
 
 
@@ -731,9 +778,19 @@ def dashboard_page():
             st.caption(f"📅 You logged symptoms on {len(active_days)} day(s) this week")
     else:
         st.info("📝 No symptoms logged this week yet")
-    
+
     st.markdown("---")
-    
+
+    # Last 30 Days (one point per day with check-ins)
+    daily = insights.get("daily_history", [])
+    if len(daily) >= 2:
+        import pandas as pd
+        st.markdown("### 🗓️ Last 30 Days")
+        df = pd.DataFrame(daily).set_index("date")
+        st.area_chart(df[["avg_severity", "sessions"]], use_container_width=True, height=250)
+        st.caption(f"📅 Active on {len(daily)} day(s) in the last 30 days")
+        st.markdown("---")
+
     # Two column layout
     col1, col2 = st.columns(2)
     
@@ -824,19 +881,24 @@ def history_page():
             st.rerun()
         return
     
-    result = api_request("GET", "/api/v1/dashboard/sessions", token=st.session_state["token"])
+    # Sessions are fetched a page at a time and kept until the next submission
+    if "history_sessions" not in st.session_state:
+        result = api_request("GET", f"/api/v1/dashboard/sessions?limit={HISTORY_PAGE_SIZE}&include_total=true", token=st.session_state["token"])
+        if "error" in result:
+            st.error(f"❌ Error: {result['error']}")
+            return
+        st.session_state["history_sessions"] = result.get("sessions", [])
+        st.session_state["history_cursor"] = result.get("next_cursor")
+        st.session_state["history_total"] = result.get("total", len(st.session_state["history_sessions"]))
     
-    if "error" in result:
-        st.error(f"❌ Error: {result['error']}")
-        return
-    
-    sessions = result.get("sessions", [])
+    sessions = st.session_state["history_sessions"]
+    total = st.session_state["history_total"]
     
     if not sessions:
         st.info("📝 No sessions yet. Start by logging your symptoms!")
         return
     
-    st.write(f"📊 **Total Sessions:** {len(sessions)}")
+    st.write(f"📊 **Total Sessions:** {total}")
     st.markdown("---")
     
     for i, session in enumerate(sessions, 1):
@@ -859,7 +921,7 @@ def history_page():
         date_str = session.get('start_time', 'N/A')[:10] if session.get('start_time') else 'N/A'
         time_str = session.get('start_time', 'N/A')[11:16] if session.get('start_time') else 'N/A'
         
-        with st.expander(f"{icon} **Session #{len(sessions) - i + 1}** - {date_str} at {time_str} - {status}"):
+        with st.expander(f"{icon} **Session #{total - i + 1}** - {date_str} at {time_str} - {status}"):
             col1, col2 = st.columns([2, 1])
             
             with col1:
@@ -872,6 +934,20 @@ def history_page():
                 if st.button("🔍 View Full Details", key=f"view_{session.get('session_id')}", use_container_width=True):
                     st.session_state["view_session_id"] = session.get('session_id')
                     st.rerun()
+    
+    if st.session_state.get("history_cursor"):
+        if st.button(f"⬇️ Load more ({total - len(sessions)} remaining)", use_container_width=True):
+            result = api_request(
+                "GET",
+                f"/api/v1/dashboard/sessions?limit={HISTORY_PAGE_SIZE}&cursor={st.session_state['history_cursor']}",
+                token=st.session_state["token"]
+            )
+            if "error" in result:
+                st.error(f"❌ Error: {result['error']}")
+            else:
+                st.session_state["history_sessions"] = sessions + result.get("sessions", [])
+                st.session_state["history_cursor"] = result.get("next_cursor")
+                st.rerun()
 
 
 def view_session_details(session_id: str):
@@ -54,7 +54,7 @@ def test_appointment_booking():
                 print(f"   Doctor: Dr. {result.get('doctor_name', 'N/A')}")
                 print(f"   Clinic: {result.get('clinic', 'N/A')}")
                 print(f"   Date: {result.get('appointment_date', 'N/A')}")
-                print(f"   Emails Sent: {result.get('emails_sent', False)}")
+                print(f"   Emails Queued: {result.get('emails_queued', False)}")
         else:
             print(f"\n❌ ERROR: Request failed with status {response.status_code}")
             
@@ -0,0 +1,120 @@
+"""Baseline schema (tables previously created by Base.metadata.create_all)
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import GUID
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create(name, *columns):
+    # Databases bootstrapped by create_all already have these tables; adopt them as-is
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+
+
+def upgrade():
+    _create(
+        "patients",
+        sa.Column("patient_id", GUID(), primary_key=True),
+        sa.Column("full_name", sa.String(100), nullable=False),
+        sa.Column("email", sa.String(120), unique=True),
+        sa.Column("password_hash", sa.String(255)),
+        sa.Column("secret_key_encrypted", sa.LargeBinary),
+        sa.Column("city", sa.String(100)),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    _create(
+        "doctors",
+        sa.Column("doctor_id", GUID(), primary_key=True),
+        sa.Column("full_name", sa.String(100), nullable=False),
+        sa.Column("specialization", sa.String(100)),
+        sa.Column("clinic_name", sa.String(150)),
+        sa.Column("city", sa.String(100)),
+        sa.Column("contact_email", sa.String(120)),
+        sa.Column("contact_number", sa.String(20)),
+        sa.Column("available_slots", sa.JSON),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+    )
+    _create(
+        "sessions",
+        sa.Column("session_id", GUID(), primary_key=True),
+        sa.Column("patient_id", GUID(), sa.ForeignKey("patients.patient_id", ondelete="CASCADE")),
+        sa.Column("start_time", sa.DateTime(timezone=True)),
+        sa.Column("end_time", sa.DateTime(timezone=True)),
+        sa.Column("severity_score", sa.Numeric(3, 1)),
+        sa.Column("red_flag", sa.Boolean),
+        sa.Column("callback_required", sa.Boolean),
+        sa.Column("ai_summary", sa.Text),
+        sa.Column("summary_sent_to", sa.String(20)),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+    )
+    _create(
+        "chat_logs",
+        sa.Column("log_id", GUID(), primary_key=True),
+        sa.Column("session_id", GUID(), sa.ForeignKey("sessions.session_id", ondelete="CASCADE")),
+        sa.Column("sender", sa.String(10)),
+        sa.Column("message", sa.LargeBinary),
+        sa.Column("timestamp", sa.DateTime(timezone=True)),
+        sa.Column("intent", sa.String(100)),
+    )
+    _create(
+        "symptom_entries",
+        sa.Column("entry_id", GUID(), primary_key=True),
+        sa.Column("session_id", GUID(), sa.ForeignKey("sessions.session_id", ondelete="CASCADE")),
+        sa.Column("date", sa.DateTime),
+        sa.Column("mood", sa.Integer),
+        sa.Column("symptom", sa.String(100)),
+        sa.Column("intensity", sa.Integer),
+        sa.Column("notes", sa.LargeBinary),
+        sa.Column("photo_url", sa.Text),
+        sa.Column("red_flag", sa.Boolean),
+    )
+    _create(
+        "appointments",
+        sa.Column("appointment_id", GUID(), primary_key=True),
+        sa.Column("patient_id", GUID(), sa.ForeignKey("patients.patient_id", ondelete="CASCADE")),
+        sa.Column("doctor_id", GUID(), sa.ForeignKey("doctors.doctor_id", ondelete="CASCADE")),
+        sa.Column("session_id", GUID(), sa.ForeignKey("sessions.session_id")),
+        sa.Column("appointment_date", sa.DateTime(timezone=True)),
+        sa.Column("status", sa.String(30)),
+        sa.Column("clinic_location", sa.String(200)),
+        sa.Column("notes", sa.LargeBinary),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    _create(
+        "notifications",
+        sa.Column("notification_id", GUID(), primary_key=True),
+        sa.Column("recipient_type", sa.String(20)),
+        sa.Column("recipient_id", GUID()),
+        sa.Column("channel", sa.String(30)),
+        sa.Column("message", sa.LargeBinary),
+        sa.Column("sent_time", sa.DateTime(timezone=True)),
+        sa.Column("status", sa.String(30)),
+    )
+    _create(
+        "patient_doctor_history",
+        sa.Column("pd_id", GUID(), primary_key=True),
+        sa.Column("patient_id", GUID(), sa.ForeignKey("patients.patient_id", ondelete="CASCADE")),
+        sa.Column("doctor_id", GUID(), sa.ForeignKey("doctors.doctor_id", ondelete="CASCADE")),
+        sa.Column("relationship_type", sa.String(10)),
+        sa.Column("last_appointment_id", GUID(), sa.ForeignKey("appointments.appointment_id")),
+        sa.Column("notes", sa.LargeBinary),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    for name in ["patient_doctor_history", "notifications", "appointments", "symptom_entries",
+                 "chat_logs", "sessions", "doctors", "patients"]:
+        op.drop_table(name)
@@ -0,0 +1,57 @@
+"""Rolling conversation summary, per-patient clinical state and idempotency keys
+
+Revision ID: 0002_conversation_state_idempotency
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import GUID
+
+revision = "0002_conversation_state_idempotency"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    session_cols = {c["name"] for c in insp.get_columns("sessions")}
+    if "conversation_summary" not in session_cols:
+        op.add_column("sessions", sa.Column("conversation_summary", sa.LargeBinary))
+    if "turn_count" not in session_cols:
+        op.add_column("sessions", sa.Column("turn_count", sa.Integer))
+
+    if not insp.has_table("patient_clinical_state"):
+        op.create_table(
+            "patient_clinical_state",
+            sa.Column("patient_id", GUID(), sa.ForeignKey("patients.patient_id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("symptom_counts", sa.JSON),
+            sa.Column("recent_severities", sa.JSON),
+            sa.Column("trend", sa.String(20)),
+            sa.Column("session_count", sa.Integer),
+            sa.Column("last_session_at", sa.DateTime(timezone=True)),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+
+    if not insp.has_table("idempotency_keys"):
+        op.create_table(
+            "idempotency_keys",
+            sa.Column("key_id", GUID(), primary_key=True),
+            sa.Column("patient_id", GUID(), sa.ForeignKey("patients.patient_id", ondelete="CASCADE")),
+            sa.Column("endpoint", sa.String(100), nullable=False),
+            sa.Column("idempotency_key", sa.String(255), nullable=False),
+            sa.Column("request_hash", sa.String(64)),
+            sa.Column("response", sa.JSON),
+            sa.Column("created_at", sa.DateTime(timezone=True)),
+            sa.Column("expires_at", sa.DateTime(timezone=True)),
+            sa.UniqueConstraint("patient_id", "endpoint", "idempotency_key", name="uq_idempotency_keys_scope"),
+        )
+        op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade():
+    op.drop_table("idempotency_keys")
+    op.drop_table("patient_clinical_state")
+    op.drop_column("sessions", "turn_count")
+    op.drop_column("sessions", "conversation_summary")
@@ -0,0 +1,51 @@
+"""Composite indexes matching the dashboard, history and doctor lookup queries
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_conversation_state_idempotency
+Create Date: 2026-10-19
+
+Built CONCURRENTLY on PostgreSQL so large tables keep taking writes while the
+indexes build. Verify plans with mcp_langgraph_app/benchmarks/bench_indexes.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_hot_path_indexes"
+down_revision = "0002_conversation_state_idempotency"
+branch_labels = None
+depends_on = None
+
+# name -> (table, column expressions)
+INDEXES = {
+    # get_sessions_by_patient, dashboard insights, get_patient_history, get_patient_context
+    "ix_sessions_patient_id_start_time": ("sessions", ["patient_id", sa.text("start_time DESC")]),
+    # get_chat_logs: WHERE session_id = ? ORDER BY timestamp
+    "ix_chat_logs_session_id_timestamp": ("chat_logs", ["session_id", "timestamp"]),
+    # per-session symptom reads and the sessions -> symptom_entries join
+    "ix_symptom_entries_session_id_date": ("symptom_entries", ["session_id", "date"]),
+    # per-patient appointment counts and listings
+    "ix_appointments_patient_id_appointment_date": ("appointments", ["patient_id", sa.text("appointment_date DESC")]),
+    # per-doctor schedule reads
+    "ix_appointments_doctor_id_appointment_date": ("appointments", ["doctor_id", "appointment_date"]),
+    # find_available_doctor / find_doctor_for_symptoms: WHERE city = ? [AND specialization = ?]
+    "ix_doctors_city_specialization": ("doctors", ["city", "specialization"]),
+}
+
+
+def upgrade():
+    is_pg = op.get_bind().dialect.name == "postgresql"
+    existing = set()
+    insp = sa.inspect(op.get_bind())
+    for table, _ in INDEXES.values():
+        existing |= {ix["name"] for ix in insp.get_indexes(table)}
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            if name not in existing:
+                op.create_index(name, table, columns, postgresql_concurrently=is_pg)
+
+
+def downgrade():
+    is_pg = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, (table, _) in INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=is_pg)
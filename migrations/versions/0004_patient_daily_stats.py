@@ -0,0 +1,43 @@
+"""Per-patient daily rollup table
+
+Revision ID: 0004_patient_daily_stats
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-19
+
+Populate existing history afterwards with `python mcp_langgraph_app/backfill_daily_stats.py`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import GUID
+
+revision = "0004_patient_daily_stats"
+down_revision = "0003_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("patient_daily_stats"):
+        return
+    op.create_table(
+        "patient_daily_stats",
+        sa.Column("patient_id", GUID(), sa.ForeignKey("patients.patient_id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("session_count", sa.Integer),
+        sa.Column("severity_sum", sa.Float),
+        sa.Column("severity_max", sa.Float),
+        sa.Column("low_severity_count", sa.Integer),
+        sa.Column("moderate_severity_count", sa.Integer),
+        sa.Column("high_severity_count", sa.Integer),
+        sa.Column("red_flag_count", sa.Integer),
+        sa.Column("symptom_count", sa.Integer),
+        sa.Column("mood_sum", sa.Integer),
+        sa.Column("mood_count", sa.Integer),
+        sa.Column("symptom_counts", sa.JSON),
+        sa.Column("symptom_time_counts", sa.JSON),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table("patient_daily_stats")
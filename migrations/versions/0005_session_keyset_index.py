@@ -0,0 +1,39 @@
+"""Extend the sessions index with session_id for keyset pagination
+
+Revision ID: 0005_session_keyset_index
+Revises: 0004_patient_daily_stats
+Create Date: 2026-10-19
+
+Session lists page on (start_time, session_id) DESC, so session_id is added as
+a tiebreaker column. The old (patient_id, start_time DESC) index is a prefix of
+the new one and is dropped once the replacement exists. Both steps run
+CONCURRENTLY on PostgreSQL.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_session_keyset_index"
+down_revision = "0004_patient_daily_stats"
+branch_labels = None
+depends_on = None
+
+OLD = "ix_sessions_patient_id_start_time"
+NEW = "ix_sessions_patient_id_start_time_session_id"
+
+
+def upgrade():
+    is_pg = op.get_bind().dialect.name == "postgresql"
+    existing = {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("sessions")}
+    with op.get_context().autocommit_block():
+        if NEW not in existing:
+            op.create_index(NEW, "sessions", ["patient_id", sa.text("start_time DESC"), sa.text("session_id DESC")],
+                            postgresql_concurrently=is_pg)
+        if OLD in existing:
+            op.drop_index(OLD, table_name="sessions", postgresql_concurrently=is_pg)
+
+
+def downgrade():
+    is_pg = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(OLD, "sessions", ["patient_id", sa.text("start_time DESC")], postgresql_concurrently=is_pg)
+        op.drop_index(NEW, table_name="sessions", postgresql_concurrently=is_pg)
@@ -0,0 +1,95 @@
+"""Range-partition chat_logs and symptom_entries by month
+
+Revision ID: 0006_partition_chat_logs_symptom_entries
+Revises: 0005_session_keyset_index
+Create Date: 2026-10-19
+
+PostgreSQL only (other dialects keep the plain tables). Each table is rebuilt as
+PARTITION BY RANGE on its time column with one partition per month, from the
+oldest existing row through PARTITION_MONTHS_AHEAD months ahead, and the rows are
+copied across. A partitioned table's primary key must contain the partition key,
+so the key becomes (id, time column) and the time column becomes NOT NULL.
+
+The copy rewrites both tables under an ACCESS EXCLUSIVE lock, so run it in a
+maintenance window. Afterwards keep partitions ahead of time and retire old ones
+with `python mcp_langgraph_app/maintain_partitions.py` (see app/db/partitions.py).
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from app.db import partitions
+from app.core.config import settings
+
+revision = "0006_partition_chat_logs_symptom_entries"
+down_revision = "0005_session_keyset_index"
+branch_labels = None
+depends_on = None
+
+# table -> (id column, session index)
+TABLES = {
+    "chat_logs": ("log_id", "ix_chat_logs_session_id_timestamp"),
+    "symptom_entries": ("entry_id", "ix_symptom_entries_session_id_date"),
+}
+
+
+def _columns(conn, table: str) -> list:
+    return [c["name"] for c in sa.inspect(conn).get_columns(table)]
+
+
+def _add_constraints(conn, table: str, primary_key: str):
+    _, index = TABLES[table]
+    key = partitions.PARTITIONED_TABLES[table][0]
+    conn.execute(sa.text(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})'))
+    conn.execute(sa.text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_session_id_fkey FOREIGN KEY (session_id) "
+                         f"REFERENCES sessions (session_id) ON DELETE CASCADE"))
+    conn.execute(sa.text(f'CREATE INDEX {index} ON {table} (session_id, "{key}")'))
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+    this_month = partitions.month_start(datetime.utcnow().date())
+    for table, (id_column, _) in TABLES.items():
+        if partitions.is_partitioned(conn, table):
+            continue
+        key, is_tz = partitions.PARTITIONED_TABLES[table]
+        legacy = f"{table}_unpartitioned"
+        columns = _columns(conn, table)
+        conn.execute(sa.text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        conn.execute(sa.text(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ("{key}")'))
+        conn.execute(sa.text(f'ALTER TABLE {table} ALTER COLUMN "{key}" SET NOT NULL'))
+
+        utc_key = f"\"{key}\" AT TIME ZONE 'UTC'" if is_tz else f'"{key}"'
+        oldest = conn.execute(sa.text(f"SELECT min({utc_key})::date FROM {legacy}")).scalar()
+        partitions.create_month_partitions(conn, table, min(oldest or this_month, this_month),
+                                           partitions.add_months(this_month, settings.PARTITION_MONTHS_AHEAD))
+
+        # rows without a timestamp cannot be routed to a partition; stamp them with the migration time
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        select_list = ", ".join(f'coalesce("{c}", now())' if c == key else f'"{c}"' for c in columns)
+        conn.execute(sa.text(f"INSERT INTO {table} ({column_list}) SELECT {select_list} FROM {legacy}"))
+        conn.execute(sa.text(f"DROP TABLE {legacy}"))
+        _add_constraints(conn, table, f'{id_column}, "{key}"')
+        conn.execute(sa.text(f"ANALYZE {table}"))
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+    for table, (id_column, _) in TABLES.items():
+        if not partitions.is_partitioned(conn, table):
+            continue
+        key, _ = partitions.PARTITIONED_TABLES[table]
+        partitioned = f"{table}_partitioned"
+        conn.execute(sa.text(f"ALTER TABLE {table} RENAME TO {partitioned}"))
+        conn.execute(sa.text(f"ALTER TABLE {partitioned} DROP CONSTRAINT {table}_pkey"))
+        conn.execute(sa.text(f"ALTER TABLE {partitioned} DROP CONSTRAINT {table}_session_id_fkey"))
+        conn.execute(sa.text(f"DROP INDEX {TABLES[table][1]}"))
+        conn.execute(sa.text(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)"))
+        conn.execute(sa.text(f'ALTER TABLE {table} ALTER COLUMN "{key}" DROP NOT NULL'))
+        conn.execute(sa.text(f"INSERT INTO {table} SELECT * FROM {partitioned}"))
+        # drops the attached partitions with it; detached/archived partitions are left alone
+        conn.execute(sa.text(f"DROP TABLE {partitioned}"))
+        _add_constraints(conn, table, id_column)
@@ -0,0 +1,59 @@
+"""Bookable appointment slots
+
+Revision ID: 0007_appointment_slots
+Revises: 0006_partition_chat_logs_symptom_entries
+Create Date: 2026-10-19
+
+Adds appointment_slots and appointments.slot_id. On PostgreSQL a GiST exclusion
+constraint over (doctor_id, tstzrange(starts_at, ends_at)) keeps a doctor's
+slots from overlapping and doubles as the interval index for "free between"
+queries (it needs the btree_gist extension). A partial index on unbooked slots
+serves next-free-slot lookups on every dialect. Slots are generated on demand by
+crud.ensure_doctor_slots.
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import GUID
+
+revision = "0007_appointment_slots"
+down_revision = "0006_partition_chat_logs_symptom_entries"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    is_pg = conn.dialect.name == "postgresql"
+    if not sa.inspect(conn).has_table("appointment_slots"):
+        op.create_table(
+            "appointment_slots",
+            sa.Column("slot_id", GUID(), primary_key=True),
+            sa.Column("doctor_id", GUID(), sa.ForeignKey("doctors.doctor_id", ondelete="CASCADE"), nullable=False),
+            sa.Column("starts_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("ends_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("booked_at", sa.DateTime(timezone=True)),
+            sa.Column("created_at", sa.DateTime(timezone=True)),
+            sa.UniqueConstraint("doctor_id", "starts_at", name="uq_appointment_slots_doctor_start"),
+        )
+        free = sa.text("booked_at IS NULL")
+        op.create_index("ix_appointment_slots_free", "appointment_slots", ["doctor_id", "starts_at"],
+                        postgresql_where=free, sqlite_where=free)
+        if is_pg:
+            op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+            op.execute("ALTER TABLE appointment_slots ADD CONSTRAINT ex_appointment_slots_no_overlap "
+                       "EXCLUDE USING gist (doctor_id WITH =, tstzrange(starts_at, ends_at) WITH &&)")
+
+    if "slot_id" not in {c["name"] for c in sa.inspect(conn).get_columns("appointments")}:
+        with op.batch_alter_table("appointments") as batch:
+            batch.add_column(sa.Column("slot_id", GUID()))
+            batch.create_foreign_key("fk_appointments_slot_id", "appointment_slots", ["slot_id"], ["slot_id"], ondelete="SET NULL")
+            batch.create_unique_constraint("uq_appointments_slot_id", ["slot_id"])
+
+
+def downgrade():
+    with op.batch_alter_table("appointments") as batch:
+        batch.drop_constraint("uq_appointments_slot_id", type_="unique")
+        batch.drop_constraint("fk_appointments_slot_id", type_="foreignkey")
+        batch.drop_column("slot_id")
+    op.drop_index("ix_appointment_slots_free", table_name="appointment_slots")
+    op.drop_table("appointment_slots")
@@ -0,0 +1,40 @@
+"""One patient_doctor_history row per (patient, doctor)
+
+Revision ID: 0008_patient_doctor_history_keys
+Revises: 0007_appointment_slots
+Create Date: 2026-10-19
+
+Appointment booking now upserts the patient's row for the doctor
+(crud.record_patient_doctor), which needs a unique key, and doctor search
+reads a patient's most recent doctors first. Duplicate rows, if any, are
+collapsed to the most recently updated one before the unique index is built.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_patient_doctor_history_keys"
+down_revision = "0007_appointment_slots"
+branch_labels = None
+depends_on = None
+
+UNIQUE = "uq_patient_doctor_history_patient_doctor"
+RECENT = "ix_patient_doctor_history_patient_id_updated_at"
+
+
+def upgrade():
+    existing = {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("patient_doctor_history")}
+    if UNIQUE not in existing:
+        op.execute("""DELETE FROM patient_doctor_history WHERE pd_id IN (
+            SELECT pd_id FROM (
+                SELECT pd_id, ROW_NUMBER() OVER (PARTITION BY patient_id, doctor_id
+                                                 ORDER BY updated_at DESC, created_at DESC) AS rn
+                FROM patient_doctor_history) ranked
+            WHERE rn > 1)""")
+        op.create_index(UNIQUE, "patient_doctor_history", ["patient_id", "doctor_id"], unique=True)
+    if RECENT not in existing:
+        op.create_index(RECENT, "patient_doctor_history", ["patient_id", sa.text("updated_at DESC")])
+
+
+def downgrade():
+    op.drop_index(RECENT, table_name="patient_doctor_history")
+    op.drop_index(UNIQUE, table_name="patient_doctor_history")
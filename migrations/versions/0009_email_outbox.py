@@ -0,0 +1,45 @@
+"""Email outbox for queued appointment notifications
+
+Revision ID: 0009_email_outbox
+Revises: 0008_patient_doctor_history_keys
+Create Date: 2026-10-19
+
+book_emergency_appointment writes its confirmation emails to email_outbox in
+the booking transaction instead of sending them inline. The API's outbox worker
+delivers them afterwards and retries failures with backoff. The partial index
+covers the worker's "pending and due" scan.
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import GUID
+
+revision = "0009_email_outbox"
+down_revision = "0008_patient_doctor_history_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("email_outbox"):
+        return
+    op.create_table(
+        "email_outbox",
+        sa.Column("email_id", GUID(), primary_key=True),
+        sa.Column("appointment_id", GUID(), sa.ForeignKey("appointments.appointment_id", ondelete="CASCADE")),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("status", sa.String(20)),
+        sa.Column("attempts", sa.Integer()),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True)),
+        sa.Column("sent_at", sa.DateTime(timezone=True)),
+    )
+    pending = sa.text("status = 'pending'")
+    op.create_index("ix_email_outbox_pending", "email_outbox", ["next_attempt_at"],
+                    postgresql_where=pending, sqlite_where=pending)
+
+
+def downgrade():
+    op.drop_index("ix_email_outbox_pending", table_name="email_outbox")
+    op.drop_table("email_outbox")
@@ -0,0 +1,38 @@
+"""Checkpoints for the Fernet key rotation job
+
+Revision ID: 0010_key_rotation_progress
+Revises: 0009_email_outbox
+Create Date: 2026-10-19
+
+One row per encrypted table. It records how far the re-encryption job
+(mcp_langgraph_app/rotate_encryption_keys.py) has got under the current key, so
+an interrupted rotation resumes where it stopped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_key_rotation_progress"
+down_revision = "0009_email_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("key_rotation_progress"):
+        return
+    op.create_table(
+        "key_rotation_progress",
+        sa.Column("table_name", sa.String(63), primary_key=True),
+        sa.Column("key_id", sa.String(16), nullable=False),
+        sa.Column("last_pk", sa.String(64)),
+        sa.Column("rows_scanned", sa.Integer()),
+        sa.Column("rows_rotated", sa.Integer()),
+        sa.Column("rows_failed", sa.Integer()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table("key_rotation_progress")
@@ -0,0 +1,64 @@
+"""Keyed-hash verifier for patient secret keys
+
+Revision ID: 0011_patient_secret_key_verifier
+Revises: 0010_key_rotation_progress
+Create Date: 2026-10-19
+
+Logins compare the submitted secret key with patients.secret_key_verifier
+(security.secret_key_verifier, an HMAC) in constant time instead of
+decrypting secret_key_encrypted. Existing rows are filled here by decrypting
+them once, in primary-key batches. A row that cannot be decrypted with the
+configured Fernet keys stays NULL. crud.verify_patient_credentials then checks
+that row the old way and fills it on the next successful login.
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.core import security
+from app.db.types import GUID
+
+revision = "0011_patient_secret_key_verifier"
+down_revision = "0010_key_rotation_progress"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+patients = sa.table(
+    "patients",
+    sa.column("patient_id", GUID()),
+    sa.column("secret_key_encrypted", sa.LargeBinary),
+    sa.column("secret_key_verifier", sa.String(64)),
+)
+
+
+def _backfill(conn):
+    last = None
+    while True:
+        query = (sa.select(patients.c.patient_id, patients.c.secret_key_encrypted)
+                 .where(patients.c.secret_key_verifier.is_(None), patients.c.secret_key_encrypted.isnot(None))
+                 .order_by(patients.c.patient_id).limit(BATCH_SIZE))
+        if last is not None:
+            query = query.where(patients.c.patient_id > last)
+        rows = conn.execute(query).all()
+        if not rows:
+            return
+        for patient_id, cipher in rows:
+            try:
+                verifier = security.secret_key_verifier(security.decrypt_bytes(cipher))
+            except Exception:
+                continue
+            conn.execute(patients.update().where(patients.c.patient_id == patient_id)
+                         .values(secret_key_verifier=verifier))
+        last = rows[-1][0]
+
+
+def upgrade():
+    conn = op.get_bind()
+    if "secret_key_verifier" not in {c["name"] for c in sa.inspect(conn).get_columns("patients")}:
+        op.add_column("patients", sa.Column("secret_key_verifier", sa.String(64)))
+    _backfill(conn)
+
+
+def downgrade():
+    with op.batch_alter_table("patients") as batch:
+        batch.drop_column("secret_key_verifier")
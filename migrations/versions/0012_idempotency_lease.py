@@ -0,0 +1,29 @@
+"""In-progress lease on idempotency keys
+
+Revision ID: 0012_idempotency_lease
+Revises: 0011_patient_secret_key_verifier
+Create Date: 2026-10-19
+
+A claimed key without a stored response used to block retries until the key
+expired (IDEMPOTENCY_TTL_HOURS). locked_until bounds that to
+IDEMPOTENCY_LEASE_SECONDS. After it, a retry with the same payload takes the
+key over (crud.idempotency_takeover). Existing rows get NULL, which counts as
+an expired lease.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_idempotency_lease"
+down_revision = "0011_patient_secret_key_verifier"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "locked_until" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("idempotency_keys")}:
+        op.add_column("idempotency_keys", sa.Column("locked_until", sa.DateTime(timezone=True)))
+
+
+def downgrade():
+    with op.batch_alter_table("idempotency_keys") as batch:
+        batch.drop_column("locked_until")
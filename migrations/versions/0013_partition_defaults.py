@@ -0,0 +1,39 @@
+"""DEFAULT partitions for chat_logs and symptom_entries
+
+Revision ID: 0013_partition_defaults
+Revises: 0012_idempotency_lease
+Create Date: 2026-10-19
+
+PostgreSQL only. Monthly partitions are created ahead of time by the API's
+startup and maintain_partitions.py. If neither runs for longer than
+PARTITION_MONTHS_AHEAD months, inserts used to fail with "no partition of
+relation found for row". A DEFAULT partition now accepts those rows, and the
+next ensure_partitions() moves them into their monthly partitions.
+"""
+from alembic import op
+from app.db import partitions
+
+revision = "0013_partition_defaults"
+down_revision = "0012_idempotency_lease"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+    for table in partitions.PARTITIONED_TABLES:
+        if partitions.is_partitioned(conn, table):
+            partitions.create_default_partition(conn, table)
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+    for table in partitions.PARTITIONED_TABLES:
+        if partitions.is_partitioned(conn, table):
+            # give any rows in the default partition a monthly partition before dropping it
+            partitions.drain_default_partition(conn, table)
+            op.execute(f"DROP TABLE IF EXISTS {partitions.default_partition_name(table)}")
@@ -0,0 +1,53 @@
+"""Test fixtures: the SQLite profile against a throwaway database migrated to head."""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+from cryptography.fernet import Fernet
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# settings are read at import time, so the environment must be in place before any app import
+_db_dir = tempfile.mkdtemp(prefix="symptom_tracker_tests_")
+os.environ.update({
+    "DB_PROFILE": "sqlite",
+    "SQLITE_PATH": os.path.join(_db_dir, "test.db"),
+    "FERNET_KEY": Fernet.generate_key().decode(),
+    "FERNET_OLD_KEYS": "",
+    "JWT_SECRET_KEY": "test-jwt-secret",
+    "SECRET_KEY_VERIFIER_KEY": "test-verifier-key",
+    "GEMINI_API_KEY": "test",
+    "SMTP_HOST": "",
+    "SMTP_USER": "",
+    "SMTP_PASS": "",
+})
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    from alembic import command
+    from alembic.config import Config
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(config, "head")
+    yield
+
+
+@pytest.fixture
+def db():
+    from app.db.session import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def patient(db):
+    from app import crud
+    return crud.create_patient(db, "Test Patient", f"{uuid.uuid4().hex}@example.com", "pw", "secret", city="Chicago")
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import crud
+from app.db import models
+from app.db.session import SessionLocal, async_engine
+
+
+def _doctor(db, city, specialization="Cardiologist"):
+    doctor = models.Doctor(full_name=f"Dr {uuid.uuid4().hex[:6]}", specialization=specialization, city=city,
+                           clinic_name="Clinic", contact_email="doc@example.com")
+    db.add(doctor)
+    db.commit()
+    return doctor
+
+
+def test_emergency_booking_picks_the_doctor_outside_the_transaction(db, patient, monkeypatch):
+    from mcp_langgraph_app.mcp_server import fastmcp_server
+    doctor = _doctor(db, patient.city)
+    session = crud.create_session(db, patient.patient_id, ai_summary="chest pain since noon")
+    crud.create_symptom_entry(db, session.session_id, 3, "chest pain", 9)
+
+    choose = fastmcp_server._choose_doctor
+    checked_out = []
+
+    async def watched_choose(*args):
+        checked_out.append(async_engine.sync_engine.pool.checkedout())
+        return await choose(*args)
+    monkeypatch.setattr(fastmcp_server, "_choose_doctor", watched_choose)
+
+    result = json.loads(asyncio.run(fastmcp_server.book_emergency_appointment(str(patient.patient_id), str(session.session_id))))
+    assert result["success"], result
+    assert checked_out == [0]
+    appointment = db.get(models.Appointment, uuid.UUID(result["appointment_id"]))
+    assert appointment.doctor_id == doctor.doctor_id and appointment.slot_id is not None
+    assert db.query(models.EmailOutbox).filter_by(appointment_id=appointment.appointment_id).count() == 1
+
+
+def test_each_booking_claims_its_own_slot(db, patient):
+    doctor = _doctor(db, patient.city)
+    first = crud.book_slot(db, patient.patient_id, doctor, None)
+    second = crud.book_slot(db, patient.patient_id, doctor, None)
+    db.commit()
+    assert first.slot_id != second.slot_id
+    assert first.appointment_date < second.appointment_date
+
+
+def test_losing_a_slot_race_moves_to_the_next_slot(db, patient):
+    doctor = _doctor(db, patient.city)
+    earliest = crud.earliest_booking_time()
+    crud.ensure_doctor_slots(db, doctor, earliest)
+    db.commit()
+
+    with SessionLocal() as other:
+        # both bookers see the same first free slot; FOR UPDATE is a no-op on SQLite
+        seen = other.execute(crud.free_slot_query(doctor.doctor_id, earliest)).scalars().first()
+        taken = crud.book_slot(db, patient.patient_id, doctor, None, earliest=earliest)
+        db.commit()
+        assert taken.slot_id == seen.slot_id
+
+        assert other.execute(crud.claim_slot_statement(seen.slot_id)).rowcount == 0
+        slot = crud.claim_slot(other, doctor.doctor_id, earliest)
+        other.commit()
+        assert slot.slot_id != seen.slot_id
+
+
+def test_a_slot_backs_at_most_one_appointment(db, patient):
+    doctor = _doctor(db, patient.city)
+    booked = crud.book_slot(db, patient.patient_id, doctor, None)
+    db.commit()
+    db.add(models.Appointment(patient_id=patient.patient_id, doctor_id=doctor.doctor_id, slot_id=booked.slot_id,
+                              appointment_date=booked.appointment_date))
+    with pytest.raises(IntegrityError):
+        db.commit()
@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from app.db import models
+from app.services import doctor_directory, doctor_load
+
+
+def _doctor(db, city):
+    doctor = models.Doctor(full_name=f"Dr {uuid.uuid4().hex[:6]}", specialization="Cardiologist", city=city)
+    db.add(doctor)
+    db.commit()
+    return doctor
+
+
+def test_updates_and_deletes_are_folded_into_the_load(db, patient):
+    city = f"Loadville {uuid.uuid4().hex[:6]}"
+    first, second = _doctor(db, city), _doctor(db, city)
+    doctor_load.current(db)
+
+    appointment = models.Appointment(patient_id=patient.patient_id, doctor_id=first.doctor_id,
+                                     appointment_date=datetime.utcnow() + timedelta(hours=2))
+    db.add(appointment)
+    db.commit()
+    assert doctor_load.current(db).load(first.doctor_id) == 1
+
+    appointment.status = "cancelled"
+    db.commit()
+    assert doctor_load.current(db).load(first.doctor_id) == 0
+
+    appointment.status = "pending"
+    appointment.doctor_id = second.doctor_id
+    db.commit()
+    tracker = doctor_load.current(db)
+    assert (tracker.load(first.doctor_id), tracker.load(second.doctor_id)) == (0, 1)
+    assert tracker.least_loaded(city).doctor_id == first.doctor_id
+
+    # rescheduled outside the window: it stops counting now and re-enters a day before it starts
+    appointment.appointment_date = datetime.utcnow() + timedelta(days=3)
+    db.commit()
+    assert doctor_load.current(db).load(second.doctor_id) == 0
+
+    appointment.appointment_date = datetime.utcnow() + timedelta(hours=1)
+    db.commit()
+    assert doctor_load.current(db).load(second.doctor_id) == 1
+
+    db.delete(appointment)
+    db.commit()
+    assert doctor_load.current(db).load(second.doctor_id) == 0
+
+
+def test_rolled_back_changes_are_not_applied(db, patient):
+    doctor = _doctor(db, f"Loadville {uuid.uuid4().hex[:6]}")
+    doctor_load.current(db)
+    db.add(models.Appointment(patient_id=patient.patient_id, doctor_id=doctor.doctor_id,
+                              appointment_date=datetime.utcnow() + timedelta(hours=2)))
+    db.flush()
+    db.rollback()
+    assert doctor_load.current(db).load(doctor.doctor_id) == 0
+
+
+def test_cold_process_scopes_the_load_to_the_search(db, patient, monkeypatch):
+    city = f"Coldville {uuid.uuid4().hex[:6]}"
+    cardiologist = _doctor(db, city)
+    _doctor(db, f"Elsewhere {uuid.uuid4().hex[:6]}")
+    db.add(models.Appointment(patient_id=patient.patient_id, doctor_id=cardiologist.doctor_id,
+                              appointment_date=datetime.utcnow() + timedelta(hours=3)))
+    db.commit()
+    # a freshly spawned MCP server: nothing loaded yet
+    monkeypatch.setitem(doctor_directory._state, "directory", None)
+    monkeypatch.setitem(doctor_load._state, "tracker", None)
+
+    tracker = asyncio.run(doctor_load.scoped_async(city, "Cardiologist"))
+    assert [d.doctor_id for d in tracker.directory.doctors] == [cardiologist.doctor_id]
+    assert tracker.load(cardiologist.doctor_id) == 1
+    assert tracker.least_loaded(city, "Cardiologist").doctor_id == cardiologist.doctor_id
+    assert doctor_directory._state["directory"] is None and doctor_load._state["tracker"] is None
+    assert asyncio.run(doctor_load.scoped_async(city, "Neurologist")).directory.doctors == []
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services import email_outbox
+
+PAYLOAD = {"patient_email": "p@example.com", "patient_name": "P", "doctor_email": "d@example.com",
+           "doctor_name": "D", "clinic_name": "C", "appointment_date": "2026-10-20T09:00:00",
+           "symptoms_summary": "cough", "appointment_type": "emergency", "photo_urls": []}
+
+
+@pytest.fixture(autouse=True)
+def smtp(monkeypatch, db):
+    monkeypatch.setattr(settings, "SMTP_HOST", "smtp.test")
+    monkeypatch.setattr(settings, "SMTP_USER", "bot@example.com")
+    monkeypatch.setattr(settings, "SMTP_PASS", "pw")
+    # rows left due by other tests would be delivered into these ones
+    db.query(models.EmailOutbox).filter(models.EmailOutbox.status == "pending").update({"status": "failed"})
+    db.commit()
+
+
+@pytest.fixture
+def entry(db):
+    entry = email_outbox.enqueue(db, email_outbox.APPOINTMENT_CONFIRMATION, PAYLOAD)
+    db.commit()
+    return entry
+
+
+def _reload(db, entry):
+    db.expire_all()
+    return db.get(models.EmailOutbox, entry.email_id)
+
+
+def _make_due(db, entry):
+    entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+
+def test_failures_back_off_exponentially_then_succeed(db, entry, monkeypatch):
+    def down(messages):
+        raise OSError("connection refused")
+    monkeypatch.setattr(email_outbox, "_send", down)
+
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        assert email_outbox.deliver_due() == {"sent": 0, "retried": 1, "failed": 0}
+        entry = _reload(db, entry)
+        assert (entry.status, entry.attempts, entry.last_error) == ("pending", attempt, "connection refused")
+        delay = (entry.next_attempt_at.replace(tzinfo=None) - before).total_seconds()
+        expected = settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (attempt - 1)
+        assert expected <= delay < expected + 5
+        # not due yet
+        assert email_outbox.deliver_due() == {"sent": 0, "retried": 0, "failed": 0}
+        _make_due(db, entry)
+
+    sent = []
+    monkeypatch.setattr(email_outbox, "_send", sent.extend)
+    assert email_outbox.deliver_due() == {"sent": 1, "retried": 0, "failed": 0}
+    entry = _reload(db, entry)
+    assert (entry.status, entry.attempts, entry.last_error) == ("sent", 3, None)
+    assert [m["To"] for m in sent] == ["p@example.com", "d@example.com"]
+
+
+def test_gives_up_after_max_attempts(db, entry, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(email_outbox, "_send", lambda messages: 1 / 0)
+    assert email_outbox.deliver_due()["retried"] == 1
+    _make_due(db, _reload(db, entry))
+    assert email_outbox.deliver_due()["failed"] == 1
+    assert _reload(db, entry).status == "failed"
+
+
+def test_send_happens_outside_the_claiming_transaction(db, entry, monkeypatch):
+    def send(messages):
+        # on SQLite a still-open claim transaction would hold the write lock and this would time out
+        with SessionLocal() as other:
+            other.get(models.EmailOutbox, entry.email_id).last_error = "written during send"
+            other.commit()
+    monkeypatch.setattr(email_outbox, "_send", send)
+    assert email_outbox.deliver_due()["sent"] == 1
+
+
+def test_claim_expires_and_a_late_result_is_ignored(db, entry, monkeypatch):
+    with SessionLocal() as worker:
+        (claimed,) = email_outbox._claim(worker, datetime.utcnow())
+    # claimed, so a second worker does not send it...
+    monkeypatch.setattr(email_outbox, "_send", lambda messages: None)
+    assert email_outbox.deliver_due()["sent"] == 0
+    # ...until the first worker's claim runs out
+    _make_due(db, _reload(db, entry))
+    assert email_outbox.deliver_due()["sent"] == 1
+    entry = _reload(db, entry)
+    assert (entry.status, entry.attempts) == ("sent", 2)
+
+    # the first worker waking up late cannot overwrite the outcome
+    email_id, _, _, attempts = claimed
+    with SessionLocal() as worker:
+        assert worker.execute(email_outbox._outbox_row(email_id, attempts).values(status="failed")).rowcount == 0
+
+
+def test_unreadable_photo_is_skipped_not_fatal(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(email_outbox, "UPLOADS_DIR", str(tmp_path))
+    (tmp_path / "good.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 16)
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    entry = email_outbox.enqueue(db, email_outbox.APPOINTMENT_CONFIRMATION,
+                                 {**PAYLOAD, "photo_urls": ["/uploads/broken.png", "/uploads/good.png", "/uploads/gone.png"]})
+    db.commit()
+    sent = []
+    monkeypatch.setattr(email_outbox, "_send", sent.extend)
+    assert email_outbox.deliver_due()["sent"] == 1
+    attachments = [part.get_filename() for part in sent[1].walk() if part.get_filename()]
+    assert attachments == ["good.png"]
+    assert _reload(db, entry).status == "sent"
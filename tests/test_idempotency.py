@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.db import models
+from app.db.session import AsyncSessionLocal
+from app.services import idempotency
+
+ENDPOINT = "tests.submit"
+
+
+def _key():
+    return uuid.uuid4().hex
+
+
+def test_replay_returns_stored_response(db, patient):
+    key, payload = _key(), {"mood": 3}
+    record, stored = idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    assert stored is None
+    idempotency.complete(db, record, {"session_id": "s1"})
+
+    _, stored = idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    assert stored == {"session_id": "s1"}
+
+
+def test_different_payload_is_rejected(db, patient):
+    key = _key()
+    record, _ = idempotency.begin(db, patient.patient_id, ENDPOINT, key, {"mood": 3})
+    idempotency.complete(db, record, {"ok": True})
+    with pytest.raises(HTTPException) as e:
+        idempotency.begin(db, patient.patient_id, ENDPOINT, key, {"mood": 4})
+    assert e.value.status_code == 422
+
+
+def test_in_flight_request_conflicts_until_lease_expires(db, patient):
+    key, payload = _key(), {"mood": 3}
+    record, _ = idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    with pytest.raises(HTTPException) as e:
+        idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    assert e.value.status_code == 409
+    assert "Retry-After" in e.value.headers
+
+    # the claimant died: once its lease runs out a retry takes the key over
+    record.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    taken, stored = idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    assert stored is None and taken.key_id == record.key_id
+    assert taken.locked_until > datetime.utcnow()
+
+
+def test_expired_lease_with_other_payload_is_not_taken_over(db, patient):
+    key = _key()
+    record, _ = idempotency.begin(db, patient.patient_id, ENDPOINT, key, {"mood": 3})
+    record.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    with pytest.raises(HTTPException) as e:
+        idempotency.begin(db, patient.patient_id, ENDPOINT, key, {"mood": 5})
+    assert e.value.status_code == 422
+
+
+def test_release_after_failure_lets_the_retry_run(db, patient):
+    key, payload = _key(), {"mood": 3}
+    record, _ = idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    idempotency.release(db, record)
+    assert db.query(models.IdempotencyKey).filter_by(idempotency_key=key).count() == 0
+    _, stored = idempotency.begin(db, patient.patient_id, ENDPOINT, key, payload)
+    assert stored is None
+
+
+def test_async_takeover_of_abandoned_claim(patient):
+    key, payload = _key(), {"mood": 2}
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            record, _ = await idempotency.begin_async(db, patient.patient_id, ENDPOINT, key, payload)
+            record.locked_until = datetime.utcnow() - timedelta(seconds=1)
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            taken, stored = await idempotency.begin_async(db, patient.patient_id, ENDPOINT, key, payload)
+            assert stored is None
+            await idempotency.complete_async(db, taken, {"ok": True})
+            _, stored = await idempotency.begin_async(db, patient.patient_id, ENDPOINT, key, payload)
+            assert stored == {"ok": True}
+
+    asyncio.run(run())
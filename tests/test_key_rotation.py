@@ -0,0 +1,67 @@
+import pytest
+from cryptography.fernet import Fernet, MultiFernet
+
+from app.core import security
+from app.core.config import settings
+from app.db import models
+from app.services import key_rotation
+
+TABLE = "notifications"
+ROWS = 25
+BATCH = 10
+
+
+@pytest.fixture
+def old_rows(db):
+    db.query(models.Notification).delete()
+    db.query(models.KeyRotationProgress).filter_by(table_name=TABLE).delete()
+    db.add_all(models.Notification(channel="email", message=security.encrypt_bytes(f"message {i}")) for i in range(ROWS))
+    db.commit()
+
+
+@pytest.fixture
+def new_key(monkeypatch, old_rows):
+    """Rotate in a new primary key, keeping the old one readable, as a deployment would."""
+    old, new = settings.FERNET_KEY, Fernet.generate_key().decode()
+    monkeypatch.setattr(settings, "FERNET_KEY", new)
+    monkeypatch.setattr(settings, "FERNET_OLD_KEYS", old)
+    monkeypatch.setattr(security, "primary_fernet", Fernet(new.encode()))
+    monkeypatch.setattr(security, "fernet", MultiFernet([Fernet(new.encode()), Fernet(old.encode())]))
+
+
+def test_interrupted_rotation_resumes_from_its_checkpoint(db, new_key, monkeypatch):
+    rotate_batch, batches = key_rotation._rotate_batch, []
+
+    def dies_after_first_batch(*args):
+        if batches:
+            raise KeyboardInterrupt
+        batches.append(rotate_batch(*args))
+        return batches[-1]
+    monkeypatch.setattr(key_rotation, "_rotate_batch", dies_after_first_batch)
+    with pytest.raises(KeyboardInterrupt):
+        key_rotation.rotate_table(TABLE, batch_size=BATCH, rows_per_second=0)
+
+    progress = db.get(models.KeyRotationProgress, TABLE)
+    assert (progress.rows_scanned, progress.rows_rotated, progress.completed_at) == (BATCH, BATCH, None)
+    assert progress.key_id == security.key_id()
+
+    monkeypatch.setattr(key_rotation, "_rotate_batch", rotate_batch)
+    summary = key_rotation.rotate_table(TABLE, batch_size=BATCH, rows_per_second=0)
+    # the resumed run picked up after the checkpoint instead of rescanning the first batch
+    assert summary == {"table": TABLE, "key_id": security.key_id(), "rows_scanned": ROWS, "rows_rotated": ROWS,
+                       "rows_failed": 0, "completed": True}
+    db.expire_all()
+    messages = [n.message for n in db.query(models.Notification)]
+    assert all(security.is_current(m) for m in messages)
+    assert sorted(security.decrypt_many(messages)) == sorted(f"message {i}" for i in range(ROWS))
+
+    # a completed table is not walked again until the primary key changes
+    assert key_rotation.rotate_table(TABLE, batch_size=BATCH, rows_per_second=0)["rows_scanned"] == ROWS
+    assert next(s for s in key_rotation.status(db) if s["table"] == TABLE)["completed"]
+
+
+def test_unreadable_rows_are_counted_and_skipped(db, new_key):
+    db.add(models.Notification(channel="email", message=Fernet(Fernet.generate_key()).encrypt(b"lost key")))
+    db.commit()
+    summary = key_rotation.rotate_table(TABLE, batch_size=BATCH, rows_per_second=0, restart=True)
+    assert (summary["rows_scanned"], summary["rows_rotated"], summary["rows_failed"]) == (ROWS + 1, ROWS, 1)
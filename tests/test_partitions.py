@@ -0,0 +1,67 @@
+"""PostgreSQL-only: runs against TEST_POSTGRES_URL (a scratch database) and is skipped without it."""
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db import partitions
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason="set TEST_POSTGRES_URL to run the PostgreSQL partition tests")
+
+
+@pytest.fixture
+def pg():
+    """An engine whose search_path is a throwaway schema holding a partitioned chat_logs with a DEFAULT partition."""
+    schema = f"partition_test_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(POSTGRES_URL)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(POSTGRES_URL, connect_args={"options": f"-csearch_path={schema}"})
+    this_month = partitions.month_start(datetime.utcnow().date())
+    old_month = partitions.add_months(this_month, -6)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE chat_logs (log_id uuid NOT NULL, "timestamp" timestamptz NOT NULL, '
+                          'PRIMARY KEY (log_id, "timestamp")) PARTITION BY RANGE ("timestamp")'))
+        partitions.create_default_partition(conn, "chat_logs")
+        partitions.create_month_partitions(conn, "chat_logs", old_month, this_month)
+        for month in (old_month, this_month):
+            conn.execute(text("INSERT INTO chat_logs VALUES (gen_random_uuid(), :t)"), {"t": f"{month} 12:00:00+00"})
+        # a row for a month without a partition lands in the default one
+        conn.execute(text("INSERT INTO chat_logs VALUES (gen_random_uuid(), :t)"),
+                     {"t": f"{partitions.add_months(this_month, 24)} 12:00:00+00"})
+    yield engine, schema, old_month
+    engine.dispose()
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema}_archive CASCADE"))
+    admin.dispose()
+
+
+def test_detaches_expired_month_while_the_default_partition_exists(pg):
+    engine, schema, old_month = pg
+    expired = partitions.partition_name("chat_logs", old_month)
+    retired = partitions.detach_expired_partitions(engine, retain_months=3, archive_schema=f"{schema}_archive")
+    assert expired in retired
+    with engine.connect() as conn:
+        attached = [name for name, _ in partitions.list_month_partitions(conn, "chat_logs")]
+        assert expired not in attached
+        assert conn.execute(text(f"SELECT count(*) FROM {schema}_archive.{expired}")).scalar() == 1
+        assert conn.execute(text(f"SELECT count(*) FROM {partitions.default_partition_name('chat_logs')}")).scalar() == 1
+
+
+def test_detach_gives_way_to_a_held_lock(pg, monkeypatch):
+    engine, _, old_month = pg
+    monkeypatch.setattr(partitions, "DETACH_ATTEMPTS", 1)
+    monkeypatch.setattr(partitions, "DETACH_LOCK_TIMEOUT_MS", 100)
+    expired = partitions.partition_name("chat_logs", old_month)
+    with engine.connect() as reader:
+        # an open transaction holding any lock on the parent blocks DETACH's ACCESS EXCLUSIVE lock
+        reader.execute(text("LOCK TABLE chat_logs IN ACCESS SHARE MODE"))
+        assert partitions.detach_expired_partitions(engine, retain_months=3, drop=True) == []
+        reader.rollback()
+    with engine.connect() as conn:
+        assert expired in [name for name, _ in partitions.list_month_partitions(conn, "chat_logs")]
+    assert partitions.detach_expired_partitions(engine, retain_months=3, drop=True) == [expired]
@@ -0,0 +1,27 @@
+import time
+
+from fastapi import Response
+
+from app.core.config import settings
+from app.db import routing
+
+
+def test_write_marker_is_returned_and_honoured():
+    response = Response()
+    routing.mark_write("patient-a", response)
+    marker = response.headers[routing.LAST_WRITE_HEADER]
+    assert routing.LAST_WRITE_COOKIE in response.headers["set-cookie"]
+
+    # another worker has no local record of the write, but the client's marker pins the read
+    routing._recent_writes.clear()
+    assert routing._wrote_recently("patient-a", marker)
+    stale = str(time.time() - settings.READ_YOUR_WRITES_SECONDS - 1)
+    assert not routing._wrote_recently("patient-a", stale)
+    assert not routing._wrote_recently("patient-a", "not-a-timestamp")
+
+
+def test_local_write_map_prunes_expired_entries_on_insert():
+    routing._recent_writes.clear()
+    routing._recent_writes["old"] = time.time() - settings.READ_YOUR_WRITES_SECONDS - 1
+    routing.mark_write("new")
+    assert list(routing._recent_writes) == ["new"]
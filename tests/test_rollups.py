@@ -0,0 +1,43 @@
+import threading
+import time
+from datetime import datetime
+
+from app import crud
+from app.db import models
+from app.db.session import SessionLocal
+
+
+def _race(first_insert):
+    """Run `first_insert(db)` in two sessions, the second starting while the first is still uncommitted."""
+    errors = []
+    first = SessionLocal()
+    first_insert(first)
+    first.flush()
+
+    def second():
+        with SessionLocal() as db:
+            try:
+                first_insert(db)
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+    thread = threading.Thread(target=second)
+    thread.start()
+    time.sleep(0.3)
+    first.commit()
+    first.close()
+    thread.join(30)
+    assert errors == []
+
+
+def test_first_submissions_of_the_day_both_count(db, patient):
+    day = datetime.utcnow().date()
+    _race(lambda s: crud.update_patient_daily_stats(s, patient.patient_id, day, 5, False, 3, ["cough"]))
+    st = db.get(models.PatientDailyStats, (patient.patient_id, day))
+    assert (st.session_count, st.symptom_counts) == (2, {"cough": 2})
+
+
+def test_first_submissions_both_reach_the_clinical_state(db, patient):
+    _race(lambda s: crud.update_patient_clinical_state(s, patient.patient_id, ["headache"], 4))
+    st = db.get(models.PatientClinicalState, patient.patient_id)
+    assert (st.session_count, st.symptom_counts, st.recent_severities) == (2, {"headache": 2}, [4.0, 4.0])
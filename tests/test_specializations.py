@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import specializations
+
+SYMPTOMS = [{"symptom": "chest pain", "intensity": 6}]
+
+
+class _Model:
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def generate_content_async(self, prompt):
+        return type("Response", (), {"text": json.dumps(self.reply)})()
+
+
+def _analyze(monkeypatch, reply):
+    from mcp_langgraph_app.mcp_server import fastmcp_server
+    monkeypatch.setattr(fastmcp_server.genai, "GenerativeModel", lambda name: _Model(reply))
+    return json.loads(asyncio.run(fastmcp_server.analyze_symptoms_with_ai(SYMPTOMS, "since this morning")))
+
+
+def test_matcher_ranks_by_phrase_length_and_intensity():
+    ranked = specializations.rank([{"symptom": "heartburn", "intensity": 2}, {"symptom": "racing heart", "intensity": 3}])
+    assert [name for name, _ in ranked] == ["Cardiologist", "Gastroenterologist"]
+    assert specializations.best(["sore toe"]) == specializations.GENERAL_PRACTITIONER
+
+
+def test_known_specialization_from_the_model_is_kept(monkeypatch):
+    result = _analyze(monkeypatch, {"severity": 6, "specialization_needed": "gastroenterologist"})
+    assert result["specialization_needed"] == "Gastroenterologist"
+
+
+@pytest.mark.parametrize("reply", [{"severity": 6}, {"severity": 6, "specialization_needed": "Chest Doctor"}])
+def test_missing_or_unknown_specialization_falls_back_to_the_matcher(monkeypatch, reply):
+    assert _analyze(monkeypatch, reply)["specialization_needed"] == "Cardiologist"
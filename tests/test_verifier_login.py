@@ -0,0 +1,59 @@
+import pytest
+
+from app import crud
+from app.core import security
+from app.core.config import settings
+
+
+@pytest.fixture
+def decrypts(monkeypatch):
+    calls = []
+    decrypt_bytes = security.decrypt_bytes
+
+    def counting(cipher):
+        calls.append(cipher)
+        return decrypt_bytes(cipher)
+    monkeypatch.setattr(security, "decrypt_bytes", counting)
+    return calls
+
+
+def _login(db, patient, password="pw", secret="secret"):
+    return crud.verify_patient_credentials(db, patient.email, password, secret)
+
+
+def test_valid_login_checks_the_verifier_without_decrypting(db, patient, decrypts):
+    assert _login(db, patient).patient_id == patient.patient_id
+    assert _login(db, patient, password="wrong") is None
+    assert decrypts == []
+
+
+def test_wrong_secret_key_is_confirmed_against_the_ciphertext(db, patient, decrypts):
+    stamped = patient.secret_key_verifier
+    assert _login(db, patient, secret="wrong") is None
+    assert len(decrypts) == 1
+    assert patient.secret_key_verifier == stamped
+
+
+def test_changed_verifier_key_falls_back_to_the_ciphertext_and_restamps(db, patient, decrypts, monkeypatch):
+    stamped = patient.secret_key_verifier
+    # a new verifier key (or a JWT_SECRET_KEY rotation while it defaults to that) leaves every verifier stale
+    monkeypatch.setattr(settings, "SECRET_KEY_VERIFIER_KEY", "rotated-verifier-key")
+
+    assert _login(db, patient, secret="wrong") is None
+    assert patient.secret_key_verifier == stamped
+
+    assert _login(db, patient).patient_id == patient.patient_id
+    assert len(decrypts) == 2
+    assert patient.secret_key_verifier == security.secret_key_verifier("secret") != stamped
+
+    # re-stamped: the next login is back on the verifier alone
+    assert _login(db, patient) is not None
+    assert len(decrypts) == 2
+
+
+def test_missing_verifier_is_filled_on_login(db, patient, decrypts):
+    patient.secret_key_verifier = None
+    db.commit()
+    assert _login(db, patient) is not None
+    assert patient.secret_key_verifier == security.secret_key_verifier("secret")
+    assert len(decrypts) == 1